@@ -1,5 +1,5 @@
 from flask import Flask, session, redirect, request, url_for
-from datetime import timedelta
+from datetime import date, timedelta
 
 import os
 
@@ -33,7 +33,9 @@ app.config["SESSION_COOKIE_SECURE"] = False
 
 app.config["SESSION_COOKIE_NAME"] = "control_escolar_session"
 
-app.config["SESSION_REFRESH_EACH_REQUEST"] = True
+# La cookie solo se reenvía cuando la sesión cambia; la
+# expiración se renueva una vez al día (ver proteger_rutas)
+app.config["SESSION_REFRESH_EACH_REQUEST"] = False
 
 # =========================
 # IMPORTAR BLUEPRINTS
@@ -45,7 +47,15 @@ from routes.alumno_routes import alumno_bp
 from routes.padre_routes import padre_bp
 from routes.pagos_routes import pagos_bp
 from routes.backup_routes import backup_bp
-from routes.backup_routes import verificar_respaldos_automaticos
+from routes.medios_routes import medios_bp
+from utils.medios import foto_alumno, url_medio
+from utils.programador_respaldos import asegurar_programador
+from utils.permisos import (
+    compilar_permisos,
+    es_publica,
+    esta_bloqueada,
+    roles_permitidos
+)
 
 # =========================
 # REGISTRAR BLUEPRINTS
@@ -57,59 +67,55 @@ app.register_blueprint(alumno_bp)
 app.register_blueprint(padre_bp)
 app.register_blueprint(pagos_bp)
 app.register_blueprint(backup_bp)
+app.register_blueprint(medios_bp)
+
+# 🖼️ Fotos y escudo desde el almacén de medios
+app.jinja_env.globals.update(
+    foto_alumno=foto_alumno,
+    url_medio=url_medio
+)
+
+# 🔐 Tabla de permisos compilada una sola vez
+compilar_permisos(app)
 
 # =========================
-# PROTECCIÓN DE RUTAS
+# RESPALDOS AUTOMÁTICOS
 # =========================
+# El programador corre en su propio hilo (uno por worker,
+# coordinado con un lease en Mongo); la petición solo se
+# asegura de que el hilo exista en este proceso.
 @app.before_request
-def proteger_rutas():
+def iniciar_respaldos_automaticos():
 
-    rutas_publicas = [
+    asegurar_programador()
 
-        "/",
-
-        "/login",
-
-        "/validar"
+# =========================
+# PROTECCIÓN DE RUTAS
+# =========================
+@app.before_request
+def proteger_rutas():
 
-    ]
+    ruta = request.path
 
-    if request.path.startswith("/static"):
+    if es_publica(ruta):
 
         return
 
-    for ruta in rutas_publicas:
-
-        if request.path.startswith(ruta):
-
-            return
-
     # 🔐 VALIDAR LICENCIA
-    licencia_ok = licencia_activa()
+    modo_restringido = not licencia_activa()
+
+    # Solo escribir la sesión si cambia (evita reenviar la cookie)
+    if session.get("modo_restringido") != modo_restringido:
 
-    session["modo_restringido"] = not licencia_ok
+        session["modo_restringido"] = modo_restringido
 
     # =========================
     # BLOQUEOS
     # =========================
 
-    if session.get("modo_restringido"):
+    if modo_restringido and esta_bloqueada(ruta):
 
-        rutas_bloqueadas = [
-            "/admin/alumnos",
-            "/admin/maestros",
-            "/admin/grupos",
-            "/admin/materias",
-            "/admin/horarios",
-            "/admin/configuracion",
-            "/admin/crear",
-            "/admin/eliminar",
-            "/admin/generar",
-        ]
-
-        for ruta in rutas_bloqueadas:
-            if request.path.startswith(ruta):
-                return redirect(url_for("auth.login"))
+        return redirect(url_for("auth.login"))
 
     # =========================
     # VALIDAR SESIÓN
@@ -117,69 +123,28 @@ def proteger_rutas():
 
     if "usuario" not in session:
 
-        rutas_permitidas = [
-            "/",
-            "/login"
-        ]
-
-        if request.path not in rutas_permitidas:
-            return redirect(url_for("auth.login"))
-
-    session.permanent = True
-
-    rol = session.get("rol")
-
-    # ================= ADMIN =================
+        return redirect(url_for("auth.login"))
 
-    if request.path.startswith("/admin"):
-        if rol not in ["admin", "superadmin"]:
-            return redirect(url_for("auth.login"))
+    if not session.permanent:
 
-    # ================= MAESTRO =================
+        session.permanent = True
 
-    if (
-        request.path.startswith("/panel_maestro") or
-        request.path.startswith("/horario") or
-        request.path.startswith("/descargar_horario") or
-        request.path.startswith("/citatorios") or
-        request.path.startswith("/avisos_maestro") or
-        request.path.startswith("/guardar_asistencia") or
-        request.path.startswith("/guardar_calificaciones_ajax") or
-        request.path.startswith("/crear_reporte") or
-        request.path.startswith("/enviar_reportes_maestro") or
-        request.path.startswith("/generar_citatorio") or
-        request.path.startswith("/crear_citatorio")
-    ):
-        if rol != "maestro":
-            return redirect(url_for("auth.login"))
+    # Sesión deslizante: un Set-Cookie al día, no uno por petición
+    hoy = date.today().isoformat()
 
-    # ================= ALUMNO =================
+    if session.get("renovada") != hoy:
 
-    if (
-        request.path.startswith("/panel_alumno") or
-        request.path.startswith("/avisos_alumno")
-    ):
-        if rol != "alumno":
-            return redirect(url_for("auth.login"))
+        session["renovada"] = hoy
 
-    # ================= PADRE =================
-
-    if (
-        request.path.startswith("/panel_padre") or
-        request.path.startswith("/avisos_padre")
-    ):
-        if rol != "padre":
-            return redirect(url_for("auth.login"))
-
-    try:
+    # =========================
+    # ROLES
+    # =========================
 
-        verificar_respaldos_automaticos()
+    roles = roles_permitidos(ruta, request.endpoint)
 
-    except Exception as e:
+    if roles and session.get("rol") not in roles:
 
-        print(
-            f"Error en respaldo automático: {e}"
-        )
+        return redirect(url_for("auth.login"))
 
     return
 
@@ -189,6 +154,11 @@ def proteger_rutas():
 @app.after_request
 def no_cache(response):
 
+    # Los medios llevan su propio ETag y caché larga
+    if request.blueprint == "medios":
+
+        return response
+
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
 
     response.headers["Pragma"] = "no-cache"
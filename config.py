@@ -6,5 +6,44 @@ class Config:
     # 🔥 Mongo Atlas
     MONGO_URI = os.environ.get("MONGO_URI") or "mongodb://localhost:27017/control_escolar"
 
+    # 🔌 Pool de conexiones (uno por proceso)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE") or 50)
+
+    MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE") or 0)
+
+    # ⏱️ Timeouts (ms)
+    MONGO_TIMEOUT_MS = int(os.environ.get("MONGO_TIMEOUT_MS") or 5000)
+
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS") or 10000)
+
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS") or 0) or None
+
+    # 📖 primary | primaryPreferred | secondary | secondaryPreferred | nearest
+    MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE") or "primary"
+
+    # ⚙️ Segundos que vive en memoria el documento de configuración
+    CONFIG_CACHE_TTL = int(os.environ.get("CONFIG_CACHE_TTL") or 30)
+
+    # 💾 Respaldos automáticos: hilo en cada worker web
+    # (0 si corre aparte: python -m utils.programador_respaldos)
+    RESPALDOS_EN_SEGUNDO_PLANO = (os.environ.get("RESPALDOS_EN_SEGUNDO_PLANO") or "1") == "1"
+
+    RESPALDOS_REVISION_SEGUNDOS = int(os.environ.get("RESPALDOS_REVISION_SEGUNDOS") or 60)
+
+    RESPALDOS_LEASE_SEGUNDOS = int(os.environ.get("RESPALDOS_LEASE_SEGUNDOS") or 600)
+
+    # 🗜️ gzip | zstd (zstd requiere: pip install zstandard)
+    RESPALDOS_COMPRESION = os.environ.get("RESPALDOS_COMPRESION") or "gzip"
+
+    # ♻️ Restauración: colecciones que se cargan a la vez
+    RESTAURACION_HILOS = int(os.environ.get("RESTAURACION_HILOS") or 4)
+
+    RESTAURACION_LEASE_SEGUNDOS = int(os.environ.get("RESTAURACION_LEASE_SEGUNDOS") or 3600)
+
+    # 📄 Listas paginadas (?por_pagina=)
+    POR_PAGINA = int(os.environ.get("POR_PAGINA") or 50)
+
+    POR_PAGINA_MAX = int(os.environ.get("POR_PAGINA_MAX") or 200)
+
     # opcional
-    DEBUG = False
\ No newline at end of file
+    DEBUG = False
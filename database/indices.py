@@ -0,0 +1,457 @@
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from database.mongo import db
+
+from utils.reportes_pagos import filtro_vencidas
+
+# =========================
+# ÍNDICES DECLARADOS
+# =========================
+# Se aplican al desplegar, no al importar:
+#
+#   python -m database.indices aplicar
+#   python -m database.indices reporte
+#   python -m database.indices explain
+#
+# Cada cambio en INDICES debe subir VERSION_INDICES.
+
+VERSION_INDICES = 11
+
+INDICES = {
+
+    "usuarios": [
+        ([("usuario", ASCENDING)], {"unique": True}),
+    ],
+
+    "alumnos": [
+        ([("usuario", ASCENDING)], {"unique": True}),
+        ([("usuario_padre", ASCENDING)], {}),
+        ([("grupo", ASCENDING), ("nombre", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("nombre", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("nombre_clave", ASCENDING)], {}),
+        ([("busqueda", ASCENDING)], {}),
+    ],
+
+    "maestros": [
+        ([("usuario", ASCENDING)], {"unique": True}),
+        ([("nombre_clave", ASCENDING)], {}),
+    ],
+
+    "padres": [
+        ([("usuario", ASCENDING)], {"unique": True}),
+    ],
+
+    "admins_secundarios": [
+        ([("usuario", ASCENDING)], {"unique": True}),
+    ],
+
+    "materias": [
+        ([("grupo", ASCENDING)], {}),
+    ],
+
+    "horarios": [
+        ([("grupo", ASCENDING)], {}),
+        ([("maestro", ASCENDING)], {}),
+        ([("maestro_clave", ASCENDING)], {}),
+    ],
+
+    "reportes": [
+        ([("maestro", ASCENDING), ("fecha", DESCENDING)], {}),
+        ([("maestro", ASCENDING), ("estado", ASCENDING)], {}),
+        ([("alumno", ASCENDING), ("visible_padre", ASCENDING)], {}),
+    ],
+
+    "citatorios": [
+        ([("fecha_creacion", DESCENDING)], {}),
+        ([("alumno", ASCENDING), ("visible_padre", ASCENDING)], {}),
+    ],
+
+    "avisos": [
+        ([("fecha", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("tipo", ASCENDING), ("grupo", ASCENDING)], {}),
+    ],
+
+    "pagos": [
+        ([("grupo", ASCENDING), ("saldo_restante", ASCENDING)], {}),
+        ([("saldo_restante", ASCENDING)], {}),
+        ([("alumno", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("busqueda", ASCENDING)], {}),
+    ],
+
+    "mensualidades": [
+        ([("pago_id", ASCENDING), ("mes", ASCENDING), ("pagado", ASCENDING)], {}),
+        ([("pagado", ASCENDING), ("anio", ASCENDING), ("numero_mes", ASCENDING)], {}),
+    ],
+
+    "movimientos_pagos": [
+        ([("pago_id", ASCENDING), ("estatus", ASCENDING)], {}),
+        ([("fecha_pago", ASCENDING), ("estatus", ASCENDING)], {}),
+        ([("folio", ASCENDING), ("estatus", ASCENDING)], {}),
+        ([("consecutivo", DESCENDING)], {}),
+        (
+            [("recargo_clave", ASCENDING)],
+            {
+                "unique": True,
+                "partialFilterExpression": {"recargo_clave": {"$exists": True}}
+            }
+        ),
+    ],
+
+    "bitacora": [
+        ([("fecha", DESCENDING)], {}),
+        ([("usuario", ASCENDING), ("fecha", DESCENDING)], {}),
+    ],
+
+    "bitacora_pagos": [
+        ([("fecha", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+
+    "auditoria": [
+        ([("fecha", DESCENDING)], {}),
+        ([("usuario", ASCENDING), ("fecha", DESCENDING)], {}),
+    ],
+
+    "backups_archivos": [
+        ([("tipo", ASCENDING), ("fecha", DESCENDING)], {}),
+        ([("fecha", DESCENDING)], {}),
+    ],
+
+    "configuracion_backups": [
+        ([("tipo", ASCENDING)], {}),
+        ([("activo", ASCENDING), ("proxima_ejecucion", ASCENDING)], {}),
+    ],
+
+    "bitacora_restauraciones": [
+        ([("fecha", DESCENDING)], {}),
+    ],
+
+    "restauraciones": [
+        ([("inicio", DESCENDING)], {}),
+    ],
+
+    "medios.files": [
+        ([("metadata.original", ASCENDING)], {}),
+    ],
+
+    "calificaciones": [
+        ([("alumno", ASCENDING)], {}),
+        (
+            [("alumno_id", ASCENDING), ("materia", ASCENDING), ("trimestre", ASCENDING)],
+            {
+                "unique": True,
+                "partialFilterExpression": {"alumno_id": {"$exists": True}}
+            }
+        ),
+        ([("grupo", ASCENDING), ("alumno", ASCENDING)], {}),
+    ],
+
+    "asistencias": [
+        ([("alumno_id", ASCENDING), ("fecha", ASCENDING)], {"unique": True}),
+        ([("alumno_id", ASCENDING), ("dia", DESCENDING)], {}),
+        ([("grupo", ASCENDING), ("dia", DESCENDING)], {}),
+    ],
+
+}
+
+# =========================
+# CONSULTAS DE LOS BLUEPRINTS
+# =========================
+# (coleccion, filtro, orden) usados en rutas y PDFs;
+# "explain" falla si alguno recorre toda la colección.
+
+CONSULTAS = [
+
+    ("usuarios", {"usuario": "x"}, None),
+    ("alumnos", {"usuario": "x"}, None),
+    ("alumnos", {"usuario_padre": "x"}, None),
+    ("alumnos", {"nombre": "x"}, None),
+    ("alumnos", {"grupo": {"$in": ["1A", "1B"]}}, None),
+    ("maestros", {"usuario": "x"}, None),
+    ("admins_secundarios", {"usuario": "x", "activo": True}, None),
+    ("materias", {"grupo": "1A"}, None),
+    ("horarios", {"grupo": {"$in": ["1A"]}}, None),
+    ("alumnos", {"nombre_clave": "x"}, None),
+    ("maestros", {"nombre_clave": "x"}, None),
+    ("horarios", {"maestro_clave": {"$in": ["x"]}}, None),
+    ("alumnos", {"busqueda": {"$all": ["jo", "pe"]}}, None),
+    ("pagos", {"busqueda": {"$all": ["jo"]}, "activo": {"$ne": False}}, None),
+    ("movimientos_pagos", {"folio": {"$in": ["REC-000123"]}}, None),
+
+    ("reportes", {"maestro": "x"}, [("fecha", -1)]),
+    ("reportes", {"maestro": "x", "estado": "pendiente"}, None),
+    ("reportes", {"alumno": "x", "visible_padre": True}, None),
+    ("citatorios", {}, [("fecha_creacion", -1)]),
+    ("citatorios", {"alumno": "x", "visible_padre": True}, None),
+    ("avisos", {}, [("fecha", -1)]),
+    ("avisos", {}, [("fecha", -1), ("_id", -1)]),
+    ("alumnos", {}, [("nombre", 1), ("_id", 1)]),
+    ("alumnos", {"grupo": "1A"}, [("nombre", 1), ("_id", 1)]),
+    ("pagos", {"activo": {"$ne": False}}, [("alumno", 1), ("_id", 1)]),
+
+    ("pagos", {"saldo_restante": {"$gt": 0}}, None),
+    ("pagos", {"grupo": "1A", "saldo_restante": {"$gt": 0}}, None),
+
+    ("mensualidades", {"pago_id": "x"}, None),
+    ("mensualidades", {"pago_id": "x", "mes": "Enero", "pagado": False}, None),
+    ("mensualidades", {"pagado": False}, None),
+    ("mensualidades", filtro_vencidas(datetime(2026, 6, 1)), None),
+
+    ("movimientos_pagos", {"pago_id": "x", "estatus": "activo"}, None),
+    ("movimientos_pagos", {"pago_id": "x"}, [("_id", -1)]),
+    ("movimientos_pagos", {"fecha_pago": "01/01/2026", "estatus": "activo"}, None),
+    ("movimientos_pagos", {"folio": "REC-000001", "estatus": "activo"}, None),
+    ("movimientos_pagos", {"consecutivo": {"$type": "number"}}, [("consecutivo", -1)]),
+
+    ("medios.files", {"metadata.original": "x"}, None),
+
+    ("calificaciones", {"alumno_id": "x"}, [("materia", 1), ("trimestre", 1)]),
+    ("calificaciones", {"alumno_id": {"$in": ["x"]}}, None),
+    ("calificaciones", {"alumno_id": {"$exists": True}}, [("grupo", 1), ("alumno", 1)]),
+    ("asistencias", {"alumno_id": "x", "fecha": "01/01/2026"}, None),
+    ("asistencias", {"alumno_id": "x"}, [("dia", -1)]),
+
+    ("bitacora", {}, [("fecha", -1)]),
+    ("bitacora", {"usuario": "x"}, [("fecha", -1)]),
+    ("bitacora_pagos", {}, [("fecha", -1)]),
+    ("bitacora_pagos", {"fecha": {"$gte": datetime(2026, 1, 1), "$lt": datetime(2026, 2, 1)}}, [("fecha", -1), ("_id", -1)]),
+    ("bitacora", {"usuario": "x", "fecha": {"$gte": datetime(2026, 1, 1)}}, [("fecha", -1)]),
+    ("auditoria", {"fecha": {"$gte": datetime(2026, 1, 1)}}, [("fecha", -1)]),
+    ("auditoria", {}, [("fecha", -1)]),
+    ("auditoria", {"usuario": "x"}, [("fecha", -1)]),
+
+    ("backups_archivos", {}, [("fecha", -1)]),
+    ("backups_archivos", {"tipo": "sistema"}, [("fecha", -1)]),
+    ("configuracion_backups", {"activo": True, "proxima_ejecucion": {"$lte": datetime(2026, 1, 1)}}, None),
+    ("configuracion_backups", {"tipo": "sistema"}, None),
+
+]
+
+migraciones = db["migraciones"]
+
+
+def nombre_indice(claves):
+
+    return "_".join(
+        f"{campo}_{direccion}"
+        for campo, direccion in claves
+    )
+
+
+# =========================
+# APLICAR
+# =========================
+def aplicar_indices():
+
+    creados = []
+    errores = []
+
+    for coleccion, indices in INDICES.items():
+
+        for claves, opciones in indices:
+
+            nombre = nombre_indice(claves)
+
+            try:
+
+                db[coleccion].create_index(
+                    claves,
+                    name=nombre,
+                    **opciones
+                )
+
+                creados.append(f"{coleccion}.{nombre}")
+
+            except OperationFailure as e:
+
+                errores.append(
+                    f"{coleccion}.{nombre}: {e}"
+                )
+
+    if not errores:
+
+        migraciones.update_one(
+            {"_id": "indices"},
+            {
+                "$set": {
+                    "version": VERSION_INDICES,
+                    "fecha": datetime.now()
+                }
+            },
+            upsert=True
+        )
+
+    return creados, errores
+
+
+def version_aplicada():
+
+    registro = migraciones.find_one({"_id": "indices"}) or {}
+
+    return registro.get("version", 0)
+
+
+# =========================
+# REPORTE
+# =========================
+def reporte_indices():
+
+    faltantes = []
+    sin_uso = []
+    no_declarados = []
+
+    for coleccion, indices in INDICES.items():
+
+        existentes = {
+            i["name"]: i
+            for i in db[coleccion].list_indexes()
+        }
+
+        declarados = {
+            nombre_indice(claves)
+            for claves, _ in indices
+        }
+
+        for nombre in declarados:
+
+            if nombre not in existentes:
+                faltantes.append(f"{coleccion}.{nombre}")
+
+        for nombre in existentes:
+
+            if nombre != "_id_" and nombre not in declarados:
+                no_declarados.append(f"{coleccion}.{nombre}")
+
+        try:
+
+            for estadistica in db[coleccion].aggregate([{"$indexStats": {}}]):
+
+                if estadistica["name"] == "_id_":
+                    continue
+
+                if estadistica.get("accesses", {}).get("ops", 0) == 0:
+                    sin_uso.append(f"{coleccion}.{estadistica['name']}")
+
+        except OperationFailure:
+
+            pass
+
+    return {
+        "version_declarada": VERSION_INDICES,
+        "version_aplicada": version_aplicada(),
+        "faltantes": faltantes,
+        "sin_uso": sin_uso,
+        "no_declarados": no_declarados
+    }
+
+
+# =========================
+# EXPLAIN
+# =========================
+def _tiene_collscan(plan):
+
+    if isinstance(plan, dict):
+
+        if plan.get("stage") == "COLLSCAN":
+            return True
+
+        return any(_tiene_collscan(v) for v in plan.values())
+
+    if isinstance(plan, list):
+
+        return any(_tiene_collscan(v) for v in plan)
+
+    return False
+
+
+def verificar_consultas():
+
+    # Sobre una colección vacía o inexistente el plan es EOF y
+    # no prueba nada: esas consultas van aparte, sin verificar
+    recorridos = []
+    sin_datos = []
+
+    for coleccion, filtro, orden in CONSULTAS:
+
+        if not db[coleccion].find_one({}, {"_id": 1}):
+
+            sin_datos.append((coleccion, filtro, orden))
+
+            continue
+
+        cursor = db[coleccion].find(filtro)
+
+        if orden:
+            cursor = cursor.sort(orden)
+
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+
+        if _tiene_collscan(plan):
+            recorridos.append((coleccion, filtro, orden))
+
+    return recorridos, sin_datos
+
+
+# =========================
+# CLI
+# =========================
+def main(argv):
+
+    comando = argv[1] if len(argv) > 1 else "aplicar"
+
+    if comando == "aplicar":
+
+        creados, errores = aplicar_indices()
+
+        print(f"✅ Índices aplicados: {len(creados)} (versión {VERSION_INDICES})")
+
+        for error in errores:
+            print(f"❌ {error}")
+
+        return 1 if errores else 0
+
+    if comando == "reporte":
+
+        reporte = reporte_indices()
+
+        print(
+            f"Versión declarada {reporte['version_declarada']}, "
+            f"aplicada {reporte['version_aplicada']}"
+        )
+
+        for clave in ("faltantes", "sin_uso", "no_declarados"):
+
+            print(f"{clave}: {len(reporte[clave])}")
+
+            for nombre in reporte[clave]:
+                print(f"  - {nombre}")
+
+        return 1 if reporte["faltantes"] else 0
+
+    if comando == "explain":
+
+        recorridos, sin_datos = verificar_consultas()
+
+        for coleccion, filtro, orden in recorridos:
+            print(f"❌ COLLSCAN en {coleccion}: {filtro} {orden or ''}")
+
+        for coleccion, filtro, orden in sin_datos:
+            print(f"⚠️ Sin datos, no verificada: {coleccion}: {filtro} {orden or ''}")
+
+        if not recorridos:
+            print(
+                f"✅ {len(CONSULTAS) - len(sin_datos)} consultas usan índice"
+            )
+
+        return 1 if recorridos else 0
+
+    print("Uso: python -m database.indices [aplicar|reporte|explain]")
+
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
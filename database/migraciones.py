@@ -0,0 +1,365 @@
+import base64
+import binascii
+import os
+import sys
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from database.mongo import (
+    db,
+    alumnos,
+    configuracion,
+    calificaciones,
+    asistencias
+)
+
+from utils.medios import guardar_bytes, tipo_imagen
+
+from utils.normalizar import completar_claves
+
+from utils.busqueda import completar_busqueda
+
+from utils.registro_escolar import (
+    datos_asistencia,
+    datos_calificacion,
+    filtro_asistencia,
+    filtro_calificacion,
+    normalizar_fecha
+)
+
+# =========================
+# MIGRACIONES DE DATOS
+# =========================
+# Se ejecutan a mano al desplegar y pueden repetirse:
+# cada una solo toca los documentos que siguen en el
+# formato anterior.
+#
+#   python -m database.migraciones <nombre>
+#
+# El resultado queda en la colección "migraciones".
+
+migraciones = db["migraciones"]
+
+TAMANO_LOTE = 200
+
+
+def _registrar(nombre, resultado):
+
+    migraciones.update_one(
+        {"_id": nombre},
+        {
+            "$set": {
+                "fecha": datetime.now(),
+                "resultado": resultado
+            }
+        },
+        upsert=True
+    )
+
+
+# =========================
+# FOTOS Y ESCUDO A GRIDFS
+# =========================
+# El campo viejo solo se quita cuando la imagen ya quedó en
+# GridFS. Lo que no se pudo leer (base64 roto, archivo que
+# falta, bytes que no son imagen) se queda como está, se
+# cuenta en "fallidos" y la siguiente ejecución lo reintenta.
+def _contenido_imagen(valor):
+
+    ruta = valor.lstrip("/")
+
+    if ruta.startswith("static/"):
+
+        if not os.path.exists(ruta):
+            return None
+
+        with open(ruta, "rb") as archivo:
+            contenido = archivo.read()
+
+    else:
+
+        if valor.startswith("data:"):
+            valor = valor.split(",", 1)[-1]
+
+        # Muchos base64 guardados vienen partidos en líneas
+        valor = "".join(valor.split())
+
+        try:
+            contenido = base64.b64decode(valor, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+
+    # El tipo lo detecta guardar_bytes; aquí solo se descarta
+    # lo que no es imagen
+    if not tipo_imagen(contenido):
+        return None
+
+    return contenido
+
+
+def _migrar_imagen(valor, nombre, miniatura=True):
+
+    # (estado, (medio_id, miniatura_id)); estado es
+    # "migrada", "vacia" o "fallida"
+    if not isinstance(valor, str) or not valor.strip():
+        return "vacia", None
+
+    contenido = _contenido_imagen(valor)
+
+    if not contenido:
+        return "fallida", None
+
+    try:
+        return "migrada", guardar_bytes(contenido, nombre, miniatura)
+    except Exception:
+        return "fallida", None
+
+
+def migrar_medios():
+
+    resultado = {
+        "alumnos": 0,
+        "sin_imagen": 0,
+        "fallidos": 0,
+        "escudo": False,
+        "escudo_fallido": False
+    }
+
+    operaciones = []
+
+    for alumno in alumnos.find(
+        {"foto": {"$exists": True}},
+        {"foto": 1}
+    ):
+
+        estado, ids = _migrar_imagen(
+            alumno.get("foto"),
+            f"alumno_{alumno['_id']}"
+        )
+
+        if estado == "fallida":
+
+            resultado["fallidos"] += 1
+
+            continue
+
+        actualizacion = {"$unset": {"foto": ""}}
+
+        if estado == "migrada":
+
+            actualizacion["$set"] = {
+                "foto_id": ids[0],
+                "foto_miniatura_id": ids[1]
+            }
+
+            resultado["alumnos"] += 1
+
+        else:
+
+            resultado["sin_imagen"] += 1
+
+        operaciones.append(
+            UpdateOne({"_id": alumno["_id"]}, actualizacion)
+        )
+
+        if len(operaciones) >= TAMANO_LOTE:
+
+            alumnos.bulk_write(operaciones, ordered=False)
+
+            operaciones = []
+
+    if operaciones:
+        alumnos.bulk_write(operaciones, ordered=False)
+
+    for config in configuracion.find(
+        {"escudo": {"$exists": True}},
+        {"escudo": 1}
+    ):
+
+        estado, ids = _migrar_imagen(
+            config.get("escudo"),
+            "escudo",
+            miniatura=False
+        )
+
+        if estado == "fallida":
+
+            resultado["escudo_fallido"] = True
+
+            continue
+
+        actualizacion = {"$unset": {"escudo": ""}}
+
+        if estado == "migrada":
+
+            actualizacion["$set"] = {"escudo_id": ids[0]}
+
+            resultado["escudo"] = True
+
+        configuracion.update_one({"_id": config["_id"]}, actualizacion)
+
+    return resultado
+
+
+# =========================
+# CALIFICACIONES Y ASISTENCIAS
+# =========================
+def _vaciar(coleccion, operaciones):
+
+    if operaciones:
+        coleccion.bulk_write(operaciones, ordered=False)
+
+    return []
+
+
+def _fecha_legada(fecha):
+
+    # Una fecha que no se entiende se conserva tal cual
+    return normalizar_fecha(fecha) or fecha
+
+
+def migrar_evaluaciones():
+
+    resultado = {
+        "alumnos": 0,
+        "calificaciones": 0,
+        "asistencias": 0
+    }
+
+    lote_calificaciones = []
+    lote_asistencias = []
+    lote_alumnos = []
+
+    for alumno in alumnos.find(
+        {
+            "$or": [
+                {"calificaciones": {"$exists": True}},
+                {"asistencias": {"$exists": True}}
+            ]
+        },
+        {
+            "nombre": 1,
+            "grupo": 1,
+            "calificaciones": 1,
+            "asistencias": 1
+        }
+    ):
+
+        # Si el arreglo repite una llave, gana la última entrada
+        # (igual que el $pull/$push que la reemplazaba)
+        ultimas_calificaciones = {
+            (cal.get("materia", ""), str(cal.get("trimestre", ""))): cal
+            for cal in alumno.get("calificaciones") or []
+        }
+
+        # Con la fecha ya normalizada: "2026-10-18" y "18/10/2026"
+        # son el mismo día (y la misma llave del índice único)
+        ultimas_asistencias = {
+            _fecha_legada(asistencia.get("fecha")): asistencia
+            for asistencia in alumno.get("asistencias") or []
+        }
+
+        for cal in ultimas_calificaciones.values():
+
+            datos = datos_calificacion(
+                alumno,
+                cal.get("materia", ""),
+                cal.get("trimestre", ""),
+                cal.get("calificacion", 0),
+                cal.get("maestro", "")
+            )
+
+            datos["grupo"] = cal.get("grupo") or datos["grupo"]
+            datos["fecha"] = cal.get("fecha") or datos["fecha"]
+
+            if cal.get("enterado"):
+                datos["enterado"] = True
+
+            # $setOnInsert: lo capturado después de migrar gana
+            lote_calificaciones.append(
+                UpdateOne(
+                    filtro_calificacion(
+                        alumno["_id"],
+                        datos["materia"],
+                        datos["trimestre"]
+                    ),
+                    {"$setOnInsert": datos},
+                    upsert=True
+                )
+            )
+
+        for fecha, asistencia in ultimas_asistencias.items():
+
+            lote_asistencias.append(
+                UpdateOne(
+                    filtro_asistencia(alumno["_id"], fecha),
+                    {
+                        "$setOnInsert": datos_asistencia(
+                            alumno,
+                            fecha,
+                            asistencia.get("estado"),
+                            asistencia.get("maestro", "")
+                        )
+                    },
+                    upsert=True
+                )
+            )
+
+        resultado["calificaciones"] += len(ultimas_calificaciones)
+        resultado["asistencias"] += len(ultimas_asistencias)
+        resultado["alumnos"] += 1
+
+        lote_alumnos.append(
+            UpdateOne(
+                {"_id": alumno["_id"]},
+                {"$unset": {"calificaciones": "", "asistencias": ""}}
+            )
+        )
+
+        # Primero los registros, después se vacía el alumno
+        if len(lote_alumnos) >= TAMANO_LOTE:
+
+            lote_calificaciones = _vaciar(calificaciones, lote_calificaciones)
+            lote_asistencias = _vaciar(asistencias, lote_asistencias)
+            lote_alumnos = _vaciar(alumnos, lote_alumnos)
+
+    _vaciar(calificaciones, lote_calificaciones)
+    _vaciar(asistencias, lote_asistencias)
+    _vaciar(alumnos, lote_alumnos)
+
+    return resultado
+
+
+MIGRACIONES = {
+    "medios": migrar_medios,
+    "evaluaciones": migrar_evaluaciones,
+    "claves": completar_claves,
+    "busqueda": completar_busqueda,
+}
+
+
+# =========================
+# CLI
+# =========================
+def main(argv):
+
+    nombre = argv[1] if len(argv) > 1 else ""
+
+    if nombre not in MIGRACIONES:
+
+        print(f"Uso: python -m database.migraciones [{'|'.join(MIGRACIONES)}]")
+
+        return 2
+
+    resultado = MIGRACIONES[nombre]()
+
+    _registrar(nombre, resultado)
+
+    print(f"✅ Migración {nombre}: {resultado}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
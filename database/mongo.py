@@ -1,9 +1,12 @@
 from pymongo import MongoClient
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from config import Config
+
 # =========================
 # VARIABLES SaaS
 # =========================
@@ -16,9 +19,111 @@ INSTALL_ID = os.getenv("INSTALL_ID")
 if not MONGO_URI:
     raise Exception("❌ ERROR: MONGO_URI no está configurado")
 
-client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+NOMBRE_DB = "control_escolar"
+
+# =========================
+# CLIENTE POR PROCESO
+# =========================
+# El cliente se crea en el primer uso y nunca se hereda
+# a través de un fork (gunicorn --preload): cada worker
+# abre su propio pool.
+
+_cliente = None
+_pid_cliente = None
+_candado = threading.Lock()
+
+
+def obtener_cliente():
+
+    global _cliente, _pid_cliente
+
+    pid = os.getpid()
+
+    if _cliente is None or _pid_cliente != pid:
+
+        with _candado:
+
+            if _cliente is None or _pid_cliente != pid:
+
+                _cliente = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+                    serverSelectionTimeoutMS=Config.MONGO_TIMEOUT_MS,
+                    connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+                    socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+                    readPreference=Config.MONGO_READ_PREFERENCE,
+                    connect=False
+                )
+
+                _pid_cliente = pid
+
+    return _cliente
+
+
+def obtener_db():
+
+    return obtener_cliente()[NOMBRE_DB]
+
+
+def cerrar_cliente():
+
+    global _cliente, _pid_cliente
+
+    with _candado:
+
+        if _cliente is not None and _pid_cliente == os.getpid():
+            _cliente.close()
 
-db = client["control_escolar"]
+        _cliente = None
+        _pid_cliente = None
+
+
+def _reiniciar_tras_fork():
+
+    global _cliente, _pid_cliente, _candado
+
+    # El hijo descarta el cliente del padre sin cerrarlo:
+    # sus sockets pertenecen al proceso padre.
+    _cliente = None
+    _pid_cliente = None
+    _candado = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+# =========================
+# MANEJADORES PEREZOSOS
+# =========================
+class ColeccionPerezosa:
+
+    __slots__ = ("nombre",)
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __getattr__(self, atributo):
+        return getattr(obtener_db()[self.nombre], atributo)
+
+    def __getitem__(self, subcoleccion):
+        return obtener_db()[self.nombre][subcoleccion]
+
+    def __repr__(self):
+        return f"ColeccionPerezosa({self.nombre!r})"
+
+
+class BaseDatosPerezosa:
+
+    def __getitem__(self, nombre):
+        return ColeccionPerezosa(nombre)
+
+    def __getattr__(self, atributo):
+        return getattr(obtener_db(), atributo)
+
+
+db = BaseDatosPerezosa()
 
 # =========================
 # COLECCIONES
@@ -31,6 +136,7 @@ grupos = db["grupos"]
 materias = db["materias"]
 reportes = db["reportes"]
 calificaciones = db["calificaciones"]
+asistencias = db["asistencias"]
 avisos = db["avisos"]
 
 configuracion = db["configuracion"]
@@ -48,7 +154,7 @@ mensualidades = db["mensualidades"]
 
 padres = db["padres"]
 
-historial_backups = db.historial_backups
+historial_backups = db["historial_backups"]
 
 backups_archivos = db["backups_archivos"]
 
@@ -68,31 +174,7 @@ bitacora_restauraciones = db["bitacora_restauraciones"]
 
 configuracion_backups = db["configuracion_backups"]
 
-# =========================
-# ÍNDICES
-# =========================
+restauraciones = db["restauraciones"]
 
-try:
-    alumnos.create_index("usuario", unique=True)
-except:
-    pass
-
-try:
-    maestros.create_index("usuario", unique=True)
-except:
-    pass
-
-try:
-    usuarios.create_index("usuario", unique=True)
-except:
-    pass
-
-try:
-    padres.create_index("usuario", unique=True)
-except:
-    pass
-
-try:
-    admins_secundarios.create_index("usuario", unique=True)
-except:
-    pass
\ No newline at end of file
+# Los índices se declaran en database/indices.py
+# y se aplican al desplegar: python -m database.indices aplicar
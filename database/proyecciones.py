@@ -0,0 +1,138 @@
+import sys
+
+from database.mongo import db
+
+# =========================
+# PROYECCIONES POR VISTA
+# =========================
+# Cada vista pide solo los campos que pinta su plantilla.
+# Un documento de alumno trae datos personales, foto y
+# contraseñas; una lista de grupo solo necesita nombre y grupo.
+#
+#   alumnos.find(filtro, proyeccion("roster"))
+#
+# Para comparar el tamaño de cada vista contra el documento
+# completo: python -m database.proyecciones medir
+
+_FOTO = ("foto_id", "foto_miniatura_id", "foto")
+
+_DATOS_PERSONALES = (
+    "nombre",
+    "grupo",
+    "curp",
+    "sexo",
+    "fecha_nacimiento",
+    "telefono",
+    "direccion",
+    "escuela_procedencia",
+    "promedio",
+    "afecciones",
+    "tutor",
+    "padre_nombre",
+    "padre_telefono",
+    "padre_correo"
+)
+
+_ACCESOS = (
+    "usuario",
+    "password",
+    "password_admin",
+    "usuario_padre",
+    "password_padre"
+)
+
+PROYECCIONES = {
+
+    # Selects y listas simples
+    "lista": ("nombre", "grupo"),
+
+    # Tablas con foto (alumnos, expedientes, pase de lista)
+    "roster": ("nombre", "grupo", "usuario") + _FOTO,
+
+    # Expediente y su edición
+    "expediente": _DATOS_PERSONALES + _ACCESOS + _FOTO,
+
+    # Boletas, kardex y paneles de alumno y padre; las
+    # calificaciones se leen aparte (utils.registro_escolar)
+    "kardex": ("nombre", "grupo") + _FOTO,
+
+    # Solo para filtrar avisos por grupo
+    "grupo": ("grupo",),
+
+}
+
+COLECCION = {
+    "lista": "alumnos",
+    "roster": "alumnos",
+    "expediente": "alumnos",
+    "kardex": "alumnos",
+    "grupo": "alumnos",
+}
+
+_compiladas = {
+    nombre: dict.fromkeys(campos, 1)
+    for nombre, campos in PROYECCIONES.items()
+}
+
+
+def proyeccion(nombre):
+
+    return dict(_compiladas[nombre])
+
+
+# =========================
+# MEDICIÓN
+# =========================
+def medir(muestra=2000):
+
+    resultados = {}
+
+    for nombre, coleccion in COLECCION.items():
+
+        etapas = [
+            {"$limit": muestra},
+            {
+                "$project": {
+                    "completo": {"$bsonSize": "$$ROOT"},
+                    "vista": {
+                        "$bsonSize": {
+                            campo: f"${campo}"
+                            for campo in PROYECCIONES[nombre]
+                        }
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "documentos": {"$sum": 1},
+                    "completo": {"$sum": "$completo"},
+                    "vista": {"$sum": "$vista"}
+                }
+            }
+        ]
+
+        total = next(db[coleccion].aggregate(etapas), None)
+
+        if total:
+            resultados[nombre] = total
+
+    return resultados
+
+
+if __name__ == "__main__":
+
+    if (sys.argv[1] if len(sys.argv) > 1 else "medir") != "medir":
+
+        print("Uso: python -m database.proyecciones medir [muestra]")
+
+        sys.exit(2)
+
+    muestra = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    for nombre, total in medir(muestra).items():
+
+        print(
+            f"{nombre}: {total['documentos']} documentos, "
+            f"{total['vista']:,} de {total['completo']:,} bytes"
+        )
@@ -1,6 +1,7 @@
 import os
 import json
 import time
+import threading
 import requests
 
 from datetime import datetime, timedelta
@@ -14,6 +15,17 @@ INSTALL_ID = os.getenv("INSTALL_ID")
 
 CACHE_FILE = "/tmp/licencia_cache.json"
 
+# 🔥 TIEMPO SIN CONSULTAR AL SERVIDOR
+VIGENCIA = timedelta(hours=6)
+
+# Espera antes de reintentar si el servidor no respondió
+REINTENTO = timedelta(minutes=5)
+
+# Sin caché no hay último estado conocido: mientras corre la
+# primera validación se responde "pendiente" (como válida) a lo
+# más este tiempo; después, lo que haya decidido el hilo
+GRACIA_PRIMERA_VALIDACION = timedelta(seconds=30)
+
 
 # =========================
 # GUARDAR CACHE
@@ -119,36 +131,164 @@ def validar_online():
     return False, "Licencia expirada sin conexión"
 
 
+# =========================
+# ESTADO EN MEMORIA
+# =========================
+# Las peticiones solo leen este estado. Cuando caduca se
+# lanza un único hilo que revalida en segundo plano y,
+# mientras tanto, se sigue respondiendo con el valor anterior.
+# Si no hay valor anterior (contenedor nuevo, sin caché en
+# /tmp), ninguna petición espera al servidor: el estado queda
+# "pendiente" hasta que el hilo termine, en lugar de mandar a
+# todos a modo restringido.
+
+_candado = threading.Lock()
+
+_estado = {
+    "cargado": False,
+    "valida": False,
+    "ultima_validacion": None,
+    "proximo_intento": None,
+    "revalidando": False,
+    "pendiente_desde": None
+}
+
+
+def _cargar_desde_disco():
+
+    cache = leer_cache()
+
+    if not cache:
+        return
+
+    try:
+
+        _estado["ultima_validacion"] = datetime.fromisoformat(
+            cache["ultima_validacion"]
+        )
+
+        _estado["valida"] = bool(cache.get("valida", False))
+
+    except:
+
+        pass
+
+
+def _revalidar():
+
+    try:
+
+        valido, datos = validar_online()
+
+    except Exception as e:
+
+        print(f"Error al validar licencia: {e}")
+
+        valido, datos = None, None
+
+    ahora = datetime.now()
+
+    with _candado:
+
+        if valido:
+
+            _estado["valida"] = True
+
+            # Con tolerancia offline se conserva la fecha de la
+            # última validación real para seguir reintentando.
+            try:
+                _estado["ultima_validacion"] = datetime.fromisoformat(
+                    datos["ultima_validacion"]
+                )
+            except:
+                _estado["ultima_validacion"] = ahora
+
+        elif valido is False:
+
+            _estado["valida"] = False
+
+        _estado["proximo_intento"] = ahora + REINTENTO
+
+        _estado["revalidando"] = False
+
+        _estado["pendiente_desde"] = None
+
+
+def _necesita_revalidar(ahora):
+
+    if _estado["revalidando"]:
+        return False
+
+    proximo = _estado["proximo_intento"]
+
+    if proximo and ahora < proximo:
+        return False
+
+    ultima = _estado["ultima_validacion"]
+
+    return ultima is None or ahora - ultima >= VIGENCIA
+
+
+def _respuesta(ahora):
+
+    pendiente = _estado["pendiente_desde"]
+
+    if pendiente and ahora - pendiente < GRACIA_PRIMERA_VALIDACION:
+        return True
+
+    return _estado["valida"]
+
+
+def _reiniciar_tras_fork():
+
+    global _candado
+
+    _candado = threading.Lock()
+
+    # El hilo que revalidaba no pasa al hijo
+    _estado["revalidando"] = False
+
+    _estado["pendiente_desde"] = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
 # =========================
 # VALIDAR SOLO 1 VEZ AL DÍA
 # =========================
 def licencia_activa():
 
-    cache = leer_cache()
+    ahora = datetime.now()
 
-    # =========================
-    # USAR CACHE SI ES RECIENTE
-    # =========================
-    if cache:
+    if _estado["cargado"] and not _necesita_revalidar(ahora):
 
-        try:
+        return _respuesta(ahora)
 
-            ultima = datetime.fromisoformat(
-                cache["ultima_validacion"]
-            )
+    with _candado:
 
-            # 🔥 24 HORAS SIN CONSULTAR
-            if datetime.now() - ultima < timedelta(hours=6):
+        if not _estado["cargado"]:
 
-                return cache.get("valida", False)
+            _cargar_desde_disco()
 
-        except:
+            _estado["cargado"] = True
 
-            pass
+        if _necesita_revalidar(ahora):
 
-    # =========================
-    # VALIDAR ONLINE
-    # =========================
-    valido, _ = validar_online()
+            _estado["revalidando"] = True
+
+            # Nunca se ha intentado: queda pendiente
+            if (
+                _estado["ultima_validacion"] is None
+                and _estado["proximo_intento"] is None
+            ):
+                _estado["pendiente_desde"] = ahora
+
+            threading.Thread(
+                target=_revalidar,
+                name="revalidar-licencia",
+                daemon=True
+            ).start()
 
-    return valido
\ No newline at end of file
+        return _respuesta(ahora)
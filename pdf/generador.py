@@ -16,23 +16,34 @@ from datetime import datetime
 import uuid
 import qrcode
 
+from utils.cache_configuracion import (
+    obtener_configuracion,
+    decodificar_escudo
+)
+
+from utils.medios import abrir_medio, leer_medio
+
+from database.proyecciones import proyeccion
+
+from utils.registro_escolar import calificaciones_de
+
+from utils.normalizar import buscar_alumno
+
 from database.mongo import (
-    configuracion,
-    alumnos,
     movimientos_pagos,
     pagos
 )
 
 # ================= CONFIG =================
 def obtener_config():
-    config = configuracion.find_one() or {}
+    config = obtener_configuracion() or {}
 
     return (
         config.get("escuela", "Nombre de la escuela"),
         config.get("ciclo", "Ciclo escolar"),
         config.get("director", "Director"),
         config.get("direccion", ""),
-        config.get("escudo", None)
+        config.get("escudo_id") or config.get("escudo")
     )
 
 
@@ -64,8 +75,10 @@ def dibujar_escudo(c, escudo):
         return
 
     try:
-        if isinstance(escudo, str) and len(escudo) > 100:
-            img = ImageReader(BytesIO(base64.b64decode(escudo)))
+        if isinstance(escudo, ObjectId):
+            img = ImageReader(BytesIO(leer_medio(escudo)))
+        elif isinstance(escudo, str) and len(escudo) > 100:
+            img = ImageReader(BytesIO(decodificar_escudo(escudo)))
         elif isinstance(escudo, str) and os.path.exists(escudo):
             img = ImageReader(escudo)
         else:
@@ -152,7 +165,12 @@ def firma(c, director):
 # ================= FOTO =================
 def dibujar_foto(c, foto):
     try:
-        if foto and isinstance(foto, str) and len(foto) > 100:
+        if isinstance(foto, ObjectId):
+            archivo = abrir_medio(foto)
+            if archivo:
+                img = ImageReader(BytesIO(archivo.read()))
+                c.drawImage(img, 450, 630, width=80, height=80)
+        elif foto and isinstance(foto, str) and len(foto) > 100:
             img = ImageReader(BytesIO(base64.b64decode(foto)))
             c.drawImage(img, 450, 630, width=80, height=80)
     except:
@@ -167,15 +185,13 @@ def generar_kardex(nombre):
 
     encabezado(c, escuela, ciclo, direccion, escudo, "KARDEX ACADÉMICO")
 
-    alumno = alumnos.find_one({
-    "nombre": {"$regex": f"^{nombre}$", "$options": "i"}
-}) or {}
+    alumno = buscar_alumno(nombre, proyeccion("kardex")) or {}
 
     c.setFont("Helvetica", 11)
     c.drawString(50, 670, f"Alumno: {nombre}")
     c.drawString(50, 650, f"Grupo: {alumno.get('grupo','')}")
 
-    dibujar_foto(c, alumno.get("foto"))
+    dibujar_foto(c, alumno.get("foto_id") or alumno.get("foto"))
 
     c.line(50, 630, 550, 630)
 
@@ -184,7 +200,7 @@ def generar_kardex(nombre):
     suma = 0
     total = 0
 
-    calificaciones = alumno.get("calificaciones", [])
+    calificaciones = calificaciones_de(alumno["_id"]) if alumno else []
 
     if calificaciones:
 
@@ -279,15 +295,13 @@ def generar_boleta(nombre):
 
     encabezado(c, escuela, ciclo, direccion, escudo, "BOLETA DE CALIFICACIONES")
 
-    alumno = alumnos.find_one({
-    "nombre": {"$regex": f"^{nombre}$", "$options": "i"}
-}) or {}
+    alumno = buscar_alumno(nombre, proyeccion("kardex")) or {}
 
     c.setFont("Helvetica", 11)
     c.drawString(50, 670, f"Alumno: {nombre}")
     c.drawString(50, 650, f"Grupo: {alumno.get('grupo','')}")
 
-    dibujar_foto(c, alumno.get("foto"))
+    dibujar_foto(c, alumno.get("foto_id") or alumno.get("foto"))
 
     c.line(50, 630, 550, 630)
 
@@ -295,7 +309,7 @@ def generar_boleta(nombre):
     suma = 0
     total = 0
 
-    calificaciones = alumno.get("calificaciones", [])
+    calificaciones = calificaciones_de(alumno["_id"]) if alumno else []
 
     if calificaciones:
         for cal in calificaciones:
@@ -482,7 +496,7 @@ def generar_expediente_pdf(alumno):
     c.drawString(50, 600, f"Teléfono: {alumno.get('telefono', '')}")
     c.drawString(50, 580, f"Tutor: {alumno.get('tutor', '')}")
 
-    dibujar_foto(c, alumno.get("foto"))
+    dibujar_foto(c, alumno.get("foto_id") or alumno.get("foto"))
 
     firma(c, director)
 
@@ -1412,6 +1426,9 @@ def generar_deudores_grupo_pdf(grupos):
 
     return buffer
 
+FILAS_POR_TABLA = 500
+
+
 def generar_bitacora_pagos_pdf(registros):
 
     buffer = BytesIO()
@@ -1440,17 +1457,116 @@ def generar_bitacora_pagos_pdf(registros):
         Spacer(1, 20)
     )
 
-    tabla = [
-        [
-            "Fecha",
-            "Usuario",
-            "Acción",
-            "Alumno",
-            "Folio",
-            "Monto"
-        ]
+    encabezados = [
+        "Fecha",
+        "Usuario",
+        "Acción",
+        "Alumno",
+        "Folio",
+        "Monto"
     ]
 
+    estilo = TableStyle([
+
+        (
+            'BACKGROUND',
+            (0,0),
+            (-1,0),
+            colors.HexColor("#1F4E79")
+        ),
+
+        (
+            'TEXTCOLOR',
+            (0,0),
+            (-1,0),
+            colors.white
+        ),
+
+        (
+            'FONTNAME',
+            (0,0),
+            (-1,0),
+            'Helvetica-Bold'
+        ),
+
+        (
+            'FONTSIZE',
+            (0,0),
+            (-1,-1),
+            9
+        ),
+
+        (
+            'ALIGN',
+            (0,0),
+            (0,-1),
+            'CENTER'
+        ),
+
+        (
+            'ALIGN',
+            (4,0),
+            (5,-1),
+            'CENTER'
+        ),
+
+        (
+            'ALIGN',
+            (1,1),
+            (3,-1),
+            'LEFT'
+        ),
+
+        (
+            'VALIGN',
+            (0,0),
+            (-1,-1),
+            'MIDDLE'
+        ),
+
+        (
+            'GRID',
+            (0,0),
+            (-1,-1),
+            1,
+            colors.black
+        ),
+
+        (
+            'ROWBACKGROUNDS',
+            (0,1),
+            (-1,-1),
+            [
+                colors.whitesmoke,
+                colors.beige
+            ]
+        )
+
+    ])
+
+    def agregar_tabla(filas):
+
+        t = Table(
+            [encabezados] + filas,
+            repeatRows=1,
+            colWidths=[
+                80,   # Fecha
+                110,  # Usuario
+                150,  # Acción
+                180,  # Alumno
+                90,   # Folio
+                80    # Monto
+            ]
+        )
+
+        t.setStyle(estilo)
+
+        elementos.append(t)
+
+    # Tablas de FILAS_POR_TABLA: una sola tabla enorme se
+    # parte página por página en tiempo cuadrático
+    tabla = []
+
     for r in registros:
 
         fecha = ""
@@ -1472,102 +1588,15 @@ def generar_bitacora_pagos_pdf(registros):
             ]
         )
 
-    t = Table(
-        tabla,
-        repeatRows=1,
-        colWidths=[
-            80,   # Fecha
-            110,  # Usuario
-            150,  # Acción
-            180,  # Alumno
-            90,   # Folio
-            80    # Monto
-        ]
-    )
-
-    t.setStyle(
-
-        TableStyle([
-
-            (
-                'BACKGROUND',
-                (0,0),
-                (-1,0),
-                colors.HexColor("#1F4E79")
-            ),
-
-            (
-                'TEXTCOLOR',
-                (0,0),
-                (-1,0),
-                colors.white
-            ),
-
-            (
-                'FONTNAME',
-                (0,0),
-                (-1,0),
-                'Helvetica-Bold'
-            ),
-
-            (
-                'FONTSIZE',
-                (0,0),
-                (-1,-1),
-                9
-            ),
-
-            (
-                'ALIGN',
-                (0,0),
-                (0,-1),
-                'CENTER'
-            ),
-
-            (
-                'ALIGN',
-                (4,0),
-                (5,-1),
-                'CENTER'
-            ),
-
-            (
-                'ALIGN',
-                (1,1),
-                (3,-1),
-                'LEFT'
-            ),
-
-            (
-                'VALIGN',
-                (0,0),
-                (-1,-1),
-                'MIDDLE'
-            ),
-
-            (
-                'GRID',
-                (0,0),
-                (-1,-1),
-                1,
-                colors.black
-            ),
-
-            (
-                'ROWBACKGROUNDS',
-                (0,1),
-                (-1,-1),
-                [
-                    colors.whitesmoke,
-                    colors.beige
-                ]
-            )
+        if len(tabla) >= FILAS_POR_TABLA:
 
-        ])
+            agregar_tabla(tabla)
 
-    )
+            tabla = []
 
-    elementos.append(t)
+    # Sin registros queda la tabla con solo encabezados
+    if tabla or len(elementos) == 2:
+        agregar_tabla(tabla)
 
     doc.build(elementos)
 
@@ -1,8 +1,18 @@
 # ================= IMPORTS =================
 from flask import Blueprint, render_template, request, redirect, session, send_file, url_for
 from bson.objectid import ObjectId
-import os
 from utils.backup_manager import crear_backup_sistema
+from utils.cache_configuracion import (
+    obtener_configuracion,
+    invalidar_configuracion
+)
+from utils.medios import guardar_subida, eliminar_medio
+from database.proyecciones import proyeccion
+from utils.paginacion import paginar, paginar_ranking, exportar_csv, quiere_exportar
+from utils.busqueda import filtro_busqueda, prefijos, rango_busqueda
+from utils.bitacoras import filtro_bitacora, registros_bitacora
+from utils.registro_escolar import asistencias_de, eliminar_registros
+from utils.normalizar import clave_nombre
 from datetime import datetime
 
 from database.mongo import (
@@ -18,7 +28,9 @@ from database.mongo import (
     usuarios,
     admins_secundarios,
     bitacora,
-    auditoria
+    auditoria,
+    calificaciones,
+    asistencias
 )
 
 from pdf.generador import (
@@ -42,6 +54,62 @@ def verificar_admin():
 
     return rol in ["admin", "superadmin"]
 
+
+def reemplazar_foto(alumno, archivo):
+
+    foto_id, foto_miniatura_id = guardar_subida(archivo)
+
+    if not foto_id:
+        return {}
+
+    if alumno:
+        eliminar_medio(alumno.get("foto_id"))
+
+    return {
+        "foto_id": foto_id,
+        "foto_miniatura_id": foto_miniatura_id
+    }
+
+# ================= EXPORTACIONES =================
+COLUMNAS_ALUMNOS = [
+    ("Nombre", "nombre"),
+    ("Grupo", "grupo"),
+    ("Usuario", "usuario"),
+    ("CURP", "curp"),
+    ("Teléfono", "telefono"),
+    ("Padre o tutor", "padre_nombre"),
+    ("Teléfono padre", "padre_telefono"),
+    ("Correo padre", "padre_correo")
+]
+
+COLUMNAS_REPORTES = [
+    ("Fecha", "fecha"),
+    ("Alumno", "alumno"),
+    ("Grupo", "grupo"),
+    ("Maestro", "maestro"),
+    ("Comentario", "comentario"),
+    ("Estatus", "estatus")
+]
+
+COLUMNAS_CITATORIOS = [
+    ("Alumno", "alumno"),
+    ("Grupo", "grupo"),
+    ("Maestro", "maestro"),
+    ("Motivo", "motivo"),
+    ("Fecha cita", "fecha_cita"),
+    ("Hora", "hora"),
+    ("Estatus", "estatus")
+]
+
+COLUMNAS_AVISOS = [
+    ("Fecha", "fecha"),
+    ("Tipo", "tipo"),
+    ("Grupo", "grupo"),
+    ("Título", "titulo"),
+    ("Mensaje", "mensaje"),
+    ("Autor", "autor")
+]
+
 # ================= DASHBOARD =================
 @admin_bp.route("/")
 def admin_dashboard():
@@ -49,7 +117,7 @@ def admin_dashboard():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    config = configuracion.find_one()
+    config = obtener_configuracion()
 
     if not config:
 
@@ -60,14 +128,16 @@ def admin_dashboard():
             "trimestre_3": False
         })
 
-        config = configuracion.find_one()
+        invalidar_configuracion()
+
+        config = obtener_configuracion()
 
     return render_template(
         "admin.html",
-        alumnos=list(alumnos.find()),
-        grupos=list(grupos.find()),
-        maestros=list(maestros.find()),
-        reportes=list(reportes.find()),
+        alumnos=list(alumnos.find({}, proyeccion("lista"))),
+        total_grupos=grupos.count_documents({}),
+        total_maestros=maestros.count_documents({}),
+        total_reportes=reportes.count_documents({}),
         citatorios=list(citatorios.find()),
         alumnos_riesgo=[],
         ultimos_reportes=[],
@@ -83,10 +153,32 @@ def admin_alumnos():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
+    grupo = request.args.get("grupo", "")
+
+    filtro = {"grupo": grupo} if grupo else {}
+
+    if quiere_exportar():
+        return exportar_csv(
+            alumnos,
+            filtro,
+            COLUMNAS_ALUMNOS,
+            "alumnos",
+            orden=("nombre", 1)
+        )
+
+    pagina = paginar(
+        alumnos,
+        filtro,
+        proyeccion("roster"),
+        orden=("nombre", 1)
+    )
+
     return render_template(
         "alumnos.html",
-        alumnos=list(alumnos.find()),
-        grupos=list(grupos.find())
+        alumnos=pagina["elementos"],
+        pagina=pagina,
+        grupo_actual=grupo,
+        grupos=list(grupos.find({}, {"nombre": 1}))
     )
 
 
@@ -96,18 +188,6 @@ def crear_alumno():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    foto = request.files.get("foto")
-
-    foto_base64 = ""
-
-    if foto and foto.filename:
-
-        import base64
-
-        foto_base64 = base64.b64encode(
-            foto.read()
-        ).decode("utf-8")
-
     usuario = request.form.get("usuario")
     password = request.form.get("password")
 
@@ -118,10 +198,18 @@ def crear_alumno():
     if existe:
         return "⚠️ Ya existe un alumno con ese usuario"
 
+    foto_id, foto_miniatura_id = guardar_subida(
+        request.files.get("foto")
+    )
+
     alumnos.insert_one({
 
         "nombre": request.form.get("nombre"),
 
+        "nombre_clave": clave_nombre(request.form.get("nombre")),
+
+        "busqueda": prefijos(request.form.get("nombre")),
+
         "grupo": request.form.get("grupo"),
 
         # ================= LOGIN ALUMNO =================
@@ -144,13 +232,11 @@ def crear_alumno():
         "password_padre": password,
 
         # ================= SISTEMA =================
-        "foto": foto_base64,
-
-        "rol": "alumno",
+        "foto_id": foto_id,
 
-        "calificaciones": [],
+        "foto_miniatura_id": foto_miniatura_id,
 
-        "asistencias": []
+        "rol": "alumno"
 
     })
 
@@ -170,17 +256,9 @@ def registro_completo_alumno():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    foto = request.files.get("foto")
-    ruta_foto = ""
-
-    if foto and foto.filename:
-
-        carpeta = "static/fotos"
-        os.makedirs(carpeta, exist_ok=True)
-
-        ruta_foto = f"{carpeta}/{foto.filename}"
-
-        foto.save(ruta_foto)
+    foto_id, foto_miniatura_id = guardar_subida(
+        request.files.get("foto")
+    )
 
     curp = request.form.get("curp")
     nombre = request.form.get("nombre")
@@ -200,6 +278,8 @@ def registro_completo_alumno():
     alumnos.insert_one({
 
         "nombre": nombre,
+        "nombre_clave": clave_nombre(nombre),
+        "busqueda": prefijos(nombre),
         "curp": curp,
 
         "sexo": request.form.get("sexo"),
@@ -240,11 +320,9 @@ def registro_completo_alumno():
         # ================= SISTEMA =================
         "rol": "alumno",
 
-        "foto": ruta_foto,
+        "foto_id": foto_id,
 
-        "calificaciones": [],
-
-        "asistencias": []
+        "foto_miniatura_id": foto_miniatura_id
 
     })
 
@@ -267,6 +345,10 @@ def eliminar_alumno(id):
 
     alumnos.delete_one({"_id": ObjectId(id)})
 
+    if alumno:
+        eliminar_medio(alumno.get("foto_id"))
+        eliminar_registros(alumno["_id"])
+
     bitacora.insert_one({
         "usuario": session.get("usuario"),
         "accion": "Eliminó alumno",
@@ -311,6 +393,8 @@ def crear_maestro():
 
         "nombre": request.form.get("nombre"),
 
+        "nombre_clave": clave_nombre(request.form.get("nombre")),
+
         "usuario": request.form.get("usuario"),
 
         "password": request.form.get("password"),
@@ -455,6 +539,7 @@ def crear_horario():
         "grupo": request.form.get("grupo"),
         "materia": request.form.get("materia"),
         "maestro": request.form.get("maestro"),
+        "maestro_clave": clave_nombre(request.form.get("maestro")),
         "dia": request.form.get("dia"),
         "hora": request.form.get("hora")
     })
@@ -482,24 +567,22 @@ def admin_evaluaciones():
 
     datos = []
 
-    for alumno in alumnos.find():
-
-        nombre_alumno = alumno.get("nombre", "")
-        grupo_alumno = alumno.get("grupo", "")
-
-        for cal in alumno.get("calificaciones", []):
-
-            datos.append({
-                "alumno": nombre_alumno,
-                "grupo": cal.get("grupo", grupo_alumno),
-                "materia": cal.get("materia", ""),
-                "maestro": cal.get("maestro", ""),
-                "calificacion": cal.get("calificacion", 0),
-                "trimestre": cal.get("trimestre", ""),
-                "enviado": True
-            })
+    for cal in calificaciones.find(
+        {"alumno_id": {"$exists": True}},
+        {"_id": 0, "alumno_id": 0}
+    ).sort([("grupo", 1), ("alumno", 1)]):
+
+        datos.append({
+            "alumno": cal.get("alumno", ""),
+            "grupo": cal.get("grupo", ""),
+            "materia": cal.get("materia", ""),
+            "maestro": cal.get("maestro", ""),
+            "calificacion": cal.get("calificacion", 0),
+            "trimestre": cal.get("trimestre", ""),
+            "enviado": True
+        })
 
-    config = configuracion.find_one() or {
+    config = obtener_configuracion() or {
         "trimestre_activo": "1",
         "trimestre_1": True,
         "trimestre_2": False,
@@ -522,7 +605,7 @@ def admin_configuracion():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    config = configuracion.find_one()
+    config = obtener_configuracion()
 
     return render_template(
         "configuracion.html",
@@ -538,35 +621,38 @@ def guardar_configuracion():
         return redirect(url_for("auth.login"))
 
     try:
-        import base64
+        datos = {
+            "escuela": request.form.get("escuela"),
+            "ciclo": request.form.get("ciclo"),
+            "director": request.form.get("director"),
+            "direccion": request.form.get("direccion")
+        }
+
+        escudo_id, _ = guardar_subida(
+            request.files.get("escudo"),
+            miniatura=False
+        )
+
+        cambios = {"$set": datos}
 
-        escudo_file = request.files.get("escudo")
-        escudo_base64 = None
+        if escudo_id:
 
-        if escudo_file and escudo_file.filename:
-            escudo_base64 = base64.b64encode(
-                escudo_file.read()
-            ).decode("utf-8")
+            config_actual = obtener_configuracion() or {}
 
-        config_actual = configuracion.find_one()
+            datos["escudo_id"] = escudo_id
 
-        if not escudo_base64 and config_actual:
-            escudo_base64 = config_actual.get("escudo")
+            cambios["$unset"] = {"escudo": ""}
+
+            eliminar_medio(config_actual.get("escudo_id"))
 
         configuracion.update_one(
             {},
-            {
-                "$set": {
-                    "escuela": request.form.get("escuela"),
-                    "ciclo": request.form.get("ciclo"),
-                    "director": request.form.get("director"),
-                    "direccion": request.form.get("direccion"),
-                    "escudo": escudo_base64
-                }
-            },
+            cambios,
             upsert=True
         )
 
+        invalidar_configuracion()
+
         return redirect("/admin/configuracion")
 
     except Exception as e:
@@ -719,6 +805,8 @@ def activar_trimestre_numero(numero):
         upsert=True
     )
 
+    invalidar_configuracion()
+
     bitacora.insert_one({
         "usuario": session.get("usuario"),
         "accion": "Activó trimestre",
@@ -746,6 +834,8 @@ def activar_captura():
         upsert=True
     )
 
+    invalidar_configuracion()
+
     bitacora.insert_one({
         "usuario": session.get("usuario"),
         "accion": "Activó captura evaluaciones",
@@ -772,6 +862,8 @@ def desactivar_captura():
         upsert=True
     )
 
+    invalidar_configuracion()
+
     bitacora.insert_one({
         "usuario": session.get("usuario"),
         "accion": "Desactivó captura evaluaciones",
@@ -799,6 +891,8 @@ def deshabilitar_trimestre(numero):
         upsert=True
     )
 
+    invalidar_configuracion()
+
     bitacora.insert_one({
         "usuario": session.get("usuario"),
         "accion": "Deshabilitó trimestre",
@@ -815,10 +909,16 @@ def admin_citatorios():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
+    if quiere_exportar():
+        return exportar_csv(citatorios, {}, COLUMNAS_CITATORIOS, "citatorios")
+
+    pagina = paginar(citatorios)
+
     return render_template(
         "citatorios.html",
-        citatorios=list(citatorios.find()),
-        alumnos=list(alumnos.find())
+        citatorios=pagina["elementos"],
+        pagina=pagina,
+        alumnos=list(alumnos.find({}, proyeccion("lista")))
     )
 
 
@@ -1019,9 +1119,10 @@ def editar_expediente(id):
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    alumno = alumnos.find_one({
-        "_id": ObjectId(id)
-    })
+    alumno = alumnos.find_one(
+        {"_id": ObjectId(id)},
+        proyeccion("expediente")
+    )
 
     if not alumno:
         return redirect("/admin")
@@ -1043,56 +1144,56 @@ def guardar_expediente(id):
         "_id": ObjectId(id)
     })
 
-    foto_base64 = alumno_actual.get("foto", "")
-
-    foto = request.files.get("foto")
-
-    if foto and foto.filename:
+    foto = reemplazar_foto(
+        alumno_actual,
+        request.files.get("foto")
+    )
 
-        import base64
+    cambios = {
+        "$set": {
 
-        foto_base64 = base64.b64encode(
-            foto.read()
-        ).decode("utf-8")
+            "nombre": request.form.get("nombre"),
+            "nombre_clave": clave_nombre(request.form.get("nombre")),
+            "busqueda": prefijos(request.form.get("nombre")),
+            "curp": request.form.get("curp"),
+            "sexo": request.form.get("sexo"),
+            "fecha_nacimiento": request.form.get("fecha_nacimiento"),
+            "telefono": request.form.get("telefono"),
+            "direccion": request.form.get("direccion"),
+            "escuela_procedencia": request.form.get("escuela_procedencia"),
+            "promedio": request.form.get("promedio"),
+            "afecciones": request.form.get("afecciones"),
 
-    alumnos.update_one(
-        {
-            "_id": ObjectId(id)
-        },
-        {
-            "$set": {
+            "padre_nombre": request.form.get("padre_nombre"),
+            "padre_telefono": request.form.get("padre_telefono"),
+            "padre_correo": request.form.get("padre_correo"),
 
-                "nombre": request.form.get("nombre"),
-                "curp": request.form.get("curp"),
-                "sexo": request.form.get("sexo"),
-                "fecha_nacimiento": request.form.get("fecha_nacimiento"),
-                "telefono": request.form.get("telefono"),
-                "direccion": request.form.get("direccion"),
-                "escuela_procedencia": request.form.get("escuela_procedencia"),
-                "promedio": request.form.get("promedio"),
-                "afecciones": request.form.get("afecciones"),
+            "grupo": request.form.get("grupo"),
 
-                "padre_nombre": request.form.get("padre_nombre"),
-                "padre_telefono": request.form.get("padre_telefono"),
-                "padre_correo": request.form.get("padre_correo"),
+            "usuario": request.form.get("usuario"),
 
-                "grupo": request.form.get("grupo"),
+            "password": request.form.get("password"),
 
-                "usuario": request.form.get("usuario"),
+            # 🔥 VISIBLES EN ADMIN
+            "password_admin": request.form.get("password"),
 
-                "password": request.form.get("password"),
+            # 🔥 LOGIN PADRE
+            "usuario_padre": request.form.get("padre_correo"),
 
-                # 🔥 VISIBLES EN ADMIN
-                "password_admin": request.form.get("password"),
+            "password_padre": request.form.get("password"),
 
-                # 🔥 LOGIN PADRE
-                "usuario_padre": request.form.get("padre_correo"),
+            **foto
+        }
+    }
 
-                "password_padre": request.form.get("password"),
+    if foto:
+        cambios["$unset"] = {"foto": ""}
 
-                "foto": foto_base64
-            }
-        }
+    alumnos.update_one(
+        {
+            "_id": ObjectId(id)
+        },
+        cambios
     )
 
     bitacora.insert_one({
@@ -1110,13 +1211,16 @@ def expediente_alumno(id):
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    alumno = alumnos.find_one({
-        "_id": ObjectId(id)
-    })
+    alumno = alumnos.find_one(
+        {"_id": ObjectId(id)},
+        proyeccion("expediente")
+    )
 
     if not alumno:
         return redirect("/admin")
 
+    alumno["asistencias"] = asistencias_de(alumno["_id"])
+
     return render_template(
         "expediente.html",
         alumno=alumno
@@ -1137,20 +1241,44 @@ def admin_expedientes():
     if grupo:
         filtro["grupo"] = grupo
 
-    if buscar:
-        filtro["nombre"] = {
-            "$regex": buscar,
-            "$options": "i"
-        }
+    busqueda = filtro_busqueda(buscar)
 
-    lista_alumnos = list(
-        alumnos.find(filtro)
-    )
+    filtro.update(busqueda)
+
+    if quiere_exportar():
+        return exportar_csv(
+            alumnos,
+            filtro,
+            COLUMNAS_ALUMNOS,
+            "expedientes",
+            orden=("nombre", 1)
+        )
+
+    if busqueda:
+
+        # Con búsqueda: primero los nombres que más se parecen
+        pagina = paginar_ranking(
+            alumnos,
+            filtro,
+            rango_busqueda(buscar, "nombre_clave"),
+            "nombre",
+            proyeccion("roster")
+        )
+
+    else:
+
+        pagina = paginar(
+            alumnos,
+            filtro,
+            proyeccion("roster"),
+            orden=("nombre", 1)
+        )
 
     return render_template(
         "expedientes_admin.html",
-        alumnos=lista_alumnos,
-        grupos=list(grupos.find()),
+        alumnos=pagina["elementos"],
+        pagina=pagina,
+        grupos=list(grupos.find({}, {"nombre": 1})),
         grupo_actual=grupo,
         buscar_actual=buscar
     )
@@ -1162,9 +1290,15 @@ def admin_reportes():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
+    if quiere_exportar():
+        return exportar_csv(reportes, {}, COLUMNAS_REPORTES, "reportes")
+
+    pagina = paginar(reportes)
+
     return render_template(
         "reportes.html",
-        reportes=list(reportes.find())
+        reportes=pagina["elementos"],
+        pagina=pagina
     )
 
 # ================= APROBAR REPORTE =================
@@ -1240,11 +1374,21 @@ def admin_avisos():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
+    if quiere_exportar():
+        return exportar_csv(
+            avisos,
+            {},
+            COLUMNAS_AVISOS,
+            "avisos",
+            orden=("fecha", -1)
+        )
+
+    pagina = paginar(avisos, orden=("fecha", -1))
+
     return render_template(
         "avisos.html",
-        avisos=list(
-            avisos.find().sort("fecha", -1)
-        )
+        avisos=pagina["elementos"],
+        pagina=pagina
     )
 
 
@@ -1333,9 +1477,10 @@ def expediente_pdf(id):
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    alumno = alumnos.find_one({
-        "_id": ObjectId(id)
-    })
+    alumno = alumnos.find_one(
+        {"_id": ObjectId(id)},
+        proyeccion("expediente")
+    )
 
     if not alumno:
         return redirect("/admin")
@@ -1365,16 +1510,9 @@ def auditoria_pdf():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    usuario = request.args.get("usuario", "")
-    fecha = request.args.get("fecha", "")
-
-    filtro = {}
-
-    if usuario:
-        filtro["usuario"] = usuario
-
-    registros = list(
-        auditoria.find(filtro).sort("fecha", -1)
+    registros = registros_bitacora(
+        auditoria,
+        filtro_bitacora(request.args)
     )
 
     pdf = generar_auditoria_pdf(registros)
@@ -1401,15 +1539,9 @@ def bitacora_pdf():
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    usuario = request.args.get("usuario", "")
-
-    filtro = {}
-
-    if usuario:
-        filtro["usuario"] = usuario
-
-    registros = list(
-        bitacora.find(filtro).sort("fecha", -1)
+    registros = registros_bitacora(
+        bitacora,
+        filtro_bitacora(request.args)
     )
 
     pdf = generar_bitacora_pdf(registros)
@@ -1450,22 +1582,23 @@ def subir_foto_alumno(id):
     if not verificar_admin():
         return redirect(url_for("auth.login"))
 
-    foto = request.files.get("foto")
-
-    if foto and foto.filename:
+    alumno = alumnos.find_one(
+        {"_id": ObjectId(id)},
+        {"foto_id": 1}
+    )
 
-        import base64
+    foto = reemplazar_foto(
+        alumno,
+        request.files.get("foto")
+    )
 
-        foto_base64 = base64.b64encode(
-            foto.read()
-        ).decode("utf-8")
+    if alumno and foto:
 
         alumnos.update_one(
             {"_id": ObjectId(id)},
             {
-                "$set": {
-                    "foto": foto_base64
-                }
+                "$set": foto,
+                "$unset": {"foto": ""}
             }
         )
 
@@ -1507,41 +1640,6 @@ def descargar_backup():
 
     return crear_backup_sistema()
 
-    import json
-    from io import BytesIO
-
-    backup = {
-        "alumnos": list(alumnos.find({}, {"_id": 0})),
-        "maestros": list(maestros.find({}, {"_id": 0})),
-        "grupos": list(grupos.find({}, {"_id": 0})),
-        "materias": list(materias.find({}, {"_id": 0})),
-        "horarios": list(horarios.find({}, {"_id": 0})),
-        "reportes": list(reportes.find({}, {"_id": 0})),
-        "citatorios": list(citatorios.find({}, {"_id": 0})),
-        "avisos": list(avisos.find({}, {"_id": 0})),
-        "configuracion": list(configuracion.find({}, {"_id": 0}))
-    }
-
-    archivo = BytesIO()
-
-    archivo.write(
-        json.dumps(
-            backup,
-            indent=4,
-            default=str,
-            ensure_ascii=False
-        ).encode("utf-8")
-    )
-
-    archivo.seek(0)
-
-    return send_file(
-        archivo,
-        as_attachment=True,
-        download_name="backup_sistema.json",
-        mimetype="application/json"
-    )
-
 
 # ================= RESET TOTAL =================
 @admin_bp.route("/reset_total", methods=["POST"])
@@ -1569,6 +1667,8 @@ def reset_total():
     reportes.delete_many({})
     citatorios.delete_many({})
     avisos.delete_many({})
+    calificaciones.delete_many({})
+    asistencias.delete_many({})
     auditoria.delete_many({})
     bitacora.delete_many({})
 
@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template, session, redirect
 from database.mongo import alumnos, avisos
 
+from utils.permisos import requiere_rol
+from database.proyecciones import proyeccion
+from utils.registro_escolar import calificaciones_de
+
 alumno_bp = Blueprint("alumno", __name__)
 
 
@@ -9,26 +13,36 @@ def verificar_alumno():
 
 
 @alumno_bp.route("/panel_alumno")
+@requiere_rol("alumno")
 def panel_alumno():
 
     if not verificar_alumno():
         return redirect("/")
 
-    alumno = alumnos.find_one({"usuario": session.get("usuario")})
+    alumno = alumnos.find_one(
+        {"usuario": session.get("usuario")},
+        proyeccion("kardex")
+    )
 
     if not alumno:
         return "Alumno no encontrado"
 
+    alumno["calificaciones"] = calificaciones_de(alumno["_id"])
+
     return render_template("panel_alumno.html", alumno=alumno)
 
 
 @alumno_bp.route("/avisos_alumno")
+@requiere_rol("alumno")
 def ver_avisos_alumno():
 
     if not verificar_alumno():
         return redirect("/")
 
-    alumno = alumnos.find_one({"usuario": session.get("usuario")})
+    alumno = alumnos.find_one(
+        {"usuario": session.get("usuario")},
+        proyeccion("grupo")
+    ) or {}
 
     lista_avisos = list(avisos.find({
         "$or": [
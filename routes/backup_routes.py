@@ -1,6 +1,5 @@
 from flask import (
     Blueprint,
-    send_file,
     request,
     redirect,
     render_template,
@@ -8,24 +7,19 @@ from flask import (
     url_for
 )
 
-from io import BytesIO
+from database.mongo import configuracion_backups
 
+from utils.backup_manager import *
 
+from utils.respaldos_incrementales import MODOS
 
-from database.mongo import (
-    alumnos,
-    reportes,
-    citatorios,
-    configuracion,
-    configuracion_backups
+from utils.restauracion import (
+    obtener_progreso,
+    restauracion_en_curso
 )
 
-from utils.backup_manager import *
-
 from datetime import datetime, timedelta
 
-import json
-
 backup_bp = Blueprint("backup", __name__, url_prefix="/admin/backup")
 
 
@@ -48,32 +42,18 @@ def restaurar_backup_archivo():
     if not archivo:
         return "❌ No se subió archivo"
 
-    try:
-        data = json.load(archivo)
-
-        # ⚠️ BORRAR DATOS ACTUALES (controlado)
-        alumnos.delete_many({})
-        reportes.delete_many({})
-        citatorios.delete_many({})
-        configuracion.delete_many({})
-
-        # 🔥 INSERTAR BACKUP
-        if "alumnos" in data:
-            alumnos.insert_many(data["alumnos"])
-
-        if "reportes" in data:
-            reportes.insert_many(data["reportes"])
-
-        if "citatorios" in data:
-            citatorios.insert_many(data["citatorios"])
-
-        if "configuracion" in data:
-            configuracion.insert_many(data["configuracion"])
+    # Se carga en temporales desde el archivo, por lotes, y
+    # solo al final reemplaza las colecciones actuales
+    resultado, detalle = restaurar_archivo(
+        archivo.stream,
+        archivo.filename,
+        "Administrador"
+    )
 
-        return redirect("/admin")
+    if not resultado:
+        return f"🔥 ERROR AL RESTAURAR: {detalle}"
 
-    except Exception as e:
-        return f"🔥 ERROR AL RESTAURAR: {str(e)}"
+    return redirect("/admin")
 
 @backup_bp.route("/financiero")
 def descargar_backup_financiero():
@@ -85,119 +65,6 @@ def descargar_backup_control_escolar():
 
     return crear_backup_control_escolar()
 
-def verificar_respaldos_automaticos():
-
-    ahora = datetime.now()
-
-    configuraciones = configuracion_backups.find(
-        {
-            "activo": True
-        }
-    )
-
-    for config in configuraciones:
-
-        proxima = config.get(
-            "proxima_ejecucion"
-        )
-
-        if not proxima:
-            continue
-
-        if ahora < proxima:
-            continue
-
-        tipo = config.get(
-            "tipo"
-        )
-
-        if tipo == "sistema":
-
-            crear_backup_sistema()
-
-            configuracion_backups.update_one(
-
-                {
-                    "_id": config["_id"]
-                },
-
-                {
-                    "$set": {
-
-                        "ultima_ejecucion": ahora,
-
-                        "proxima_ejecucion":
-                            ahora + timedelta(
-                                hours=config.get(
-                                    "intervalo",
-                                    24
-                                )
-                            )
-
-                    }
-
-                }
-
-            )
-
-        elif tipo == "financiero":
-
-            crear_backup_financiero()
-
-            configuracion_backups.update_one(
-
-                {
-                    "_id": config["_id"]
-                },
-
-                {
-                    "$set": {
-
-                        "ultima_ejecucion": ahora,
-
-                        "proxima_ejecucion":
-                            ahora + timedelta(
-                                hours=config.get(
-                                    "intervalo",
-                                    24
-                                )
-                            )
-
-                    }
-
-                }
-
-            )
-
-        elif tipo == "control_escolar":
-
-            crear_backup_control_escolar()
-
-            configuracion_backups.update_one(
-
-                {
-                    "_id": config["_id"]
-                },
-
-                {
-                    "$set": {
-
-                        "ultima_ejecucion": ahora,
-
-                        "proxima_ejecucion":
-                            ahora + timedelta(
-                                hours=config.get(
-                                    "intervalo",
-                                    24
-                                )
-                            )
-
-                    }
-
-                }
-
-            )
-
 @backup_bp.route("/")
 def vista_backups():
 
@@ -207,13 +74,20 @@ def vista_backups():
 
     historial = obtener_historial_backups()
 
+    restauracion = (
+        obtener_progreso(request.args.get("restauracion"))
+        or restauracion_en_curso()
+    )
+
     return render_template(
 
         "backups.html",
 
         configuraciones=configuraciones,
 
-        historial=historial
+        historial=historial,
+
+        restauracion=restauracion
 
     )
 
@@ -235,6 +109,13 @@ def guardar_configuracion_backup():
         "activo"
     ) == "on"
 
+    modo = request.form.get(
+        "modo"
+    )
+
+    if modo not in MODOS:
+        modo = "completo"
+
     intervalo = int(
         request.form.get(
             "intervalo",
@@ -278,6 +159,8 @@ def guardar_configuracion_backup():
 
                 "intervalo": intervalo,
 
+                "modo": modo,
+
                 "activo": activo,
 
                 "ultima_actualizacion": ahora,
@@ -315,13 +198,13 @@ def eliminar_backup_historial(
     backup_id
 ):
 
-    eliminar_backup(
+    resultado, mensaje = eliminar_backup(
         backup_id
     )
 
     flash(
-        "Respaldo eliminado correctamente.",
-        "success"
+        mensaje,
+        "success" if resultado else "danger"
     )
 
     return redirect(
@@ -350,53 +233,21 @@ def descargar_backup_historial(
             "/admin/backup/"
         )
 
-    contenido = json.dumps(
-
-        backup["contenido"],
-
-        indent=4,
-
-        ensure_ascii=False,
-
-        default=str
-
-    )
-
-    memoria = BytesIO()
-
-    memoria.write(
-        contenido.encode("utf-8")
-    )
-
-    memoria.seek(0)
-
-    return send_file(
-
-        memoria,
-
-        as_attachment=True,
-
-        download_name=backup["nombre"],
-
-        mimetype="application/json"
-
+    return descargar_respaldo(
+        backup,
+        request.args.get("formato")
     )
 
 # =========================
-# RESTAURAR RESPALDO FINANCIERO
+# RESTAURAR RESPALDO
 # =========================
-
-@backup_bp.route(
-    "/restaurar_financiero/<backup_id>",
-    methods=["POST"]
-)
-def restaurar_financiero(
-    backup_id
-):
+# La restauración corre en segundo plano; la vista de
+# respaldos consulta su avance en /restauracion/<id>.
+def _iniciar_restauracion(backup_id):
 
     usuario = "Administrador"
 
-    resultado, mensaje = restaurar_backup(
+    resultado, detalle = iniciar_restauracion(
 
         backup_id,
 
@@ -404,74 +255,91 @@ def restaurar_financiero(
 
     )
 
-    if resultado:
+    if not resultado:
 
         flash(
 
-            mensaje,
+            detalle,
 
-            "success"
+            "danger"
 
         )
 
-    else:
+        return redirect(
 
-        flash(
+            "/admin/backup/"
 
-            mensaje,
+        )
 
-            "danger"
+    flash(
 
-        )
+        "Restauración en curso. Los datos actuales siguen disponibles hasta el intercambio final.",
+
+        "info"
+
+    )
 
     return redirect(
 
-        "/admin/backup/"
+        url_for(
+            "backup.vista_backups",
+            restauracion=str(detalle)
+        )
 
     )
 
+
 @backup_bp.route(
-    "/restaurar_control_escolar/<backup_id>",
-    methods=["POST"]
+    "/restauracion/<restauracion_id>"
 )
-def restaurar_control_escolar(
-    backup_id
+def progreso_restauracion(
+    restauracion_id
 ):
 
-    usuario = "Administrador"
-
-    resultado, mensaje = restaurar_backup(
-
-        backup_id,
-
-        usuario
-
+    progreso = obtener_progreso(
+        restauracion_id
     )
 
-    if resultado:
+    if progreso is None:
 
-        flash(
+        return {"status": "error", "msg": "No existe la restauración."}, 404
 
-            mensaje,
+    colecciones = progreso.get("colecciones", {})
 
-            "success"
+    return {
+        "status": "ok",
+        "estado": progreso["estado"],
+        "etapa": progreso["etapa"],
+        "mensaje": progreso.get("mensaje", ""),
+        "backup": progreso.get("backup"),
+        "cargados": sum(c.get("cargados", 0) for c in colecciones.values()),
+        "total": sum(c.get("total", 0) for c in colecciones.values()),
+        "colecciones": colecciones
+    }
 
-        )
-
-    else:
-
-        flash(
 
-            mensaje,
-
-            "danger"
-
-        )
+@backup_bp.route(
+    "/restaurar_financiero/<backup_id>",
+    methods=["POST"]
+)
+def restaurar_financiero(
+    backup_id
+):
 
-    return redirect(
+    return _iniciar_restauracion(
+        backup_id
+    )
 
-        "/admin/backup/"
+@backup_bp.route(
+    "/restaurar_control_escolar/<backup_id>",
+    methods=["POST"]
+)
+def restaurar_control_escolar(
+    backup_id
+):
 
+    return _iniciar_restauracion(
+        backup_id
     )
 
 @backup_bp.route(
@@ -482,38 +350,6 @@ def restaurar_sistema(
     backup_id
 ):
 
-    usuario = "Administrador"
-
-    resultado, mensaje = restaurar_backup(
-
-        backup_id,
-
-        usuario
-
+    return _iniciar_restauracion(
+        backup_id
     )
-
-    if resultado:
-
-        flash(
-
-            mensaje,
-
-            "success"
-
-        )
-
-    else:
-
-        flash(
-
-            mensaje,
-
-            "danger"
-
-        )
-
-    return redirect(
-
-        "/admin/backup/"
-
-    )
\ No newline at end of file
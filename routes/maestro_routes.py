@@ -9,7 +9,6 @@ from database.mongo import (
     alumnos,
     maestros,
     horarios,
-    configuracion,
     citatorios,
     avisos,
     reportes,
@@ -18,6 +17,24 @@ from database.mongo import (
 
 from pdf.generador import generar_citatorio_pdf
 
+from utils.cache_configuracion import obtener_configuracion
+
+from utils.permisos import requiere_rol
+
+from database.proyecciones import proyeccion
+
+from utils.normalizar import buscar_alumno, filtro_horarios_maestro
+
+from utils.registro_escolar import (
+    ESTADOS_ASISTENCIA,
+    adjuntar_calificaciones,
+    guardar_asistencia as guardar_asistencia_alumno,
+    guardar_asistencias,
+    guardar_calificacion,
+    guardar_calificaciones,
+    normalizar_fecha
+)
+
 maestro_bp = Blueprint("maestro", __name__)
 
 
@@ -28,6 +45,7 @@ def verificar_maestro():
 
 # ================= PANEL =================
 @maestro_bp.route("/panel_maestro")
+@requiere_rol("maestro")
 def panel_maestro():
 
     if not verificar_maestro():
@@ -57,45 +75,21 @@ def panel_maestro():
             )
         )
 
-    lista_alumnos = list(
-        alumnos.find({
-            "grupo": {
-                "$in": grupos
-            }
-        })
+    lista_alumnos = adjuntar_calificaciones(
+        list(
+            alumnos.find({
+                "grupo": {
+                    "$in": grupos
+                }
+            }, proyeccion("roster"))
+        )
     )
 
-    nombre_maestro = maestro.get("nombre", "")
-
-    usuario_maestro = maestro.get("usuario", "")
-
     lista_horarios = list(
-        horarios.find({
-            "$or": [
-                {
-                    "maestro": {
-                        "$regex": f"^{nombre_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "maestro": {
-                        "$regex": f"^{usuario_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "grupo": {
-                        "$in": grupos
-                    }
-                }
-            ]
-        })
+        horarios.find(filtro_horarios_maestro(maestro))
     )
 
-    config = configuracion.find_one(
-        sort=[("_id", -1)]
-    ) or {
+    config = obtener_configuracion() or {
         "captura_evaluaciones": True,
         "trimestre_1": True,
         "trimestre_2": False,
@@ -115,12 +109,13 @@ def panel_maestro():
 
 # ================= GUARDAR CALIFICACIONES =================
 @maestro_bp.route("/guardar_calificaciones_ajax", methods=["POST"])
+@requiere_rol("maestro")
 def guardar_calificaciones_ajax():
 
     if not verificar_maestro():
         return {"status": "error"}
 
-    config = configuracion.find_one() or {}
+    config = obtener_configuracion() or {}
 
     if not config.get("captura_evaluaciones", True):
         return {
@@ -149,12 +144,7 @@ def guardar_calificaciones_ajax():
 
     nombre_maestro = maestro_actual.get("nombre", "")
 
-    alumno_db = alumnos.find_one({
-        "nombre": {
-            "$regex": f"^{alumno}$",
-            "$options": "i"
-        }
-    })
+    alumno_db = buscar_alumno(alumno, proyeccion("lista"))
 
     if not alumno_db:
         return {
@@ -162,41 +152,159 @@ def guardar_calificaciones_ajax():
             "msg": "Alumno no encontrado"
         }
 
-    grupo = alumno_db.get("grupo", "")
+    guardar_calificacion(
+        alumno_db,
+        materia,
+        trimestre,
+        cal,
+        nombre_maestro
+    )
 
-    alumnos.update_one(
-        {"_id": alumno_db["_id"]},
-        {
-            "$pull": {
-                "calificaciones": {
-                    "materia": materia,
-                    "trimestre": trimestre
-                }
-            }
+    return {"status": "ok"}
+
+
+# ================= GUARDAR CALIFICACIONES (LOTE) =================
+# Recibe la tabla completa en un solo POST:
+#   {"calificaciones": [
+#       {"alumno_id": "...", "materia": "...",
+#        "trimestre": "1", "calificacion": 9.5}, ...]}
+# La configuración y el maestro se leen una vez, los alumnos
+# se resuelven por id en una consulta y todo se escribe con
+# un solo bulk_write. Responde el resultado de cada fila.
+def _leer_calificacion(valor):
+
+    try:
+        cal = float(valor)
+    except (TypeError, ValueError):
+        return None
+
+    if not 0 <= cal <= 10:
+        return None
+
+    return cal
+
+
+@maestro_bp.route("/guardar_calificaciones_lote", methods=["POST"])
+@requiere_rol("maestro")
+def guardar_calificaciones_lote():
+
+    if not verificar_maestro():
+        return {"status": "error"}
+
+    config = obtener_configuracion() or {}
+
+    if not config.get("captura_evaluaciones", True):
+        return {
+            "status": "error",
+            "msg": "Captura deshabilitada"
         }
-    )
 
-    alumnos.update_one(
-        {"_id": alumno_db["_id"]},
-        {
-            "$push": {
-                "calificaciones": {
-                    "materia": materia,
-                    "calificacion": cal,
-                    "trimestre": trimestre,
-                    "grupo": grupo,
-                    "maestro": nombre_maestro,
-                    "fecha": datetime.now()
-                }
-            }
+    datos = request.get_json(silent=True) or {}
+
+    filas = datos.get("calificaciones")
+
+    if not isinstance(filas, list):
+        return {
+            "status": "error",
+            "msg": "Formato inválido"
         }
-    )
 
-    return {"status": "ok"}
+    maestro_actual = maestros.find_one(
+        {"usuario": session.get("usuario")},
+        {"nombre": 1, "grupos": 1}
+    ) or {}
+
+    nombre_maestro = maestro_actual.get("nombre", "")
+
+    grupos_maestro = set(maestro_actual.get("grupos", []))
+
+    resultados = [None] * len(filas)
+
+    validas = []
+
+    for indice, fila in enumerate(filas):
+
+        if not isinstance(fila, dict):
+            resultados[indice] = "Formato inválido"
+            continue
+
+        trimestre = str(fila.get("trimestre", ""))
+
+        if not config.get(f"trimestre_{trimestre}", False):
+            resultados[indice] = "Trimestre deshabilitado"
+            continue
+
+        materia = fila.get("materia")
+
+        if not materia:
+            resultados[indice] = "Materia requerida"
+            continue
+
+        cal = _leer_calificacion(fila.get("calificacion"))
+
+        if cal is None:
+            resultados[indice] = "Calificación inválida"
+            continue
+
+        alumno_id = str(fila.get("alumno_id", ""))
+
+        if not ObjectId.is_valid(alumno_id):
+            resultados[indice] = "Alumno no encontrado"
+            continue
+
+        validas.append((indice, ObjectId(alumno_id), materia, trimestre, cal))
+
+    por_id = {
+        alumno["_id"]: alumno
+        for alumno in alumnos.find(
+            {"_id": {"$in": list({fila[1] for fila in validas})}},
+            proyeccion("lista")
+        )
+    } if validas else {}
+
+    indices = []
+    registros = []
+
+    for indice, alumno_id, materia, trimestre, cal in validas:
+
+        alumno = por_id.get(alumno_id)
+
+        if not alumno:
+            resultados[indice] = "Alumno no encontrado"
+            continue
+
+        if alumno.get("grupo") not in grupos_maestro:
+            resultados[indice] = "Alumno fuera de sus grupos"
+            continue
+
+        indices.append(indice)
+        registros.append((alumno, materia, trimestre, cal))
+
+    fallos = guardar_calificaciones(registros, nombre_maestro)
+
+    for posicion, indice in enumerate(indices):
+        resultados[indice] = fallos.get(posicion)
+
+    guardadas = sum(1 for msg in resultados if msg is None)
+
+    return {
+        "status": "ok",
+        "guardadas": guardadas,
+        "errores": len(resultados) - guardadas,
+        "resultados": [
+            {
+                "indice": indice,
+                "status": "ok" if msg is None else "error",
+                "msg": msg or ""
+            }
+            for indice, msg in enumerate(resultados)
+        ]
+    }
 
 
 # ================= HORARIO =================
 @maestro_bp.route("/horario")
+@requiere_rol("maestro")
 def horario_maestro():
 
     if not verificar_maestro():
@@ -206,32 +314,8 @@ def horario_maestro():
         "usuario": session.get("usuario")
     }) or {}
 
-    nombre_maestro = maestro_actual.get("nombre", "")
-    usuario_maestro = maestro_actual.get("usuario", "")
-    grupos = maestro_actual.get("grupos", [])
-
     lista_horarios = list(
-        horarios.find({
-            "$or": [
-                {
-                    "maestro": {
-                        "$regex": f"^{nombre_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "maestro": {
-                        "$regex": f"^{usuario_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "grupo": {
-                        "$in": grupos
-                    }
-                }
-            ]
-        })
+        horarios.find(filtro_horarios_maestro(maestro_actual))
     )
 
     return render_template(
@@ -242,12 +326,14 @@ def horario_maestro():
 
 # ================= PDF HORARIO =================
 @maestro_bp.route("/horario/pdf")
+@requiere_rol("maestro")
 def horario_pdf():
     return redirect("/descargar_horario")
 
 
 # ================= DESCARGAR HORARIO =================
 @maestro_bp.route("/descargar_horario")
+@requiere_rol("maestro")
 def descargar_horario():
 
     if not verificar_maestro():
@@ -258,31 +344,9 @@ def descargar_horario():
     }) or {}
 
     nombre_maestro = maestro_actual.get("nombre", "")
-    usuario_maestro = maestro_actual.get("usuario", "")
-    grupos = maestro_actual.get("grupos", [])
 
     lista_horarios = list(
-        horarios.find({
-            "$or": [
-                {
-                    "maestro": {
-                        "$regex": f"^{nombre_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "maestro": {
-                        "$regex": f"^{usuario_maestro}$",
-                        "$options": "i"
-                    }
-                },
-                {
-                    "grupo": {
-                        "$in": grupos
-                    }
-                }
-            ]
-        })
+        horarios.find(filtro_horarios_maestro(maestro_actual))
     )
 
     buffer = BytesIO()
@@ -330,6 +394,7 @@ def descargar_horario():
 
 # ================= CITATORIOS =================
 @maestro_bp.route("/citatorios")
+@requiere_rol("maestro")
 def citatorios_maestro():
 
     if not verificar_maestro():
@@ -346,7 +411,7 @@ def citatorios_maestro():
             "grupo": {
                 "$in": grupos
             }
-        })
+        }, proyeccion("lista"))
     )
 
     lista_citatorios = list(
@@ -362,6 +427,7 @@ def citatorios_maestro():
 
 # ================= CREAR CITATORIO =================
 @maestro_bp.route("/crear_citatorio", methods=["POST"])
+@requiere_rol("maestro")
 def crear_citatorio_maestro():
 
     if not verificar_maestro():
@@ -393,6 +459,7 @@ def crear_citatorio_maestro():
 
 # ================= PDF CITATORIO =================
 @maestro_bp.route("/generar_citatorio/<id>")
+@requiere_rol("maestro")
 def generar_citatorio(id):
 
     if not verificar_maestro():
@@ -415,6 +482,7 @@ def generar_citatorio(id):
 
 # ================= CONFIRMAR ASISTENCIA =================
 @maestro_bp.route("/confirmar_asistencia/<id>")
+@requiere_rol("maestro")
 def confirmar_asistencia_maestro(id):
 
     if not verificar_maestro():
@@ -434,6 +502,7 @@ def confirmar_asistencia_maestro(id):
 
 
 @maestro_bp.route("/avisos_maestro")
+@requiere_rol("maestro")
 def avisos_maestro():
 
     if not verificar_maestro():
@@ -456,6 +525,7 @@ def avisos_maestro():
 
 # ================= CREAR AVISO =================
 @maestro_bp.route("/crear_aviso_maestro", methods=["POST"])
+@requiere_rol("maestro")
 def crear_aviso_maestro():
 
     if not verificar_maestro():
@@ -480,6 +550,7 @@ def crear_aviso_maestro():
 
 # ================= ASISTENCIAS =================
 @maestro_bp.route("/asistencias")
+@requiere_rol("maestro")
 def asistencias_maestro():
 
     if not verificar_maestro():
@@ -496,7 +567,7 @@ def asistencias_maestro():
             "grupo": {
                 "$in": grupos_maestro
             }
-        })
+        }, proyeccion("roster"))
     )
 
     fecha = datetime.now().strftime("%d/%m/%Y")
@@ -510,6 +581,7 @@ def asistencias_maestro():
 
 # ================= GUARDAR ASISTENCIA =================
 @maestro_bp.route("/guardar_asistencia", methods=["POST"])
+@requiere_rol("maestro")
 def guardar_asistencia():
 
     if not verificar_maestro():
@@ -517,49 +589,33 @@ def guardar_asistencia():
 
     alumno_id = request.form.get("alumno")
 
-    fecha = request.form.get("fecha")
+    fecha = normalizar_fecha(request.form.get("fecha"))
 
     estado = request.form.get("estado")
 
-    alumno = alumnos.find_one({
-        "_id": ObjectId(alumno_id)
-    })
+    if not fecha:
+        return redirect("/asistencias")
+
+    alumno = alumnos.find_one(
+        {"_id": ObjectId(alumno_id)},
+        proyeccion("lista")
+    )
 
     if not alumno:
         return redirect("/panel_maestro")
 
-    alumnos.update_one(
-        {
-            "_id": ObjectId(alumno_id)
-        },
-        {
-            "$pull": {
-                "asistencias": {
-                    "fecha": fecha
-                }
-            }
-        }
-    )
-
-    alumnos.update_one(
-        {
-            "_id": ObjectId(alumno_id)
-        },
-        {
-            "$push": {
-                "asistencias": {
-                    "fecha": fecha,
-                    "estado": estado,
-                    "maestro": session.get("usuario")
-                }
-            }
-        }
+    guardar_asistencia_alumno(
+        alumno,
+        fecha,
+        estado,
+        session.get("usuario")
     )
 
     return redirect("/asistencias")
 
 # ================= AJAX ASISTENCIAS =================
 @maestro_bp.route("/guardar_asistencia_ajax", methods=["POST"])
+@requiere_rol("maestro")
 def guardar_asistencia_ajax():
 
     if not verificar_maestro():
@@ -571,9 +627,10 @@ def guardar_asistencia_ajax():
 
     try:
 
-        alumno = alumnos.find_one({
-            "_id": ObjectId(alumno_id)
-        })
+        alumno = alumnos.find_one(
+            {"_id": ObjectId(alumno_id)},
+            proyeccion("lista")
+        )
 
         if not alumno:
             return {
@@ -581,34 +638,12 @@ def guardar_asistencia_ajax():
                 "msg": "Alumno no encontrado"
             }
 
-        # ELIMINAR REGISTRO PREVIO DEL MISMO DÍA
-        alumnos.update_one(
-            {
-                "_id": ObjectId(alumno_id)
-            },
-            {
-                "$pull": {
-                    "asistencias": {
-                        "fecha": fecha
-                    }
-                }
-            }
-        )
-
-        # INSERTAR NUEVA ASISTENCIA
-        alumnos.update_one(
-            {
-                "_id": ObjectId(alumno_id)
-            },
-            {
-                "$push": {
-                    "asistencias": {
-                        "fecha": fecha,
-                        "estado": estado,
-                        "maestro": session.get("usuario")
-                    }
-                }
-            }
+        # UN REGISTRO POR ALUMNO Y DÍA
+        guardar_asistencia_alumno(
+            alumno,
+            fecha,
+            estado,
+            session.get("usuario")
         )
 
         return {
@@ -622,8 +657,106 @@ def guardar_asistencia_ajax():
             "msg": str(e)
         }
 
+# ================= PASE DE LISTA =================
+# Todo el grupo en un POST:
+#   {"grupo": "1A", "fecha": "18/10/2026",
+#    "asistencias": [{"alumno_id": "...", "estado": "Falta"}, ...]}
+# Se escribe con un solo bulk_write; repetirlo para el mismo
+# día actualiza los registros en lugar de duplicarlos.
+@maestro_bp.route("/pase_lista", methods=["POST"])
+@requiere_rol("maestro")
+def pase_lista():
+
+    if not verificar_maestro():
+        return {"status": "error"}
+
+    datos = request.get_json(silent=True) or {}
+
+    grupo = datos.get("grupo")
+
+    fecha = normalizar_fecha(datos.get("fecha"))
+
+    filas = datos.get("asistencias")
+
+    if not fecha:
+        return {
+            "status": "error",
+            "msg": "Fecha inválida"
+        }
+
+    if not isinstance(filas, list):
+        return {
+            "status": "error",
+            "msg": "Formato inválido"
+        }
+
+    maestro_actual = maestros.find_one(
+        {"usuario": session.get("usuario")},
+        {"grupos": 1}
+    ) or {}
+
+    if grupo not in maestro_actual.get("grupos", []):
+        return {
+            "status": "error",
+            "msg": "Grupo no asignado"
+        }
+
+    estados = {}
+    errores = []
+
+    for fila in filas:
+
+        if not isinstance(fila, dict):
+            continue
+
+        alumno_id = str(fila.get("alumno_id", ""))
+
+        estado = fila.get("estado")
+
+        if not ObjectId.is_valid(alumno_id) or estado not in ESTADOS_ASISTENCIA:
+            errores.append(alumno_id)
+            continue
+
+        # Si un alumno viene dos veces, gana la última marca
+        estados[ObjectId(alumno_id)] = estado
+
+    registros = []
+
+    if estados:
+
+        for alumno in alumnos.find(
+            {"_id": {"$in": list(estados)}, "grupo": grupo},
+            proyeccion("lista")
+        ):
+            registros.append((alumno, estados.pop(alumno["_id"])))
+
+    # Lo que queda no pertenece al grupo
+    errores.extend(str(alumno_id) for alumno_id in estados)
+
+    resumen = guardar_asistencias(
+        registros,
+        fecha,
+        session.get("usuario")
+    )
+
+    conteo = dict.fromkeys(ESTADOS_ASISTENCIA, 0)
+
+    for _, estado in registros:
+        conteo[estado] += 1
+
+    return {
+        "status": "ok",
+        "grupo": grupo,
+        "fecha": fecha,
+        "guardadas": len(registros) - resumen["fallidas"],
+        "conteo": conteo,
+        "errores": errores,
+        **resumen
+    }
+
 # ================= REPORTES =================
 @maestro_bp.route("/reportes_maestro")
+@requiere_rol("maestro")
 def reportes_maestro():
 
     if not verificar_maestro():
@@ -640,7 +773,7 @@ def reportes_maestro():
             "grupo": {
                 "$in": grupos_maestro
             }
-        })
+        }, proyeccion("lista"))
     )
 
     lista_reportes = list(
@@ -658,6 +791,7 @@ def reportes_maestro():
 
 # ================= CREAR REPORTE =================
 @maestro_bp.route("/crear_reporte", methods=["POST"])
+@requiere_rol("maestro")
 def crear_reporte():
 
     if not verificar_maestro():
@@ -684,6 +818,7 @@ def crear_reporte():
 
 # ================= ENVIAR REPORTES =================
 @maestro_bp.route("/enviar_reportes_maestro", methods=["POST"])
+@requiere_rol("maestro")
 def enviar_reportes_maestro():
 
     if not verificar_maestro():
@@ -0,0 +1,72 @@
+from flask import Blueprint, Response, request, abort
+
+from utils.medios import TIPO_BINARIO, TIPOS_IMAGEN, abrir_medio
+
+medios_bp = Blueprint("medios", __name__)
+
+TAMANO_BLOQUE = 256 * 1024
+
+UN_ANIO = 365 * 24 * 3600
+
+
+# =========================
+# SERVIR MEDIO
+# =========================
+# Los ids son inmutables: el ETag es el propio id y el
+# navegador puede guardar la imagen un año sin revalidar.
+#
+# Solo las imágenes reconocidas se muestran en línea; cualquier
+# otro tipo guardado (archivos anteriores a la detección) se
+# manda como descarga binaria. nosniff impide que el navegador
+# adivine un tipo distinto al enviado.
+@medios_bp.route("/media/<id>")
+def ver_medio(id):
+
+    etag = str(id)
+
+    if etag in request.if_none_match:
+
+        respuesta = Response(status=304)
+
+    else:
+
+        archivo = abrir_medio(id)
+
+        if not archivo:
+            abort(404)
+
+        def bloques():
+
+            with archivo:
+
+                while True:
+
+                    bloque = archivo.read(TAMANO_BLOQUE)
+
+                    if not bloque:
+                        break
+
+                    yield bloque
+
+        tipo = (archivo.metadata or {}).get("tipo")
+
+        respuesta = Response(
+            bloques(),
+            mimetype=tipo if tipo in TIPOS_IMAGEN else TIPO_BINARIO,
+            direct_passthrough=True
+        )
+
+        respuesta.content_length = archivo.length
+
+        if tipo not in TIPOS_IMAGEN:
+            respuesta.headers["Content-Disposition"] = "attachment"
+
+    respuesta.set_etag(etag)
+
+    respuesta.headers["X-Content-Type-Options"] = "nosniff"
+
+    respuesta.cache_control.private = True
+    respuesta.cache_control.max_age = UN_ANIO
+    respuesta.cache_control.immutable = True
+
+    return respuesta
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, session, redirect, request
+from flask import Blueprint, render_template, session, redirect, request, url_for
 from bson.objectid import ObjectId
 from datetime import datetime
 from flask import send_file
@@ -11,6 +11,13 @@ from database.mongo import (
     reportes
 )
 
+from utils.permisos import requiere_rol
+from database.proyecciones import proyeccion
+from utils.registro_escolar import (
+    calificaciones_de,
+    marcar_enterado as marcar_enterado_calificacion
+)
+
 padre_bp = Blueprint("padre", __name__)
 
 
@@ -21,6 +28,7 @@ def verificar_padre():
 
 # ================= PANEL =================
 @padre_bp.route("/panel_padre")
+@requiere_rol("padre")
 def panel_padre():
 
     if not verificar_padre():
@@ -28,7 +36,13 @@ def panel_padre():
 
     alumno_nombre = session.get("alumno")
 
-    alumno = alumnos.find_one({"nombre": alumno_nombre})
+    alumno = alumnos.find_one(
+        {"nombre": alumno_nombre},
+        proyeccion("kardex")
+    )
+
+    if alumno:
+        alumno["calificaciones"] = calificaciones_de(alumno["_id"])
 
     lista_citatorios = list(
         citatorios.find({
@@ -54,12 +68,16 @@ def panel_padre():
 
 # ================= AVISOS PADRE =================
 @padre_bp.route("/avisos_padre")  # 🔥 ruta única
+@requiere_rol("padre")
 def ver_avisos_padre():
 
     if not verificar_padre():
         return redirect(url_for("auth.login"))
 
-    alumno = alumnos.find_one({"nombre": session.get("alumno")})
+    alumno = alumnos.find_one(
+        {"nombre": session.get("alumno")},
+        proyeccion("grupo")
+    ) or {}
 
     lista_avisos = list(avisos.find({
         "$or": [
@@ -76,26 +94,26 @@ def ver_avisos_padre():
 
 # ================= ENTERADO CALIFICACIONES =================
 @padre_bp.route("/enterado", methods=["POST"])
+@requiere_rol("padre")
 def marcar_enterado():
 
     if not verificar_padre():
         return redirect(url_for("auth.login"))
 
-    alumnos.update_one(
-        {
-            "nombre": request.form.get("alumno"),
-            "calificaciones.materia": request.form.get("materia")
-        },
-        {
-            "$set": {"calificaciones.$.enterado": True}
-        }
+    alumno = alumnos.find_one(
+        {"nombre": request.form.get("alumno")},
+        {"_id": 1}
     )
 
+    if alumno:
+        marcar_enterado_calificacion(alumno["_id"], request.form.get("materia"))
+
     return redirect("/panel_padre")
 
 
 # ================= ENTERADO CITATORIOS =================
 @padre_bp.route("/enterado_citatorio/<id>")
+@requiere_rol("padre")
 def enterado_citatorio(id):
 
     if not verificar_padre():
@@ -115,6 +133,7 @@ def enterado_citatorio(id):
 
 # ================= ENTERADO REPORTE =================
 @padre_bp.route("/enterado_reporte/<id>")
+@requiere_rol("padre")
 def enterado_reporte(id):
 
     if not verificar_padre():
@@ -136,6 +155,7 @@ def enterado_reporte(id):
 
 # ================= PDF CITATORIO =================
 @padre_bp.route("/citatorio_pdf_padre/<id>")
+@requiere_rol("padre")
 def citatorio_pdf_padre(id):
 
     if not verificar_padre():
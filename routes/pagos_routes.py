@@ -23,6 +23,41 @@ from flask import (
 
 from bson.objectid import ObjectId
 
+from utils.reportes_pagos import obtener_morosos
+
+from utils.folios import siguiente_folio
+
+from utils.recargos import aplicar_recargos_lote
+
+from utils.paginacion import (
+    paginar,
+    paginar_ranking,
+    exportar_csv,
+    quiere_exportar
+)
+
+from utils.normalizar import clave_nombre
+
+from utils.busqueda import (
+    filtro_pagos,
+    prefijos
+)
+
+from utils.bitacoras import filtro_bitacora, registros_bitacora
+
+from utils.libro_pagos import (
+    aplicar_movimiento,
+    cambiar_total_debe
+)
+
+from utils.resumen_financiero import (
+    obtener_resumen,
+    registrar_cambio_pago,
+    registrar_ingreso,
+    registrar_recargos,
+    registrar_mensualidad_pagada
+)
+
 from database.mongo import (
     pagos,
     alumnos,
@@ -73,97 +108,23 @@ def registrar_bitacora_pago(
 
     })
 
-def recalcular_pago(pago_id):
-
-    movimientos = list(
-
-        movimientos_pagos.find({
-
-            "pago_id": str(pago_id),
-
-            "estatus": "activo"
-
-        })
-
-    )
-
-    pago = pagos.find_one({
-
-        "_id": ObjectId(pago_id)
-
-    })
-
-    if not pago:
-        return
-
-    total_pagado = sum(
-        m.get("monto", 0)
-        for m in movimientos
-    )
-
-    meses_pagados = len(
-
-        set(
-
-            m.get(
-                "mes_cubierto"
-            )
-
-            for m in movimientos
-
-            if (
-                m.get("metodo") != "recargo"
-                and m.get("mes_cubierto")
-            )
-
-        )
-
-    )
-
-    saldo_restante = max(
-        pago["total_debe"] - total_pagado,
-        0
-    )
-
-    if saldo_restante == 0:
-
-        estatus = "pagado"
-
-    elif total_pagado > 0:
-
-        estatus = "parcial"
-
-    else:
-
-        estatus = "pendiente"
-
-    pagos.update_one(
-
-        {
-            "_id": ObjectId(pago_id)
-        },
-
-        {
-            "$set": {
-
-                "total_pagado": total_pagado,
-
-                "saldo_restante": saldo_restante,
-
-                "meses_pagados": meses_pagados,
-
-                "estatus": estatus
-
-            }
-
-        }
-
-    )
-
-
 # =========================
 # PANEL PAGOS
 # =========================
+COLUMNAS_PAGOS = [
+    ("Alumno", "alumno"),
+    ("Grupo", "grupo"),
+    ("Tipo de cobro", "tipo_cobro"),
+    ("Mensualidad", "mensualidad"),
+    ("Meses pagados", "meses_pagados"),
+    ("Meses totales", "meses_totales"),
+    ("Total", "total_debe"),
+    ("Pagado", "total_pagado"),
+    ("Saldo", "saldo_restante"),
+    ("Estatus", "estatus")
+]
+
+
 @pagos_bp.route("/admin/pagos")
 def pagos_admin():
 
@@ -185,89 +146,64 @@ def pagos_admin():
 
     }
 
-    if busqueda:
-
-        ids_encontrados = []
-
-        for movimiento in movimientos_pagos.find({
-
-            "folio": {
-
-                "$regex": busqueda,
-
-                "$options": "i"
-
-            }
-
-        }):
-
-            ids_encontrados.append(
-
-                movimiento.get(
-
-                    "pago_id"
-
-                )
-
-            )
-
-        consulta["$or"] = [
-
-            {
+    rango = None
 
-                "alumno": {
+    if busqueda:
 
-                    "$regex": busqueda,
+        # Folio (REC-000123 o 123) y/o nombre, grupo
+        filtro, rango = filtro_pagos(busqueda)
 
-                    "$options": "i"
+        consulta.update(filtro)
 
-                }
+    if quiere_exportar():
 
-            },
+        return exportar_csv(
 
-            {
+            pagos,
 
-                "grupo": {
+            consulta,
 
-                    "$regex": busqueda,
+            COLUMNAS_PAGOS,
 
-                    "$options": "i"
+            "pagos",
 
-                }
+            orden=("alumno", 1)
 
-            },
+        )
 
-            {
+    if rango:
 
-                "_id": {
+        pagina = paginar_ranking(
 
-                    "$in": [
+            pagos,
 
-                        ObjectId(x)
+            consulta,
 
-                        for x in ids_encontrados
+            rango,
 
-                        if ObjectId.is_valid(x)
+            "alumno"
 
-                    ]
+        )
 
-                }
+    else:
 
-            }
+        pagina = paginar(
 
-        ]
+            pagos,
 
-    lista_pagos = pagos.find(
+            consulta,
 
-        consulta
+            orden=("alumno", 1)
 
-    )
+        )
 
     return render_template(
 
         "pagos_admin.html",
 
-        pagos_db=lista_pagos,
+        pagos_db=pagina["elementos"],
+
+        pagina=pagina,
 
         busqueda=busqueda
 
@@ -322,6 +258,15 @@ def nuevo_pago():
                     ""
                 ),
 
+            "alumno_clave":
+                clave_nombre(alumno["nombre"]),
+
+            "busqueda":
+                prefijos(
+                    alumno["nombre"],
+                    alumno.get("grupo", "")
+                ),
+
             "concepto":
                 "Colegiatura",
 
@@ -346,6 +291,12 @@ def nuevo_pago():
             "meses_pagados":
                 0,
 
+            "meses_cubiertos":
+                {},
+
+            "version":
+                0,
+
             "total_debe":
                 total_debe,
 
@@ -378,6 +329,18 @@ def nuevo_pago():
 
         })
 
+        registrar_cambio_pago(
+
+            None,
+
+            {
+                "total_debe": total_debe,
+                "total_pagado": 0,
+                "saldo_restante": total_debe
+            }
+
+        )
+
         if tipo_cobro == "mensual":
 
             meses_nombres = [
@@ -545,52 +508,12 @@ def registrar_abono(id):
 
         concepto = request.form["concepto"]
 
-        ultimo = movimientos_pagos.find_one(
-
-            sort=[("_id", -1)]
-
-        )
-
-        if ultimo:
-
-            consecutivo = (
-
-                ultimo.get(
-
-                    "consecutivo",
-
-                    0
-
-                ) + 1
-
-            )
-
-        else:
-
-            consecutivo = 1
-
-        folio_recibo = (
-
-            f"REC-{consecutivo:06d}"
-
-        )
-
-        nuevo_total_pagado = (
-            pago["total_pagado"] + monto
-        )
-
-        nuevo_saldo = (
-            pago["saldo_restante"] - monto
-        )
-
-        nuevos_meses_pagados = (
-            pago["meses_pagados"] + 1
-        )
+        consecutivo, folio_recibo = siguiente_folio()
 
         # =========================
         # MOVIMIENTO FINANCIERO
         # =========================
-        movimientos_pagos.insert_one({
+        movimiento = {
 
             "consecutivo":
 
@@ -636,7 +559,11 @@ def registrar_abono(id):
 
             "estatus": "activo"
 
-        })
+        }
+
+        movimientos_pagos.insert_one(movimiento)
+
+        registrar_ingreso(monto)
 
         registrar_bitacora_pago(
 
@@ -664,7 +591,7 @@ def registrar_abono(id):
             "global"
         ) == "mensual":
 
-            mensualidades.update_one(
+            mensualidad_pagada = mensualidades.find_one_and_update(
 
                 {
                     "pago_id": str(pago["_id"]),
@@ -695,52 +622,27 @@ def registrar_abono(id):
                             metodo
 
                     }
+                },
+
+                projection={
+                    "pago_id": 1,
+                    "anio": 1,
+                    "numero_mes": 1
                 }
 
             )
-        # =========================
-        # ESTATUS
-        # =========================
-        if nuevo_saldo <= 0:
-
-            estatus = "pagado"
-
-            nuevo_saldo = 0
-
-        else:
-
-            estatus = "parcial"
 
+            registrar_mensualidad_pagada(
+                mensualidad_pagada
+            )
         # =========================
         # ACTUALIZAR CONTROL
         # =========================
-        pagos.update_one(
-
-            {
-                "_id": ObjectId(id)
-            },
-
-            {
-                "$set": {
-
-                    "total_pagado": nuevo_total_pagado,
-
-                    "saldo_restante": nuevo_saldo,
-
-                    "meses_pagados": nuevos_meses_pagados,
-
-                    "estatus": estatus
-
-                }
-            }
-
+        aplicar_movimiento(
+            pago["_id"],
+            despues=movimiento
         )
 
-        recalcular_pago(
-            str(pago["_id"])
-        )
-
-
         flash("Abono registrado")
 
         return redirect(
@@ -875,6 +777,17 @@ def editar_movimiento(id):
 
     if request.method == "POST":
 
+        if movimiento.get("estatus") == "activo":
+
+            registrar_ingreso(
+
+                float(request.form["monto"])
+                - movimiento.get("monto", 0),
+
+                movimiento.get("fecha_pago")
+
+            )
+
         movimientos_pagos.update_one(
 
             {
@@ -899,8 +812,26 @@ def editar_movimiento(id):
 
         )
 
-        recalcular_pago(
-            movimiento["pago_id"]
+        aplicar_movimiento(
+
+            movimiento["pago_id"],
+
+            antes=movimiento,
+
+            despues=dict(
+
+                movimiento,
+
+                monto=float(
+                    request.form["monto"]
+                ),
+
+                metodo=request.form["metodo"],
+
+                mes_cubierto=request.form["mes_cubierto"]
+
+            )
+
         )
 
         registrar_bitacora_pago(
@@ -963,8 +894,27 @@ def eliminar_movimiento(id):
 
         )
 
-        recalcular_pago(
-            movimiento["pago_id"]
+        if movimiento.get("estatus") == "activo":
+
+            registrar_ingreso(
+
+                -movimiento.get("monto", 0),
+
+                movimiento.get("fecha_pago")
+
+            )
+
+        aplicar_movimiento(
+
+            movimiento["pago_id"],
+
+            antes=movimiento,
+
+            despues=dict(
+                movimiento,
+                estatus="cancelado"
+            )
+
         )
 
         registrar_bitacora_pago(
@@ -1196,26 +1146,9 @@ def editar_pago(id):
 
             total = 0
 
-        pagos.update_one(
-
-            {
-                "_id": ObjectId(id)
-            },
-
-            {
-                "$set": {
-
-                    "total_debe":
-                        total
-
-                }
-
-            }
-
-        )
-
-        recalcular_pago(
-            str(pago_actualizado["_id"])
+        cambiar_total_debe(
+            pago_actualizado["_id"],
+            total
         )
 
         registrar_bitacora_pago(
@@ -1256,7 +1189,7 @@ def editar_pago(id):
 )
 def eliminar_pago(id):
 
-    pagos.update_one(
+    pago = pagos.find_one_and_update(
 
         {
             "_id": ObjectId(id)
@@ -1270,13 +1203,18 @@ def eliminar_pago(id):
 
     )
 
-    pago = pagos.find_one({
+    if pago:
 
-        "_id": ObjectId(id)
+        registrar_cambio_pago(
 
-    })
+            pago,
 
-    if pago:
+            dict(
+                pago,
+                activo=False
+            )
+
+        )
 
         registrar_bitacora_pago(
 
@@ -1364,116 +1302,33 @@ def recibo_pago(id):
 @pagos_bp.route("/admin/morosos")
 def morosos():
 
-    ids_morosos = set()
-
-    hoy = datetime.now()
-
-    for mensualidad in mensualidades.find({
+    lista = obtener_morosos()
 
-        "pagado": False
+    return render_template(
 
-    }):
+        "morosos.html",
 
-        numero_mes = mensualidad.get(
-            "numero_mes"
-        )
+        pagos_db=lista
 
-        anio = mensualidad.get(
-            "anio"
-        )
+    )
+@pagos_bp.route("/admin/corte_caja")
+def corte_caja():
 
-        if not numero_mes or not anio:
+    hoy = datetime.now().strftime(
+        "%d/%m/%Y"
+    )
 
-            continue
+    movimientos = list(
 
-        if (
+        movimientos_pagos.find({
 
-            anio < hoy.year
+            "fecha_pago": hoy,
 
-            or (
+            "estatus": "activo"
 
-                anio == hoy.year
+        })
 
-                and numero_mes < hoy.month
-
-            )
-
-        ):
-
-            ids_morosos.add(
-
-                mensualidad[
-                    "pago_id"
-                ]
-
-            )
-
-    lista = []
-
-    for pago_id in ids_morosos:
-
-        pago = pagos.find_one({
-
-            "_id": ObjectId(
-                pago_id
-            ),
-
-            "activo": {
-                "$ne": False
-            }
-
-        })
-
-        if pago:
-
-            total_recargos = 0
-
-            for m in mensualidades.find({
-
-                "pago_id": str(
-                    pago["_id"]
-                )
-
-            }):
-
-                total_recargos += m.get(
-                    "recargo",
-                    0
-                )
-
-            pago["recargos_reales"] = (
-                total_recargos
-            )
-
-            lista.append(
-                pago
-            )
-
-    return render_template(
-
-        "morosos.html",
-
-        pagos_db=lista
-
-    )
-@pagos_bp.route("/admin/corte_caja")
-def corte_caja():
-
-    hoy = datetime.now().strftime(
-        "%d/%m/%Y"
-    )
-
-    movimientos = list(
-
-        movimientos_pagos.find({
-
-            "fecha_pago": hoy,
-
-            "estatus": "activo"
-
-        })
-
-    )
+    )
 
     total = sum(
         m.get("monto",0)
@@ -1560,71 +1415,9 @@ def corte_caja_pdf():
 )
 def morosos_pdf():
 
-    ids_morosos = set()
-
-    hoy = datetime.now()
-
-    for mensualidad in mensualidades.find({
-
-        "pagado": False
-
-    }):
-
-        numero_mes = mensualidad.get(
-            "numero_mes"
-        )
-
-        anio = mensualidad.get(
-            "anio"
-        )
-
-        if not numero_mes or not anio:
-
-            continue
-
-        if (
-
-            anio < hoy.year
-
-            or (
-
-                anio == hoy.year
-
-                and numero_mes < hoy.month
-
-            )
-
-        ):
-
-            ids_morosos.add(
-
-                mensualidad[
-                    "pago_id"
-                ]
-
-            )
-
-    lista = []
-
-    for pago_id in ids_morosos:
-
-        pago = pagos.find_one({
-
-            "_id": ObjectId(
-                pago_id
-            ),
-
-            "activo": {
-                "$ne": False
-            }
-
-        })
-
-        if pago:
-
-            lista.append(
-                pago
-            )
+    lista = obtener_morosos(
+        con_recargos=False
+    )
 
     registrar_bitacora_pago(
 
@@ -1653,171 +1446,13 @@ def morosos_pdf():
 @pagos_bp.route("/admin/dashboard_financiero")
 def dashboard_financiero():
 
-    total_contratado = 0
-    total_cobrado = 0
-    total_pendiente = 0
-
-    for p in pagos.find({
-
-        "activo": {
-            "$ne": False
-        }
-
-    }):
-
-        total_contratado += p.get(
-            "total_debe",
-            0
-        )
-
-        total_cobrado += p.get(
-            "total_pagado",
-            0
-        )
-
-        total_pendiente += p.get(
-            "saldo_restante",
-            0
-        )
-
-    ids_morosos = set()
-
-    hoy = datetime.now()
-
-    for mensualidad in mensualidades.find({
-
-        "pagado": False
-
-    }):
-
-        numero_mes = mensualidad.get(
-            "numero_mes"
-        )
-
-        anio = mensualidad.get(
-            "anio"
-        )
-
-        if not numero_mes or not anio:
-
-            continue
-
-        if (
-
-            anio < hoy.year
-
-            or (
-
-                anio == hoy.year
-
-                and numero_mes < hoy.month
-
-            )
-
-        ):
-
-            ids_morosos.add(
-
-                mensualidad[
-                    "pago_id"
-                ]
-
-            )
-
-    morosos = len(
-        ids_morosos
-    )
-
-    mensualidades_vencidas = 0
-
-    total_recargos = 0
-
-    for m in mensualidades.find({}):
-
-        if not m.get(
-            "pagado",
-            False
-        ):
-
-            numero_mes = m.get(
-                "numero_mes"
-            )
-
-            anio = m.get(
-                "anio"
-            )
-
-            if (
-
-                numero_mes
-
-                and
-
-                anio
-
-                and
-
-                (
-
-                    anio < hoy.year
-
-                    or (
-
-                        anio == hoy.year
-
-                        and numero_mes < hoy.month
-
-                    )
-
-                )
-
-            ):
-
-                mensualidades_vencidas += 1
-
-        total_recargos += m.get(
-            "recargo",
-            0
-        )
-
-    hoy = datetime.now().strftime(
-        "%d/%m/%Y"
-    )
-
-    ingresos_hoy = 0
-
-    for m in movimientos_pagos.find({
-
-        "fecha_pago": hoy,
-
-        "estatus": "activo"
-
-    }):
-
-        ingresos_hoy += m.get(
-            "monto",
-            0
-        )
+    resumen = obtener_resumen()
 
     return render_template(
 
         "dashboard_financiero.html",
 
-        total_contratado=total_contratado,
-
-        total_cobrado=total_cobrado,
-
-        total_pendiente=total_pendiente,
-
-        morosos=morosos,
-
-        ingresos_hoy=ingresos_hoy,
-
-        mensualidades_vencidas=
-            mensualidades_vencidas,
-
-        total_recargos=
-            total_recargos
+        **resumen
 
     )
 
@@ -1915,145 +1550,45 @@ def aplicar_recargos():
             "/admin/config_recargos"
         )
 
-    modificados = 0
+    simular = request.args.get("simular") == "1"
 
-    for mensualidad in mensualidades.find({
+    resultado = aplicar_recargos_lote(
+        porcentaje,
+        simular=simular,
+        hoy=hoy
+    )
 
-        "pagado": False
+    if simular:
 
-    }):
+        flash(
 
-        numero_mes = mensualidad.get(
-            "numero_mes"
-        )
+            f"Simulación: {resultado['mensualidades']} mensualidades "
+            f"de {resultado['alumnos']} alumnos, "
+            f"${resultado['total']:,.2f} en recargos"
 
-        anio = mensualidad.get(
-            "anio"
         )
 
-        if not numero_mes or not anio:
-
-            continue
-
-        hoy = datetime.now()
-
-        if (
-            anio > hoy.year
-            or (
-                anio == hoy.year
-                and numero_mes >= hoy.month
-            )
-        ):
-
-            continue
-        saldo_actual = mensualidad.get(
-            "monto",
-            0
-        ) + mensualidad.get(
-            "recargo",
-            0
-        )
-        fecha_hoy = datetime.now().strftime(
-            "%d/%m/%Y"
+        return redirect(
+            "/admin/config_recargos"
         )
 
-        if mensualidad.get(
-            "ultimo_recargo"
-        ) == fecha_hoy:
-
-            continue
-
-        recargo = (
-
-            saldo_actual
-            * porcentaje
-
-        ) / 100
-
-        movimientos_pagos.insert_one({
-
-            "folio":
-                "RECARGO-" +
-                datetime.now().strftime(
-                    "%Y%m%d%H%M%S"
-                ),
-
-            "concepto":
-                "Recargo por mora",
-
-            "pago_id":
-                mensualidad["pago_id"],
-
-            "alumno":
-                mensualidad["alumno"],
-
-            "grupo":
-                "",
-
-            "monto":
-                recargo,
-
-            "metodo":
-                "recargo",
-
-            "mes_cubierto":
-                "",
-
-            "fecha_pago":
-                datetime.now().strftime(
-                    "%d/%m/%Y"
-                ),
-
-            "hora_pago":
-                datetime.now().strftime(
-                    "%H:%M"
-                ),
+    registrar_recargos(resultado["total"])
 
-            "capturado_por":
-                "Sistema",
-
-            "estatus":
-                "activo"
-
-        })
-
-        mensualidades.update_one(
-
-            {
-                "_id":
-                    mensualidad["_id"]
-            },
-
-            {
-                "$set": {
-
-                    "recargo":
-                        mensualidad.get(
-                            "recargo",
-                            0
-                        ) + recargo,
-
-                    "ultimo_recargo":
-                        fecha_hoy
-
-                }
-
-            }
-
-        )
-        modificados += 1
+    registrar_ingreso(resultado["total"])
 
     registrar_bitacora_pago(
 
         accion="Aplicó recargos",
 
-        detalle=f"{modificados} alumnos"
+        detalle=f"{resultado['mensualidades']} mensualidades",
+
+        monto=resultado["total"]
 
     )
 
     flash(
 
-        f"Recargos aplicados a {modificados} alumnos"
+        f"Recargos aplicados a {resultado['mensualidades']} mensualidades"
 
     )
 
@@ -2342,88 +1877,69 @@ def validar_recibo(folio):
 
     )
 
+COLUMNAS_BITACORA_PAGOS = [
+    ("Fecha", "fecha"),
+    ("Usuario", "usuario"),
+    ("Acción", "accion"),
+    ("Detalle", "detalle"),
+    ("Alumno", "alumno"),
+    ("Folio", "folio"),
+    ("Monto", "monto")
+]
+
+
 @pagos_bp.route(
     "/admin/bitacora_pagos"
 )
 def ver_bitacora_pagos():
 
-    fecha_inicio = request.args.get(
-        "fecha_inicio",
-        ""
-    )
+    consulta = filtro_bitacora(
 
-    fecha_fin = request.args.get(
-        "fecha_fin",
-        ""
-    )
+        request.args,
+
+        usuario_parcial=True
 
-    usuario = request.args.get(
-        "usuario",
-        ""
     )
 
-    consulta = {}
+    if quiere_exportar():
 
-    if usuario:
+        return exportar_csv(
 
-        consulta["usuario"] = {
+            bitacora_pagos,
 
-            "$regex": usuario,
+            consulta,
 
-            "$options": "i"
+            COLUMNAS_BITACORA_PAGOS,
 
-        }
+            "bitacora_pagos",
 
-    registros = list(
+            orden=("fecha", -1)
 
-        bitacora_pagos.find(
-            consulta
-        ).sort(
-            "fecha",
-            -1
         )
 
-    )
-
-    if fecha_inicio:
+    pagina = paginar(
 
-        registros = [
+        bitacora_pagos,
 
-            r
-
-            for r in registros
-
-            if r["fecha"].strftime(
-                "%Y-%m-%d"
-            ) >= fecha_inicio
-
-        ]
+        consulta,
 
-    if fecha_fin:
+        orden=("fecha", -1)
 
-        registros = [
-
-            r
-
-            for r in registros
-
-            if r["fecha"].strftime(
-                "%Y-%m-%d"
-            ) <= fecha_fin
-
-        ]
+    )
 
     return render_template(
 
         "bitacora_pagos.html",
 
-        registros=registros,
+        registros=pagina["elementos"],
+
+        pagina=pagina,
 
-        fecha_inicio=fecha_inicio,
+        fecha_inicio=request.args.get("fecha_inicio", ""),
 
-        fecha_fin=fecha_fin,
+        fecha_fin=request.args.get("fecha_fin", ""),
 
-        usuario=usuario
+        usuario=request.args.get("usuario", "")
 
     )
 
@@ -2433,72 +1949,17 @@ def ver_bitacora_pagos():
 )
 def bitacora_pagos_pdf():
 
-    fecha_inicio = request.args.get(
-        "fecha_inicio",
-        ""
-    )
-
-    fecha_fin = request.args.get(
-        "fecha_fin",
-        ""
-    )
-
-    usuario = request.args.get(
-        "usuario",
-        ""
-    )
-
-    consulta = {}
-
-    if usuario:
-
-        consulta["usuario"] = {
+    registros = registros_bitacora(
 
-            "$regex": usuario,
+        bitacora_pagos,
 
-            "$options": "i"
-
-        }
-
-    registros = list(
-
-        bitacora_pagos.find(
-            consulta
-        ).sort(
-            "fecha",
-            -1
+        filtro_bitacora(
+            request.args,
+            usuario_parcial=True
         )
 
     )
 
-    if fecha_inicio:
-
-        registros = [
-
-            r
-
-            for r in registros
-
-            if r["fecha"].strftime(
-                "%Y-%m-%d"
-            ) >= fecha_inicio
-
-        ]
-
-    if fecha_fin:
-
-        registros = [
-
-            r
-
-            for r in registros
-
-            if r["fecha"].strftime(
-                "%Y-%m-%d"
-            ) <= fecha_fin
-
-        ]
-
     registrar_bitacora_pago(
 
         accion="Generó bitácora financiera PDF",
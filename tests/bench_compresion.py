@@ -0,0 +1,160 @@
+import os
+import random
+import sys
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "pruebas")
+
+from utils.almacen_respaldos import medir_compresion
+from utils.compresion import COMPRESIONES, disponibles
+
+# =========================
+# GZIP CONTRA ZSTD EN UN RESPALDO
+# =========================
+#   python -m tests.bench_compresion [alumnos ...]
+#
+# No necesita mongod: arma en memoria colecciones con la forma
+# de las reales (alumnos, pagos, movimientos, mensualidades,
+# asistencias) y pasa sus documentos por medir_compresion, el
+# mismo camino de codificar + comprimir que crear_respaldo.
+# Para medir los datos de una escuela de verdad:
+#
+#   python -m utils.almacen_respaldos medir [tipo]
+
+TAMANOS = (500, 2000)
+
+NOMBRES = ("Ana", "Luis", "José", "María", "Fernanda", "Diego", "Sofía", "Carlos")
+
+APELLIDOS = ("López", "Pérez", "García", "Hernández", "Martínez", "Ruiz", "Díaz")
+
+MESES = (
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+)
+
+
+def fuentes(alumnos):
+
+    aleatorio = random.Random(alumnos)
+
+    inicio = datetime(2025, 8, 25)
+
+    lista = []
+
+    for i in range(alumnos):
+
+        nombre = (
+            f"{aleatorio.choice(NOMBRES)} "
+            f"{aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}"
+        )
+
+        lista.append({
+            "_id": ObjectId(),
+            "nombre": nombre,
+            "grupo": f"{1 + i % 6}{'AB'[i % 2]}",
+            "usuario": f"alumno{i}",
+            "curp": "".join(aleatorio.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(18)),
+            "telefono": f"55{aleatorio.randrange(10 ** 8):08d}",
+            "padre_nombre": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)}",
+            "padre_correo": f"tutor{i}@correo.mx",
+            "foto_id": ObjectId()
+        })
+
+    pagos = [
+        {
+            "_id": ObjectId(),
+            "alumno": alumno["nombre"],
+            "grupo": alumno["grupo"],
+            "total_debe": 12000,
+            "total_pagado": 1000 * aleatorio.randrange(13),
+            "activo": True
+        }
+        for alumno in lista
+    ]
+
+    mensualidades = [
+        {
+            "pago_id": str(pago["_id"]),
+            "mes": mes,
+            "numero_mes": n,
+            "anio": 2025 if n >= 8 else 2026,
+            "monto": 1000,
+            "recargo": aleatorio.choice((0, 0, 0, 50)),
+            "pagado": aleatorio.random() > 0.3
+        }
+        for pago in pagos
+        for n, mes in enumerate(MESES, 1)
+    ]
+
+    movimientos = [
+        {
+            "consecutivo": i,
+            "folio": f"REC-{i:06d}",
+            "pago_id": m["pago_id"],
+            "concepto": "Colegiatura",
+            "monto": m["monto"],
+            "metodo": aleatorio.choice(("efectivo", "transferencia", "tarjeta")),
+            "mes_cubierto": m["mes"],
+            "fecha_pago": (inicio + timedelta(days=i % 300)).strftime("%d/%m/%Y"),
+            "capturado_por": "caja",
+            "estatus": "activo"
+        }
+        for i, m in enumerate((m for m in mensualidades if m["pagado"]), 1)
+    ]
+
+    asistencias = [
+        {
+            "alumno_id": alumno["_id"],
+            "alumno": alumno["nombre"],
+            "grupo": alumno["grupo"],
+            "fecha": (inicio + timedelta(days=d)).strftime("%d/%m/%Y"),
+            "dia": inicio + timedelta(days=d),
+            "estado": aleatorio.choices(("Asistencia", "Falta", "Retardo"), (90, 6, 4))[0],
+            "maestro": "maestro1"
+        }
+        for alumno in lista
+        for d in range(0, 60)
+    ]
+
+    return [
+        ("alumnos", lista),
+        ("pagos", pagos),
+        ("mensualidades", mensualidades),
+        ("movimientos_pagos", movimientos),
+        ("asistencias", asistencias)
+    ]
+
+
+def main(tamanos):
+
+    print(f"{'alumnos':>8} {'documentos':>11} {'formato':>8} {'MB':>7} {'MB comp.':>9} {'razón':>6} {'comp. MB/s':>11} {'desc. MB/s':>11}")
+
+    for alumnos in tamanos:
+
+        documentos, _, medidas = medir_compresion(fuentes(alumnos))
+
+        for compresion, medida in medidas.items():
+
+            megas = medida["original"] / (1024 * 1024)
+
+            print(
+                f"{alumnos:>8} {documentos:>11} {compresion:>8} "
+                f"{megas:>7.1f} {medida['comprimido'] / (1024 * 1024):>9.2f} "
+                f"{medida['original'] / max(medida['comprimido'], 1):>6.1f} "
+                f"{megas / max(medida['comprimir'], 1e-9):>11.0f} "
+                f"{megas / max(medida['descomprimir'], 1e-9):>11.0f}"
+            )
+
+    faltantes = set(COMPRESIONES) - set(disponibles())
+
+    if faltantes:
+        print(f"Sin medir: {', '.join(sorted(faltantes))} (pip install zstandard)")
+
+
+if __name__ == "__main__":
+
+    main([int(a) for a in sys.argv[1:]] or TAMANOS)
@@ -0,0 +1,109 @@
+import os
+import time
+
+from contextlib import contextmanager
+
+from pymongo import MongoClient, monitoring
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "pruebas")
+
+from database import mongo
+
+# =========================
+# MEDICIONES
+# =========================
+# Los scripts bench_* no son pruebas de pytest: se corren a mano
+# contra un mongod desechable y escriben una tabla.
+#
+#   MONGO_URI_PRUEBAS=mongodb://localhost:27017 python -m tests.bench_morosos
+#
+# Usan la base "control_escolar_bench", que se borra al terminar.
+
+BASE = "control_escolar_bench"
+
+
+class ContadorConsultas(monitoring.CommandListener):
+
+    def __init__(self):
+        self.comandos = 0
+
+    def started(self, evento):
+
+        if evento.command_name not in ("endSessions", "ping", "hello", "isMaster"):
+            self.comandos += 1
+
+    def succeeded(self, evento):
+        pass
+
+    def failed(self, evento):
+        pass
+
+
+def _uri():
+
+    uri = os.environ.get("MONGO_URI_PRUEBAS")
+
+    if uri:
+        return uri, None
+
+    from pymongo_inmemory import MongoClient as ClienteEnMemoria
+
+    servidor = ClienteEnMemoria()
+
+    return servidor._mongod.connection_string, servidor
+
+
+@contextmanager
+def base_de_medicion():
+
+    uri, servidor = _uri()
+
+    contador = ContadorConsultas()
+
+    cliente = MongoClient(uri, event_listeners=[contador])
+
+    anterior = (mongo._cliente, mongo._pid_cliente, mongo.NOMBRE_DB)
+
+    mongo._cliente = cliente
+    mongo._pid_cliente = os.getpid()
+    mongo.NOMBRE_DB = BASE
+
+    cliente.drop_database(BASE)
+
+    try:
+
+        yield cliente[BASE], contador
+
+    finally:
+
+        cliente.drop_database(BASE)
+
+        cliente.close()
+
+        mongo._cliente, mongo._pid_cliente, mongo.NOMBRE_DB = anterior
+
+        if servidor:
+            servidor.close()
+
+
+def medir(contador, funcion, repeticiones=3):
+
+    # (mejor tiempo en ms, comandos por ejecución, resultado)
+    mejor = None
+
+    for _ in range(repeticiones):
+
+        antes = contador.comandos
+
+        inicio = time.perf_counter()
+
+        resultado = funcion()
+
+        transcurrido = (time.perf_counter() - inicio) * 1000
+
+        comandos = contador.comandos - antes
+
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+
+    return mejor, comandos, resultado
@@ -0,0 +1,117 @@
+import random
+import sys
+
+from datetime import datetime
+
+from bson import ObjectId
+
+from tests.bench_comun import base_de_medicion, medir
+
+from utils.reportes_pagos import obtener_morosos
+
+# =========================
+# MOROSOS: 1 + 2N CONSULTAS CONTRA UNA AGREGACIÓN
+# =========================
+#   python -m tests.bench_morosos [mensualidades ...]
+
+HOY = datetime(2026, 6, 15)
+
+TAMANOS = (5000, 50000)
+
+
+def sembrar(bd, cantidad):
+
+    # 12 mensualidades por cuenta; ~30% de las pasadas sin pagar
+    aleatorio = random.Random(cantidad)
+
+    cuentas = cantidad // 12
+
+    pago_ids = bd.pagos.insert_many([
+        {"alumno": f"Alumno {i}", "grupo": f"{1 + i % 6}A", "activo": True}
+        for i in range(cuentas)
+    ]).inserted_ids
+
+    lote = []
+
+    for pago_id in pago_ids:
+
+        for mes in range(1, 13):
+
+            anio = 2025 if mes > 6 else 2026
+
+            lote.append({
+                "pago_id": str(pago_id),
+                "anio": anio,
+                "numero_mes": mes,
+                "pagado": aleatorio.random() > 0.3,
+                "recargo": aleatorio.choice((0, 0, 50, 100))
+            })
+
+        if len(lote) >= 5000:
+            bd.mensualidades.insert_many(lote)
+            lote = []
+
+    if lote:
+        bd.mensualidades.insert_many(lote)
+
+    bd.mensualidades.create_index([("pagado", 1), ("anio", 1), ("numero_mes", 1)])
+    bd.mensualidades.create_index([("pago_id", 1), ("mes", 1), ("pagado", 1)])
+
+
+def morosos_anterior(bd):
+
+    # La versión que recorría en Python (antes de user-007)
+    ids = set()
+
+    for mensualidad in bd.mensualidades.find({"pagado": False}):
+
+        anio = mensualidad.get("anio")
+        numero_mes = mensualidad.get("numero_mes")
+
+        if not anio or not numero_mes:
+            continue
+
+        if anio < HOY.year or (anio == HOY.year and numero_mes < HOY.month):
+            ids.add(mensualidad["pago_id"])
+
+    lista = []
+
+    for pago_id in ids:
+
+        pago = bd.pagos.find_one({"_id": ObjectId(pago_id), "activo": {"$ne": False}})
+
+        if pago:
+
+            pago["recargos_reales"] = sum(
+                m.get("recargo", 0)
+                for m in bd.mensualidades.find({"pago_id": str(pago["_id"])})
+            )
+
+            lista.append(pago)
+
+    return lista
+
+
+def main(tamanos):
+
+    print(f"{'mensualidades':>14} {'versión':>12} {'ms':>10} {'consultas':>10} {'morosos':>8}")
+
+    for cantidad in tamanos:
+
+        with base_de_medicion() as (bd, contador):
+
+            sembrar(bd, cantidad)
+
+            for nombre, funcion in (
+                ("anterior", lambda: morosos_anterior(bd)),
+                ("agregación", lambda: obtener_morosos(HOY))
+            ):
+
+                ms, consultas, resultado = medir(contador, funcion)
+
+                print(f"{cantidad:>14} {nombre:>12} {ms:>10.1f} {consultas:>10} {len(resultado):>8}")
+
+
+if __name__ == "__main__":
+
+    main([int(a) for a in sys.argv[1:]] or TAMANOS)
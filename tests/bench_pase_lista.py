@@ -0,0 +1,110 @@
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+from database.indices import INDICES, nombre_indice
+
+from tests.bench_comun import base_de_medicion, medir
+
+from utils.registro_escolar import ESTADOS_ASISTENCIA, guardar_asistencias
+
+# =========================
+# PASE DE LISTA: 3N OPERACIONES CONTRA UN BULK_WRITE
+# =========================
+#   python -m tests.bench_pase_lista [maestros ...]
+#
+# Cada maestro pasa lista a un grupo de 45 alumnos, todos a la
+# vez (un hilo por maestro). La versión anterior es la que
+# hacía /guardar_asistencia_ajax por alumno: find_one, $pull y
+# $push sobre el documento del alumno.
+
+ALUMNOS_POR_GRUPO = 45
+
+MAESTROS = (1, 4, 8)
+
+FECHA = "18/10/2026"
+
+
+def sembrar(bd, grupos):
+
+    for claves, opciones in INDICES["asistencias"]:
+        bd.asistencias.create_index(claves, name=nombre_indice(claves), **opciones)
+
+    bd.alumnos.insert_many([
+        {"nombre": f"Alumno {g}-{i}", "grupo": f"G{g}", "asistencias": []}
+        for g in range(grupos)
+        for i in range(ALUMNOS_POR_GRUPO)
+    ])
+
+    return [
+        list(bd.alumnos.find({"grupo": f"G{g}"}, {"nombre": 1, "grupo": 1}))
+        for g in range(grupos)
+    ]
+
+
+def _estado(i):
+
+    return ESTADOS_ASISTENCIA[i % len(ESTADOS_ASISTENCIA)]
+
+
+def pase_anterior(bd, grupo):
+
+    for i, alumno in enumerate(grupo):
+
+        bd.alumnos.find_one({"_id": alumno["_id"]})
+
+        bd.alumnos.update_one(
+            {"_id": alumno["_id"]},
+            {"$pull": {"asistencias": {"fecha": FECHA}}}
+        )
+
+        bd.alumnos.update_one(
+            {"_id": alumno["_id"]},
+            {"$push": {"asistencias": {"fecha": FECHA, "estado": _estado(i)}}}
+        )
+
+
+def pase_lote(grupo):
+
+    guardar_asistencias(
+        [(alumno, _estado(i)) for i, alumno in enumerate(grupo)],
+        FECHA,
+        "maestro"
+    )
+
+
+def concurrente(grupos, funcion):
+
+    with ThreadPoolExecutor(max_workers=len(grupos)) as ejecutor:
+        list(ejecutor.map(funcion, grupos))
+
+
+def main(maestros):
+
+    print(f"{'maestros':>9} {'versión':>10} {'ms':>10} {'operaciones':>12} {'registros':>10}")
+
+    for cantidad in maestros:
+
+        with base_de_medicion() as (bd, contador):
+
+            grupos = sembrar(bd, cantidad)
+
+            for nombre, funcion in (
+                ("anterior", lambda: concurrente(grupos, lambda g: pase_anterior(bd, g))),
+                ("lote", lambda: concurrente(grupos, pase_lote))
+            ):
+
+                ms, operaciones, _ = medir(contador, funcion)
+
+                registros = (
+                    bd.asistencias.count_documents({"fecha": FECHA})
+                    if nombre == "lote" else
+                    bd.alumnos.count_documents({"asistencias.fecha": FECHA})
+                )
+
+                print(f"{cantidad:>9} {nombre:>10} {ms:>10.1f} {operaciones:>12} {registros:>10}")
+
+
+if __name__ == "__main__":
+
+    main([int(a) for a in sys.argv[1:]] or MAESTROS)
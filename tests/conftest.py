@@ -0,0 +1,73 @@
+import os
+
+import mongomock
+import pytest
+
+from pymongo import MongoClient
+
+# database.mongo exige MONGO_URI al importarse; las pruebas
+# cambian el cliente por uno propio antes de usarlo.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "pruebas")
+
+from database import mongo
+
+
+# =========================
+# BASES DE PRUEBA
+# =========================
+# bd:      mongomock, en memoria y por proceso
+# bd_real: un mongod de verdad (explain, hilos, procesos):
+#          MONGO_URI_PRUEBAS si está definida, si no uno de
+#          pymongo_inmemory; sin ninguno la prueba se salta.
+
+def _usar_cliente(monkeypatch, cliente):
+
+    monkeypatch.setattr(mongo, "_cliente", cliente)
+    monkeypatch.setattr(mongo, "_pid_cliente", os.getpid())
+
+    return cliente[mongo.NOMBRE_DB]
+
+
+@pytest.fixture
+def bd(monkeypatch):
+
+    return _usar_cliente(monkeypatch, mongomock.MongoClient())
+
+
+@pytest.fixture(scope="session")
+def uri_mongo():
+
+    uri = os.environ.get("MONGO_URI_PRUEBAS")
+
+    if uri:
+        yield uri
+        return
+
+    try:
+
+        from pymongo_inmemory import MongoClient as ClienteEnMemoria
+
+        cliente = ClienteEnMemoria()
+
+    except Exception as e:
+
+        pytest.skip(f"Sin mongod para pruebas: {e}")
+
+    yield cliente._mongod.connection_string
+
+    cliente.close()
+
+
+@pytest.fixture
+def bd_real(monkeypatch, uri_mongo):
+
+    cliente = MongoClient(uri_mongo)
+
+    cliente.drop_database(mongo.NOMBRE_DB)
+
+    yield _usar_cliente(monkeypatch, cliente)
+
+    cliente.drop_database(mongo.NOMBRE_DB)
+
+    cliente.close()
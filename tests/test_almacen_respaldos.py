@@ -0,0 +1,133 @@
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+
+import bson
+
+from bson import Binary, Decimal128, Int64, ObjectId, Timestamp
+
+from utils.almacen_respaldos import (
+    codificar,
+    crear_respaldo,
+    decodificar,
+    flujo_descarga,
+    leer_descarga
+)
+from utils.restauracion import crear_progreso, restaurar_colecciones
+
+
+def _documento(i=0):
+
+    pago_id = ObjectId()
+
+    return {
+        "_id": ObjectId(),
+        "pago_id": pago_id,
+        "pago_id_texto": str(pago_id),
+        "fecha": datetime(2026, 10, 18, 9, 30, 15, 123000),
+        "monto": Decimal128(Decimal("1250.50")),
+        "consecutivo": Int64(2 ** 40 + i),
+        "meses": 10,
+        "tasa": 0.035,
+        "activo": True,
+        "nota": None,
+        "alumno": "José Ñúñez 😀",
+        "meses_cubiertos": {"Enero": 1, "Febrero": 2},
+        "historial": [{"fecha": datetime(2025, 1, 1), "monto": Decimal128("10")}],
+        "firma": Binary(b"\x00\x01\xff"),
+        "operacion": Timestamp(1760779815, 3)
+    }
+
+
+def _bytes(documentos):
+
+    return [bson.encode(documento) for documento in documentos]
+
+
+# =========================
+# CODIFICACIÓN
+# =========================
+def test_ida_y_vuelta_conserva_bytes():
+
+    documento = _documento()
+
+    linea = codificar(documento)
+
+    assert "\n" not in linea
+
+    assert bson.encode(decodificar(linea)) == bson.encode(documento)
+
+
+def test_tipos_conservados():
+
+    restaurado = decodificar(codificar(_documento()))
+
+    assert isinstance(restaurado["_id"], ObjectId)
+    assert isinstance(restaurado["pago_id"], ObjectId)
+    assert isinstance(restaurado["fecha"], datetime)
+    assert isinstance(restaurado["monto"], Decimal128)
+    assert isinstance(restaurado["consecutivo"], Int64)
+    assert restaurado["consecutivo"] == 2 ** 40
+
+
+def test_orden_de_campos_conservado():
+
+    documento = _documento()
+
+    assert list(decodificar(codificar(documento))) == list(documento)
+
+
+# =========================
+# RESPALDO COMPLETO
+# =========================
+# GridFS no existe en mongomock: estas van contra un mongod real
+
+def _respaldar(bd, nombres):
+
+    backup_id = crear_respaldo(
+        "sistema",
+        "ida_y_vuelta",
+        [(nombre, bd[nombre].find()) for nombre in nombres]
+    )
+
+    return bd.backups_archivos.find_one({"_id": backup_id})
+
+
+def test_restaurar_deja_la_base_identica(bd_real):
+
+    bd_real.pagos.insert_many([_documento(i) for i in range(1200)])
+    bd_real.mensualidades.insert_many([
+        {"pago_id": str(p["_id"]), "monto": p["monto"], "dia": p["fecha"]}
+        for p in bd_real.pagos.find()
+    ])
+
+    nombres = ["pagos", "mensualidades"]
+
+    antes = {n: _bytes(bd_real[n].find().sort("_id", 1)) for n in nombres}
+
+    backup = _respaldar(bd_real, nombres)
+
+    for nombre in nombres:
+        bd_real[nombre].delete_many({})
+
+    restaurar_colecciones([backup], nombres, crear_progreso(backup, "pruebas"))
+
+    despues = {n: _bytes(bd_real[n].find().sort("_id", 1)) for n in nombres}
+
+    assert despues == antes
+
+
+def test_descarga_se_lee_igual(bd_real):
+
+    bd_real.pagos.insert_many([_documento(i) for i in range(50)])
+
+    backup = _respaldar(bd_real, ["pagos"])
+
+    descarga = BytesIO(b"".join(flujo_descarga(backup)))
+
+    leidos = [
+        documento
+        for _, documento in leer_descarga(descarga, backup["compresion"])
+    ]
+
+    assert _bytes(leidos) == _bytes(bd_real.pagos.find())
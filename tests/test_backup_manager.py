@@ -0,0 +1,178 @@
+from io import BytesIO
+
+import pytest
+
+from bson import json_util
+
+from utils import backup_manager, restauracion
+from utils.almacen_respaldos import codificar
+from utils.compresion import comprimir
+
+
+def _alumno_formato_anterior(bd):
+
+    bd.alumnos.insert_one({
+        "nombre": "Ana López",
+        "grupo": "1A",
+        "calificaciones": [
+            {"materia": "Español", "trimestre": 1, "calificacion": 9}
+        ],
+        "asistencias": [
+            {"fecha": "2024-03-04", "estado": "asistio"}
+        ]
+    })
+
+
+def test_restaurar_migra_evaluaciones_del_respaldo(bd):
+
+    _alumno_formato_anterior(bd)
+
+    backup_manager.completar_restauracion(["alumnos", "calificaciones"])
+
+    alumno = bd.alumnos.find_one()
+
+    assert "calificaciones" not in alumno
+    assert "asistencias" not in alumno
+
+    assert bd.calificaciones.count_documents({"alumno_id": alumno["_id"]}) == 1
+    assert bd.asistencias.count_documents({"alumno_id": alumno["_id"]}) == 1
+
+
+def test_sin_alumnos_no_migra(bd, monkeypatch):
+
+    llamadas = []
+
+    monkeypatch.setattr(
+        backup_manager,
+        "migrar_evaluaciones",
+        lambda: llamadas.append(True)
+    )
+
+    backup_manager.completar_restauracion(["pagos", "mensualidades"])
+
+    assert llamadas == []
+
+
+def test_restaurar_solo_toca_lo_que_trae_el_respaldo(bd, monkeypatch):
+
+    monkeypatch.setitem(
+        backup_manager.RESPALDO_PREVIO,
+        "control_escolar",
+        lambda: None
+    )
+
+    bd.alumnos.insert_one({"nombre": "Actual"})
+    bd.maestros.insert_one({"nombre": "Maestra actual"})
+
+    # Respaldo anterior a GridFS: solo trae alumnos
+    backup_id = bd.backups_archivos.insert_one({
+        "tipo": "control_escolar",
+        "nombre": "backup_control_escolar_viejo.json",
+        "estado": "Correcto",
+        "contenido": {"alumnos": [{"nombre": "Del respaldo"}]}
+    }).inserted_id
+
+    ok, mensaje = backup_manager.restaurar_backup(backup_id, "pruebas")
+
+    assert ok, mensaje
+
+    assert [a["nombre"] for a in bd.alumnos.find()] == ["Del respaldo"]
+    assert [m["nombre"] for m in bd.maestros.find()] == ["Maestra actual"]
+
+    progreso = bd.restauraciones.find_one()
+
+    assert list(progreso["colecciones"]) == ["alumnos"]
+
+
+# =========================
+# RESTAURAR DESDE ARCHIVO
+# =========================
+def _descarga(colecciones, modo="completo"):
+
+    # Como flujo_descarga: encabezado y documentos por colección
+    lineas = []
+
+    for nombre, documentos in colecciones.items():
+
+        lineas.append(codificar({
+            "$respaldo": {
+                "coleccion": nombre,
+                "documentos": len(documentos),
+                "modo": modo
+            }
+        }))
+
+        lineas.extend(codificar(documento) for documento in documentos)
+
+    return BytesIO(comprimir(("\n".join(lineas) + "\n").encode(), "gzip"))
+
+
+@pytest.fixture
+def sin_respaldo_previo(monkeypatch):
+
+    monkeypatch.setitem(backup_manager.RESPALDO_PREVIO, "sistema", lambda: None)
+
+
+def test_subir_respaldo_carga_por_temporales(bd, sin_respaldo_previo, monkeypatch):
+
+    monkeypatch.setattr(restauracion, "TAMANO_LOTE", 2)
+
+    bd.alumnos.insert_one({"nombre": "Actual"})
+    bd.pagos.insert_one({"alumno": "Pago actual"})
+
+    archivo = _descarga({
+        "alumnos": [{"nombre": f"Alumno {i}", "usuario": f"a{i}"} for i in range(5)],
+        "desconocida": [{"x": 1}]
+    })
+
+    ok, restauracion_id = backup_manager.restaurar_archivo(
+        archivo,
+        "backup_sistema.ndjson.gz"
+    )
+
+    assert ok, restauracion_id
+
+    assert bd.alumnos.count_documents({}) == 5
+    assert [p["alumno"] for p in bd.pagos.find()] == ["Pago actual"]
+    assert "desconocida" not in bd.list_collection_names()
+    assert "alumnos__restauracion" not in bd.list_collection_names()
+
+    progreso = bd.restauraciones.find_one({"_id": restauracion_id})
+
+    assert progreso["estado"] == "Correcto"
+    assert progreso["colecciones"]["alumnos"]["cargados"] == 5
+    assert progreso["colecciones"]["alumnos"]["total"] == 5
+
+
+def test_subir_incremental_no_toca_nada(bd, sin_respaldo_previo):
+
+    bd.alumnos.insert_one({"nombre": "Actual"})
+
+    archivo = _descarga(
+        {"alumnos": [{"op": "guardar", "documento": {"nombre": "X"}}]},
+        modo="incremental"
+    )
+
+    ok, mensaje = backup_manager.restaurar_archivo(archivo, "inc.ndjson.gz")
+
+    assert not ok
+    assert "incremental" in mensaje
+
+    assert [a["nombre"] for a in bd.alumnos.find()] == ["Actual"]
+    assert "alumnos__restauracion" not in bd.list_collection_names()
+    assert bd.restauraciones.find_one()["estado"] == "Error"
+
+
+def test_subir_json_anterior(bd, sin_respaldo_previo):
+
+    bd.configuracion.insert_one({"escuela": "Actual"})
+
+    archivo = BytesIO(json_util.dumps({
+        "configuracion": [{"escuela": "Del respaldo"}]
+    }).encode())
+
+    ok, _ = backup_manager.restaurar_archivo(archivo, "backup.json")
+
+    assert ok
+
+    assert bd.configuracion.find_one()["escuela"] == "Del respaldo"
@@ -0,0 +1,82 @@
+import pytest
+
+from utils.busqueda import campos_busqueda, filtro_pagos
+
+
+def _sembrar(bd):
+
+    ids = []
+
+    for alumno, grupo in (("Ana López", "3A"), ("Luis Pérez", "2B"), ("José 2024", "1A")):
+
+        documento = {"alumno": alumno, "grupo": grupo}
+
+        documento.update(campos_busqueda("pagos", documento))
+
+        ids.append(bd.pagos.insert_one(documento).inserted_id)
+
+    bd.movimientos_pagos.insert_many([
+        {"consecutivo": 3, "folio": "REC-000003", "pago_id": str(ids[1])},
+        {"consecutivo": 7, "folio": "REC-000007", "pago_id": str(ids[0])}
+    ])
+
+    return bd.pagos, ids
+
+
+@pytest.fixture
+def pagos(bd):
+
+    return _sembrar(bd)
+
+
+def _buscar(coleccion, texto):
+
+    filtro, rango = filtro_pagos(texto)
+
+    return {p["alumno"] for p in coleccion.find(filtro)}, rango
+
+
+def test_folio_con_prefijo_solo_busca_el_folio(pagos):
+
+    coleccion, _ = pagos
+
+    encontrados, rango = _buscar(coleccion, "rec-3")
+
+    assert encontrados == {"Luis Pérez"}
+    assert rango is None
+
+
+def test_numero_junta_consecutivo_y_texto(pagos):
+
+    coleccion, _ = pagos
+
+    # Consecutivo 3 (Luis) y el grupo 3A (Ana)
+    encontrados, rango = _buscar(coleccion, "3")
+
+    assert encontrados == {"Luis Pérez", "Ana López"}
+    assert rango is not None
+
+
+def test_numero_sin_folio_busca_por_texto(pagos):
+
+    coleccion, _ = pagos
+
+    encontrados, _ = _buscar(coleccion, "2024")
+
+    assert encontrados == {"José 2024"}
+
+
+def test_folio_primero_en_el_ranking(bd_real):
+
+    # $indexOfCP no existe en mongomock
+    coleccion, ids = _sembrar(bd_real)
+
+    filtro, rango = filtro_pagos("3")
+
+    ordenados = list(coleccion.aggregate([
+        {"$match": filtro},
+        {"$addFields": {"_rango": rango}},
+        {"$sort": {"_rango": 1, "alumno": 1}}
+    ]))
+
+    assert ordenados[0]["_id"] == ids[1]
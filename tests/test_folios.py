@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from database import mongo
+
+from utils import folios
+
+
+def _sin_huecos(consecutivos, inicio=1):
+
+    return sorted(consecutivos) == list(range(inicio, inicio + len(consecutivos)))
+
+
+# =========================
+# SECUENCIA
+# =========================
+def test_reserva_bloques_contiguos(bd):
+
+    assert list(folios.reservar_folios(3)) == [1, 2, 3]
+    assert folios.siguiente_folio() == (4, "REC-000004")
+    assert list(folios.reservar_folios(2)) == [5, 6]
+    assert list(folios.reservar_folios(0)) == []
+
+
+def test_siembra_desde_el_mayor_consecutivo_emitido(bd):
+
+    bd.movimientos_pagos.insert_many([
+        {"consecutivo": 41, "folio": "REC-000041"},
+        {"consecutivo": 7, "folio": "REC-000007"},
+        {"folio": "manual"}
+    ])
+
+    assert folios.siguiente_folio("REC") == (42, "REC-000042")
+
+
+def test_sembrar_otra_vez_no_retrocede(bd):
+
+    folios.reservar_folios(10)
+
+    folios._sembrar(folios.SECUENCIA_RECIBOS)
+
+    assert folios.siguiente_folio()[0] == 11
+
+
+# =========================
+# CONCURRENCIA
+# =========================
+# Contra un mongod real: el $inc atómico es lo que se prueba
+
+def test_hilos_no_repiten_ni_dejan_huecos(bd_real):
+
+    with ThreadPoolExecutor(max_workers=16) as ejecutor:
+
+        resultados = list(ejecutor.map(
+            lambda i: list(folios.reservar_folios(1 + i % 3)),
+            range(400)
+        ))
+
+    consecutivos = [c for bloque in resultados for c in bloque]
+
+    assert len(set(consecutivos)) == len(consecutivos)
+    assert _sin_huecos(consecutivos)
+
+    # Cada bloque es contiguo
+    assert all(b == list(range(b[0], b[0] + len(b))) for b in resultados)
+
+
+def _iniciar_proceso(uri):
+
+    # El hijo no hereda el cliente (ver database/mongo.py)
+    mongo.MONGO_URI = uri
+
+
+def _reservar_en_proceso(veces):
+
+    return [folios.siguiente_folio()[0] for _ in range(veces)]
+
+
+def test_procesos_no_repiten_ni_dejan_huecos(bd_real, uri_mongo):
+
+    with ProcessPoolExecutor(
+        max_workers=4,
+        initializer=_iniciar_proceso,
+        initargs=(uri_mongo,)
+    ) as ejecutor:
+
+        resultados = list(ejecutor.map(_reservar_en_proceso, [50] * 8))
+
+    consecutivos = [c for lista in resultados for c in lista]
+
+    assert len(consecutivos) == 400
+    assert len(set(consecutivos)) == 400
+    assert _sin_huecos(consecutivos)
+
+
+def test_primer_uso_concurrente_siembra_una_sola_vez(bd_real):
+
+    bd_real.movimientos_pagos.insert_one({"consecutivo": 100})
+
+    with ThreadPoolExecutor(max_workers=8) as ejecutor:
+
+        consecutivos = list(ejecutor.map(
+            lambda _: folios.siguiente_folio()[0],
+            range(40)
+        ))
+
+    assert _sin_huecos(consecutivos, inicio=101)
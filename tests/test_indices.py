@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from database import indices
+
+
+def _documento(campos, i):
+
+    # Un valor distinto por documento: los índices únicos no chocan
+    documento = {}
+
+    for campo in campos:
+
+        destino = documento
+
+        *ruta, hoja = campo.split(".")
+
+        for parte in ruta:
+            destino = destino.setdefault(parte, {})
+
+        destino[hoja] = f"v{i}"
+
+    documento["fecha"] = datetime(2026, 1, 1 + i % 28)
+
+    return documento
+
+
+def _sembrar(bd, documentos=200):
+
+    for coleccion, lista in indices.INDICES.items():
+
+        campos = {
+            campo
+            for claves, _ in lista
+            for campo, _ in claves
+        }
+
+        bd[coleccion].insert_many(
+            [_documento(campos, i) for i in range(documentos)]
+        )
+
+
+def test_consultas_declaradas_usan_indice(bd_real):
+
+    _sembrar(bd_real)
+
+    creados, errores = indices.aplicar_indices()
+
+    assert not errores
+
+    recorridos, sin_datos = indices.verificar_consultas()
+
+    assert not sin_datos
+    assert recorridos == []
+
+
+def test_coleccion_vacia_no_pasa_como_verificada(bd_real):
+
+    indices.aplicar_indices()
+
+    recorridos, sin_datos = indices.verificar_consultas()
+
+    assert recorridos == []
+    assert len(sin_datos) == len(indices.CONSULTAS)
+
+
+def test_detecta_collscan(bd_real, monkeypatch):
+
+    bd_real["alumnos"].insert_many([{"apodo": f"v{i}"} for i in range(50)])
+
+    monkeypatch.setattr(
+        indices,
+        "CONSULTAS",
+        [("alumnos", {"apodo": "v1"}, None)]
+    )
+
+    recorridos, sin_datos = indices.verificar_consultas()
+
+    assert recorridos == [("alumnos", {"apodo": "v1"}, None)]
@@ -0,0 +1,100 @@
+import pytest
+
+from utils import libro_pagos
+
+
+@pytest.fixture
+def pago(bd):
+
+    pago_id = bd.pagos.insert_one({
+        "alumno": "Ana",
+        "total_debe": 1000,
+        "total_pagado": 200,
+        "saldo_restante": 800,
+        "meses_pagados": 1,
+        "meses_cubiertos": {"Enero": 1},
+        "estatus": "parcial",
+        "version": 3
+    }).inserted_id
+
+    bd.movimientos_pagos.insert_one({
+        "pago_id": str(pago_id),
+        "monto": 200,
+        "mes_cubierto": "Enero",
+        "estatus": "activo",
+        "metodo": "efectivo"
+    })
+
+    return pago_id
+
+
+def _abono(bd, pago_id, monto, mes):
+
+    movimiento = {
+        "pago_id": str(pago_id),
+        "monto": monto,
+        "mes_cubierto": mes,
+        "estatus": "activo",
+        "metodo": "efectivo"
+    }
+
+    bd.movimientos_pagos.insert_one(movimiento)
+
+    libro_pagos.aplicar_movimiento(pago_id, despues=movimiento)
+
+
+def test_recalculo_que_pierde_la_carrera_se_repite(bd, pago, monkeypatch):
+
+    sumar = libro_pagos._sumar_movimientos
+
+    llamadas = []
+
+    def sumar_con_abono_en_medio(pago_ids):
+
+        resultado = sumar(pago_ids)
+
+        # Otro worker registra un abono después de la suma
+        if not llamadas:
+            _abono(bd, pago, 300, "Febrero")
+
+        llamadas.append(pago_ids)
+
+        return resultado
+
+    monkeypatch.setattr(libro_pagos, "_sumar_movimientos", sumar_con_abono_en_medio)
+
+    nuevos = libro_pagos.recalcular_pago(pago)
+
+    assert len(llamadas) == 2
+
+    guardado = bd.pagos.find_one({"_id": pago})
+
+    assert nuevos["total_pagado"] == guardado["total_pagado"] == 500
+    assert guardado["saldo_restante"] == 500
+    assert guardado["meses_cubiertos"] == {"Enero": 1, "Febrero": 1}
+    assert guardado["version"] == 5
+
+
+def test_recalculo_sin_contencion(bd, pago):
+
+    bd.pagos.update_one({"_id": pago}, {"$set": {"total_pagado": 0}})
+
+    assert libro_pagos.recalcular_pago(pago)["total_pagado"] == 200
+
+    assert bd.pagos.find_one({"_id": pago})["version"] == 4
+
+
+def test_contencion_permanente_avisa(bd, pago, monkeypatch):
+
+    sumar = libro_pagos._sumar_movimientos
+
+    def siempre_cambia(pago_ids):
+
+        bd.pagos.update_one({"_id": pago}, {"$inc": {"version": 1}})
+
+        return sumar(pago_ids)
+
+    monkeypatch.setattr(libro_pagos, "_sumar_movimientos", siempre_cambia)
+
+    with pytest.raises(libro_pagos.LibroOcupado):
+        libro_pagos.recalcular_pago(pago)
@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import licencia
+
+
+# =========================
+# SERVIDOR DE LICENCIAS DE PRUEBA
+# =========================
+class _Servidor(BaseHTTPRequestHandler):
+
+    respuesta = {"valida": True, "offline_dias": 7}
+
+    demora = 0
+
+    def do_POST(self):
+
+        largo = int(self.headers.get("Content-Length", 0))
+
+        self.server.solicitudes.append(json.loads(self.rfile.read(largo)))
+
+        time.sleep(self.demora)
+
+        cuerpo = json.dumps(self.respuesta).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+
+    class Manejador(_Servidor):
+        respuesta = dict(_Servidor.respuesta)
+
+    http = HTTPServer(("127.0.0.1", 0), Manejador)
+    http.solicitudes = []
+    http.manejador = Manejador
+
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+
+    monkeypatch.setattr(
+        licencia,
+        "LICENSE_SERVER",
+        f"http://127.0.0.1:{http.server_port}"
+    )
+
+    yield http
+
+    http.shutdown()
+    http.server_close()
+
+
+@pytest.fixture(autouse=True)
+def proceso_nuevo(monkeypatch, tmp_path):
+
+    # Estado de un worker recién arrancado, sin caché en disco
+    monkeypatch.setattr(licencia, "CACHE_FILE", str(tmp_path / "cache.json"))
+    monkeypatch.setattr(licencia, "LICENSE_KEY", "CLAVE")
+    monkeypatch.setattr(licencia, "INSTALL_ID", "INSTALACION")
+    # Sin la pausa entre reintentos de validar_online
+    monkeypatch.setattr(licencia, "time", SimpleNamespace(sleep=lambda s: None))
+    monkeypatch.setattr(licencia, "_estado", {
+        "cargado": False,
+        "valida": False,
+        "ultima_validacion": None,
+        "proximo_intento": None,
+        "revalidando": False,
+        "pendiente_desde": None
+    })
+
+
+def _esperar_revalidacion():
+
+    limite = time.monotonic() + 5
+
+    while licencia._estado["revalidando"] and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_primera_peticion_sin_cache_no_espera_al_servidor(servidor):
+
+    servidor.manejador.demora = 1
+
+    inicio = time.monotonic()
+
+    # Pendiente mientras el hilo valida
+    assert licencia.licencia_activa() is True
+
+    assert time.monotonic() - inicio < 0.5
+
+    _esperar_revalidacion()
+
+    assert licencia.licencia_activa() is True
+
+    assert servidor.solicitudes == [
+        {"license_key": "CLAVE", "install_id": "INSTALACION"}
+    ]
+
+    assert licencia.leer_cache()["valida"] is True
+
+
+def test_licencia_rechazada(servidor):
+
+    servidor.manejador.respuesta = {"valida": False, "mensaje": "Vencida"}
+
+    licencia.licencia_activa()
+
+    _esperar_revalidacion()
+
+    assert licencia.licencia_activa() is False
+
+
+def test_sin_servidor_ni_cache_no_bloquea(monkeypatch):
+
+    monkeypatch.setattr(licencia, "LICENSE_SERVER", "http://127.0.0.1:9")
+
+    inicio = time.monotonic()
+
+    licencia.licencia_activa()
+
+    assert time.monotonic() - inicio < 0.5
+
+    _esperar_revalidacion()
+
+    # Ya hubo un intento: no vuelve a quedar pendiente
+    assert licencia.licencia_activa() is False
+
+    assert licencia._estado["pendiente_desde"] is None
+
+
+def test_pendiente_dura_poco(servidor, monkeypatch):
+
+    servidor.manejador.demora = 1
+
+    monkeypatch.setattr(licencia, "GRACIA_PRIMERA_VALIDACION", timedelta(0))
+
+    # Sin gracia, lo que se sepa: nada todavía
+    assert licencia.licencia_activa() is False
+
+    _esperar_revalidacion()
+
+    assert licencia.licencia_activa() is True
+
+
+def test_cache_vigente_no_consulta_al_servidor(servidor):
+
+    licencia.guardar_cache({
+        "valida": True,
+        "ultima_validacion": datetime.now().isoformat()
+    })
+
+    assert licencia.licencia_activa() is True
+
+    assert servidor.solicitudes == []
+
+
+def test_cache_vencida_responde_y_revalida_en_segundo_plano(servidor):
+
+    licencia.guardar_cache({
+        "valida": True,
+        "ultima_validacion": (
+            datetime.now() - licencia.VIGENCIA - timedelta(minutes=1)
+        ).isoformat()
+    })
+
+    servidor.manejador.respuesta = {"valida": False, "mensaje": "Cancelada"}
+
+    # Responde con lo último conocido sin esperar al servidor
+    assert licencia.licencia_activa() is True
+
+    _esperar_revalidacion()
+
+    assert len(servidor.solicitudes) == 1
+
+    assert licencia._estado["valida"] is False
+
+
+def test_sin_conexion_usa_tolerancia_offline(monkeypatch):
+
+    licencia.guardar_cache({
+        "valida": True,
+        "offline_dias": 7,
+        "ultima_validacion": (datetime.now() - timedelta(days=2)).isoformat()
+    })
+
+    monkeypatch.setattr(licencia, "LICENSE_SERVER", "http://127.0.0.1:9")
+
+    assert licencia.validar_online()[0] is True
+
+    licencia.guardar_cache({
+        "valida": True,
+        "offline_dias": 7,
+        "ultima_validacion": (datetime.now() - timedelta(days=8)).isoformat()
+    })
+
+    assert licencia.validar_online() == (False, "Licencia expirada sin conexión")
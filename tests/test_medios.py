@@ -0,0 +1,152 @@
+from datetime import date
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from bson import ObjectId
+
+import app as aplicacion
+
+from routes import medios_routes
+from utils import medios
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+HTML = b"<html><script>alert(1)</script></html>"
+
+
+class BucketFalso:
+
+    def __init__(self):
+
+        self.archivos = {}
+
+    def upload_from_stream(self, nombre, flujo, metadata=None):
+
+        medio_id = ObjectId()
+
+        self.archivos[medio_id] = (flujo.read(), metadata)
+
+        return medio_id
+
+
+class ArchivoFalso(BytesIO):
+
+    def __init__(self, contenido, tipo):
+
+        super().__init__(contenido)
+
+        self.metadata = {"tipo": tipo}
+        self.length = len(contenido)
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+
+    falso = BucketFalso()
+
+    monkeypatch.setattr(medios, "_bucket", lambda: falso)
+
+    return falso
+
+
+# =========================
+# TIPO
+# =========================
+@pytest.mark.parametrize("cabecera, tipo", [
+    (PNG, "image/png"),
+    (b"\xff\xd8\xff\xe0" + b"\x00" * 12, "image/jpeg"),
+    (b"GIF89a" + b"\x00" * 10, "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"XXXX\x00\x00\x00\x00WEBPVP8 ", None),
+    (HTML, None),
+    (b'<svg xmlns="http://www.w3.org/2000/svg"/>', None),
+    (b"", None),
+])
+def test_tipo_imagen_por_firma(cabecera, tipo):
+
+    assert medios.tipo_imagen(cabecera) == tipo
+
+
+def test_guardar_ignora_el_tipo_del_navegador(bucket):
+
+    medio_id, _ = medios.guardar_bytes(HTML, "foto.png", miniatura=False)
+
+    contenido, metadata = bucket.archivos[medio_id]
+
+    assert contenido == HTML
+    assert metadata["tipo"] == medios.TIPO_BINARIO
+
+
+def test_guardar_imagen_guarda_su_tipo_real(bucket):
+
+    medio_id, _ = medios.guardar_bytes(PNG, "foto.html", miniatura=False)
+
+    assert bucket.archivos[medio_id] == (PNG, {"tipo": "image/png"})
+
+
+def test_subida_que_no_es_imagen_se_descarta(bucket):
+
+    subida = SimpleNamespace(
+        filename="foto.png",
+        mimetype="image/png",
+        stream=BytesIO(HTML)
+    )
+
+    assert medios.guardar_subida(subida) == (None, None)
+    assert bucket.archivos == {}
+
+
+# =========================
+# SERVIR
+# =========================
+@pytest.fixture
+def cliente(bd, monkeypatch):
+
+    monkeypatch.setattr(aplicacion, "licencia_activa", lambda: True)
+    monkeypatch.setattr(aplicacion, "asegurar_programador", lambda: None)
+
+    cliente = aplicacion.app.test_client()
+
+    with cliente.session_transaction() as sesion:
+
+        sesion.permanent = True
+        sesion["usuario"] = "admin"
+        sesion["rol"] = "admin"
+        sesion["modo_restringido"] = False
+        sesion["renovada"] = date.today().isoformat()
+
+    return cliente
+
+
+def _servir(cliente, monkeypatch, contenido, tipo):
+
+    monkeypatch.setattr(
+        medios_routes,
+        "abrir_medio",
+        lambda _: ArchivoFalso(contenido, tipo)
+    )
+
+    return cliente.get(f"/media/{ObjectId()}")
+
+
+def test_imagen_se_sirve_en_linea(cliente, monkeypatch):
+
+    respuesta = _servir(cliente, monkeypatch, PNG, "image/png")
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == "image/png"
+    assert "Content-Disposition" not in respuesta.headers
+    assert respuesta.headers["X-Content-Type-Options"] == "nosniff"
+    assert respuesta.data == PNG
+
+
+def test_tipo_guardado_no_imagen_se_descarga(cliente, monkeypatch):
+
+    # Archivo anterior a la detección, con el tipo del navegador
+    respuesta = _servir(cliente, monkeypatch, HTML, "text/html")
+
+    assert respuesta.mimetype == medios.TIPO_BINARIO
+    assert respuesta.headers["Content-Disposition"] == "attachment"
+    assert respuesta.headers["X-Content-Type-Options"] == "nosniff"
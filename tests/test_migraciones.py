@@ -0,0 +1,177 @@
+import base64
+
+import pytest
+
+from bson import ObjectId
+
+from database import migraciones
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(200))
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(200))
+
+
+@pytest.fixture
+def guardados(bd, monkeypatch):
+
+    lista = []
+
+    def guardar(contenido, nombre, miniatura=True):
+
+        lista.append((nombre, contenido))
+
+        return ObjectId(), ObjectId() if miniatura else None
+
+    monkeypatch.setattr(migraciones, "guardar_bytes", guardar)
+
+    return lista
+
+
+def _base64_en_lineas(contenido):
+
+    # Como lo escribe base64.encodebytes: líneas de 76
+    return base64.encodebytes(contenido).decode()
+
+
+def test_migra_base64_con_saltos_de_linea(bd, guardados):
+
+    texto = _base64_en_lineas(JPEG)
+
+    assert "\n" in texto.strip()
+
+    bd.alumnos.insert_one({"foto": texto})
+
+    resultado = migraciones.migrar_medios()
+
+    assert resultado["alumnos"] == 1
+    assert guardados[0][1] == JPEG
+
+    alumno = bd.alumnos.find_one()
+
+    assert "foto" not in alumno
+    assert alumno["foto_id"] and alumno["foto_miniatura_id"]
+
+
+def test_migra_data_url(bd, guardados):
+
+    texto = "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+    bd.alumnos.insert_one({"foto": texto})
+
+    assert migraciones.migrar_medios()["alumnos"] == 1
+    assert guardados[0][1] == PNG
+
+
+def test_fallo_conserva_el_campo_y_se_cuenta(bd, guardados):
+
+    bd.alumnos.insert_many([
+        {"foto": "esto no es base64 ###"},
+        {"foto": base64.b64encode(b"<html></html>").decode()},
+        {"foto": "static/fotos/no_existe.png"},
+        {"foto": ""}
+    ])
+
+    resultado = migraciones.migrar_medios()
+
+    assert resultado["fallidos"] == 3
+    assert resultado["sin_imagen"] == 1
+    assert resultado["alumnos"] == 0
+    assert guardados == []
+
+    # Solo la vacía pierde el campo; el resto queda para reintentar
+    assert bd.alumnos.count_documents({"foto": {"$exists": True}}) == 3
+    assert bd.alumnos.count_documents({"foto_id": {"$exists": True}}) == 0
+
+
+def test_error_al_guardar_no_borra_la_foto(bd, monkeypatch):
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("GridFS no disponible")
+
+    monkeypatch.setattr(migraciones, "guardar_bytes", falla)
+
+    bd.alumnos.insert_one({"foto": base64.b64encode(PNG).decode()})
+    bd.configuracion.insert_one({"escudo": base64.b64encode(PNG).decode()})
+
+    resultado = migraciones.migrar_medios()
+
+    assert resultado["fallidos"] == 1
+    assert resultado["escudo_fallido"] is True
+
+    assert bd.alumnos.find_one()["foto"]
+    assert bd.configuracion.find_one()["escudo"]
+
+
+def test_escudo_migrado(bd, guardados):
+
+    bd.configuracion.insert_one({"escudo": base64.b64encode(PNG).decode()})
+
+    resultado = migraciones.migrar_medios()
+
+    assert resultado["escudo"] is True
+
+    config = bd.configuracion.find_one()
+
+    assert "escudo" not in config
+    assert config["escudo_id"]
+
+
+# =========================
+# CALIFICACIONES Y ASISTENCIAS
+# =========================
+def test_asistencia_con_fecha_iso_cae_en_el_mismo_dia(bd):
+
+    bd.asistencias.create_index([("alumno_id", 1), ("fecha", 1)], unique=True)
+
+    alumno_id = bd.alumnos.insert_one({
+        "nombre": "Ana",
+        "grupo": "1A",
+        "asistencias": [
+            {"fecha": "2026-10-18", "estado": "Falta"},
+            {"fecha": "17/10/2026", "estado": "Asistencia"}
+        ]
+    }).inserted_id
+
+    # Capturada después con el formato de las tarjetas
+    bd.asistencias.insert_one({
+        "alumno_id": alumno_id,
+        "fecha": "18/10/2026",
+        "estado": "Retardo"
+    })
+
+    resultado = migraciones.migrar_evaluaciones()
+
+    assert resultado["asistencias"] == 2
+
+    registros = {
+        a["fecha"]: a["estado"]
+        for a in bd.asistencias.find({"alumno_id": alumno_id})
+    }
+
+    # Lo capturado después de migrar gana
+    assert registros == {"18/10/2026": "Retardo", "17/10/2026": "Asistencia"}
+
+    # Repetirla (como tras cada restauración) no duplica
+    bd.alumnos.update_one(
+        {"_id": alumno_id},
+        {"$set": {"asistencias": [{"fecha": "2026-10-18", "estado": "Falta"}]}}
+    )
+
+    migraciones.migrar_evaluaciones()
+
+    assert bd.asistencias.count_documents({"alumno_id": alumno_id}) == 2
+
+
+def test_asistencia_iso_migrada_tiene_dia(bd):
+
+    bd.alumnos.insert_one({
+        "nombre": "Luis",
+        "asistencias": [{"fecha": "2026-10-18", "estado": "Falta"}]
+    })
+
+    migraciones.migrar_evaluaciones()
+
+    asistencia = bd.asistencias.find_one()
+
+    assert asistencia["fecha"] == "18/10/2026"
+    assert asistencia["dia"].day == 18
@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pytest
+
+from flask import Flask
+
+from utils import paginacion
+
+
+@pytest.fixture
+def app_pruebas():
+
+    app = Flask(__name__)
+
+    @app.route("/lista")
+    def lista():
+        return ""
+
+    return app
+
+
+def _recorrer(app, coleccion, orden, por_pagina=3, hacia="despues"):
+
+    # Todas las páginas siguiendo los enlaces
+    vistos = []
+
+    url = f"/lista?por_pagina={por_pagina}"
+
+    while url:
+
+        with app.test_request_context(url):
+            pagina = paginacion.paginar(coleccion, orden=orden)
+
+        vistos.append([e["_id"] for e in pagina["elementos"]])
+
+        url = pagina["siguiente" if hacia == "despues" else "anterior"]
+
+    return vistos
+
+
+def _sembrar(bd):
+
+    documentos = []
+
+    for i in range(10):
+
+        documento = {"_id": i}
+
+        # Algunos sin nombre, otros con null
+        if i % 3 == 0:
+            documento["nombre"] = None
+        elif i % 3 == 1:
+            documento["nombre"] = f"N{9 - i}"
+
+        documentos.append(documento)
+
+    bd.lista.insert_many(documentos)
+
+    return bd.lista
+
+
+@pytest.mark.parametrize("direccion", [1, -1])
+def test_llaves_nulas_no_cortan_el_recorrido(bd, app_pruebas, direccion):
+
+    coleccion = _sembrar(bd)
+
+    paginas = _recorrer(app_pruebas, coleccion, ("nombre", direccion))
+
+    vistos = [i for pagina in paginas for i in pagina]
+
+    esperado = [
+        d["_id"] for d in coleccion.find().sort(
+            [("nombre", direccion), ("_id", direccion)]
+        )
+    ]
+
+    assert vistos == esperado
+    assert len(vistos) == 10
+
+
+@pytest.mark.parametrize("direccion", [1, -1])
+def test_pagina_anterior_con_llaves_nulas(bd, app_pruebas, direccion):
+
+    coleccion = _sembrar(bd)
+
+    adelante = _recorrer(app_pruebas, coleccion, ("nombre", direccion))
+
+    # Desde la última página hacia atrás se ven las mismas
+    ultima = adelante[-1]
+
+    with app_pruebas.test_request_context("/lista?por_pagina=3"):
+
+        anterior = paginacion._codificar(
+            paginacion._llave(coleccion.find_one({"_id": ultima[0]}), "nombre")
+        )
+
+    url = f"/lista?por_pagina=3&antes={anterior}"
+
+    atras = []
+
+    while url:
+
+        with app_pruebas.test_request_context(url):
+            pagina = paginacion.paginar(coleccion, orden=("nombre", direccion))
+
+        atras.insert(0, [e["_id"] for e in pagina["elementos"]])
+
+        url = pagina["anterior"]
+
+    assert [i for p in atras for i in p] == [i for p in adelante[:-1] for i in p]
+
+
+def test_fechas_descendentes_con_faltantes(bd, app_pruebas):
+
+    bd.avisos.insert_many([
+        {"_id": 1, "fecha": datetime(2024, 1, 1)},
+        {"_id": 2},
+        {"_id": 3, "fecha": datetime(2024, 3, 1)},
+        {"_id": 4},
+        {"_id": 5, "fecha": datetime(2024, 2, 1)}
+    ])
+
+    paginas = _recorrer(app_pruebas, bd.avisos, ("fecha", -1), por_pagina=2)
+
+    assert [i for p in paginas for i in p] == [3, 5, 1, 4, 2]
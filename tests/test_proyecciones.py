@@ -0,0 +1,84 @@
+import bson
+import pytest
+
+from bson import ObjectId
+
+from database.proyecciones import COLECCION, PROYECCIONES, proyeccion
+
+ALUMNOS = 2000
+
+# Bytes BSON por alumno que cada vista puede traer como máximo
+LIMITES = {
+    "lista": 80,
+    "roster": 160,
+    "expediente": 700,
+    "kardex": 160,
+    "grupo": 40,
+}
+
+
+def _alumno(i):
+
+    # Foto ya en GridFS; las calificaciones y asistencias que
+    # aún traiga dentro el documento no deben viajar a ninguna vista
+    return {
+        "nombre": f"Alumno Número {i}",
+        "grupo": f"{1 + i % 6}A",
+        "usuario": f"alumno{i}",
+        "password": "pbkdf2:sha256:600000$" + "x" * 80,
+        "usuario_padre": f"padre{i}",
+        "password_padre": "pbkdf2:sha256:600000$" + "y" * 80,
+        "curp": f"CURP{i:014d}",
+        "telefono": "5512345678",
+        "direccion": "Calle Falsa 123, Colonia Centro",
+        "padre_nombre": "Tutor del alumno",
+        "padre_correo": f"tutor{i}@correo.mx",
+        "foto_id": ObjectId(),
+        "foto_miniatura_id": ObjectId(),
+        "calificaciones": [
+            {"materia": f"Materia {m}", "trimestre": t, "calificacion": 9}
+            for m in range(8) for t in (1, 2, 3)
+        ],
+        "asistencias": [
+            {"fecha": f"{d:02d}/09/2026", "estado": "Asistencia"}
+            for d in range(1, 29)
+        ]
+    }
+
+
+def _tamano(documentos):
+
+    return sum(len(bson.encode(documento)) for documento in documentos)
+
+
+def test_tamano_por_vista(bd):
+
+    bd.alumnos.insert_many([_alumno(i) for i in range(ALUMNOS)])
+
+    completo = _tamano(bd.alumnos.find())
+
+    for vista in PROYECCIONES:
+
+        documentos = list(bd[COLECCION[vista]].find({}, proyeccion(vista)))
+
+        assert len(documentos) == ALUMNOS
+
+        tamano = _tamano(documentos)
+
+        assert tamano <= LIMITES[vista] * ALUMNOS, vista
+        assert tamano < completo / 3, vista
+
+
+@pytest.mark.parametrize("vista", ["lista", "roster", "kardex", "grupo"])
+def test_vistas_sin_contrasenas(vista):
+
+    assert not {"password", "password_padre", "password_admin"} & set(PROYECCIONES[vista])
+
+
+def test_proyeccion_es_copia():
+
+    campos = proyeccion("lista")
+
+    campos["password"] = 1
+
+    assert "password" not in proyeccion("lista")
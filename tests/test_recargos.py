@@ -0,0 +1,105 @@
+from datetime import datetime
+
+from utils.recargos import aplicar_recargos_lote, clave_recargo
+
+HOY = datetime(2024, 6, 15, 9, 30)
+
+FECHA = "15/06/2024"
+
+
+def _sembrar(bd, cantidad):
+
+    bd.movimientos_pagos.create_index(
+        "recargo_clave",
+        unique=True,
+        partialFilterExpression={"recargo_clave": {"$exists": True}}
+    )
+
+    return bd.mensualidades.insert_many([
+        {
+            "pago_id": f"P{i}",
+            "alumno": f"Alumno {i}",
+            "monto": 1000,
+            "recargo": 0,
+            "pagado": False,
+            "anio": 2024,
+            "numero_mes": 3
+        }
+        for i in range(cantidad)
+    ]).inserted_ids
+
+
+def test_aplica_recargo_una_vez_por_dia(bd):
+
+    _sembrar(bd, 3)
+
+    resultado = aplicar_recargos_lote(10, hoy=HOY)
+
+    assert resultado == {"mensualidades": 3, "alumnos": 3, "total": 300}
+
+    assert aplicar_recargos_lote(10, hoy=HOY)["mensualidades"] == 0
+
+    assert bd.movimientos_pagos.count_documents({}) == 3
+    assert all(m["recargo"] == 100 for m in bd.mensualidades.find())
+
+
+def test_reintento_tras_caida_usa_el_movimiento_guardado(bd):
+
+    ids = _sembrar(bd, 2)
+
+    # Una ejecución anterior insertó el movimiento de la primera
+    # y se cayó antes de actualizar la mensualidad
+    bd.movimientos_pagos.insert_one({
+        "recargo_clave": clave_recargo(ids[0], FECHA),
+        "pago_id": "P0",
+        "monto": 100
+    })
+
+    resultado = aplicar_recargos_lote(10, hoy=HOY)
+
+    # El resumen cuenta también la que se completó
+    assert resultado["mensualidades"] == 2
+    assert resultado["total"] == 200
+
+    assert bd.movimientos_pagos.count_documents({}) == 2
+
+    for mensualidad in bd.mensualidades.find():
+        assert mensualidad["recargo"] == 100
+        assert mensualidad["ultimo_recargo"] == FECHA
+
+
+def test_duplicado_no_incrementa_con_otro_monto(bd):
+
+    ids = _sembrar(bd, 1)
+
+    bd.movimientos_pagos.insert_one({
+        "recargo_clave": clave_recargo(ids[0], FECHA),
+        "pago_id": "P0",
+        "monto": 50
+    })
+
+    resultado = aplicar_recargos_lote(10, hoy=HOY)
+
+    # Mensualidad, movimiento y resumen cuadran
+    assert bd.mensualidades.find_one()["recargo"] == 50
+    assert resultado["total"] == 50
+
+
+def test_resumen_cuadra_con_las_mensualidades(bd):
+
+    ids = _sembrar(bd, 3)
+
+    bd.movimientos_pagos.insert_one({
+        "recargo_clave": clave_recargo(ids[1], FECHA),
+        "pago_id": "P1",
+        "monto": 70
+    })
+
+    resultado = aplicar_recargos_lote(10, hoy=HOY)
+
+    sumado = sum(m["recargo"] for m in bd.mensualidades.find())
+
+    assert resultado["total"] == sumado == 270
+    assert resultado["mensualidades"] == bd.mensualidades.count_documents(
+        {"ultimo_recargo": FECHA}
+    )
@@ -0,0 +1,50 @@
+import pytest
+
+from utils.registro_escolar import guardar_asistencia, guardar_asistencias
+
+
+@pytest.fixture
+def alumno(bd):
+
+    bd.asistencias.create_index([("alumno_id", 1), ("fecha", 1)], unique=True)
+
+    documento = {"nombre": "Ana", "grupo": "1A"}
+
+    documento["_id"] = bd.alumnos.insert_one(dict(documento)).inserted_id
+
+    return documento
+
+
+def test_las_dos_formas_de_fecha_son_el_mismo_dia(bd, alumno):
+
+    guardar_asistencia(alumno, "2026-10-18", "Falta", "maestro")
+    guardar_asistencia(alumno, "18/10/2026", "Retardo", "maestro")
+
+    registros = list(bd.asistencias.find())
+
+    assert len(registros) == 1
+    assert registros[0]["fecha"] == "18/10/2026"
+    assert registros[0]["estado"] == "Retardo"
+
+
+def test_pase_de_lista_normaliza_la_fecha(bd, alumno):
+
+    guardar_asistencia(alumno, "18/10/2026", "Falta", "maestro")
+
+    resumen = guardar_asistencias([(alumno, "Asistencia")], "2026-10-18", "maestro")
+
+    assert resumen["actualizadas"] == 1
+    assert bd.asistencias.count_documents({}) == 1
+    assert bd.asistencias.find_one()["estado"] == "Asistencia"
+
+
+@pytest.mark.parametrize("fecha", [None, "", "18-10-2026", "31/02/2026"])
+def test_fecha_invalida_no_se_guarda(bd, alumno, fecha):
+
+    with pytest.raises(ValueError):
+        guardar_asistencia(alumno, fecha, "Falta", "maestro")
+
+    with pytest.raises(ValueError):
+        guardar_asistencias([(alumno, "Falta")], fecha, "maestro")
+
+    assert bd.asistencias.count_documents({}) == 0
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from utils.reportes_pagos import obtener_morosos
+
+HOY = datetime(2026, 6, 15)
+
+
+def _mensualidad(pago_id, anio, numero_mes, pagado, recargo=0):
+
+    return {
+        "pago_id": str(pago_id),
+        "anio": anio,
+        "numero_mes": numero_mes,
+        "pagado": pagado,
+        "recargo": recargo
+    }
+
+
+def test_morosos_con_recargos_de_todas_sus_mensualidades(bd_real):
+
+    debe, al_corriente, inactivo = bd_real.pagos.insert_many([
+        {"alumno": "Beto", "activo": True},
+        {"alumno": "Ana", "activo": True},
+        {"alumno": "Carla", "activo": False}
+    ]).inserted_ids
+
+    bd_real.mensualidades.insert_many([
+        _mensualidad(debe, 2026, 3, False, 50),
+        _mensualidad(debe, 2026, 2, True, 100),
+        # Del mes en curso: todavía no vence
+        _mensualidad(al_corriente, 2026, 6, False, 30),
+        _mensualidad(al_corriente, 2025, 11, True),
+        _mensualidad(inactivo, 2025, 12, False, 10),
+    ])
+
+    morosos = obtener_morosos(HOY)
+
+    assert [m["_id"] for m in morosos] == [debe]
+    assert morosos[0]["recargos_reales"] == 150
+
+
+def test_morosos_sin_recargos(bd_real):
+
+    pago_id = bd_real.pagos.insert_one({"alumno": "Beto"}).inserted_id
+
+    bd_real.mensualidades.insert_one(_mensualidad(pago_id, 2025, 1, False, 50))
+
+    morosos = obtener_morosos(HOY, con_recargos=False)
+
+    assert [m["_id"] for m in morosos] == [pago_id]
+    assert "recargos_reales" not in morosos[0]
@@ -0,0 +1,379 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bson import ObjectId
+from bson.timestamp import Timestamp
+
+from utils import backup_manager, respaldos_incrementales
+from utils.respaldos_incrementales import (
+    MAX_CADENA,
+    CadenaRota,
+    aplicar_cambios,
+    cadena_respaldo,
+    documentos_cambiados,
+    leer_cambios,
+    punto_de_partida
+)
+from utils.restauracion import crear_progreso, restaurar_colecciones
+
+
+def _manifiesto(bd, modo="completo", fecha=None, **campos):
+
+    manifiesto = {
+        "tipo": "control_escolar",
+        "nombre": f"backup_{modo}.json",
+        "estado": "Correcto",
+        "modo": modo,
+        "fecha": fecha or datetime.now(),
+        "operacion": Timestamp(1000, 1),
+        **campos
+    }
+
+    manifiesto["_id"] = bd.backups_archivos.insert_one(manifiesto).inserted_id
+
+    return manifiesto
+
+
+# =========================
+# LEER CAMBIOS
+# =========================
+def _token(tiempo):
+
+    datos = bytes([0x82]) + ((tiempo.time << 32) | tiempo.inc).to_bytes(8, "big")
+
+    return {"_data": datos.hex().upper() + "2B0229296E04"}
+
+
+def _evento(coleccion, _id, tiempo, tipo="update"):
+
+    return {
+        "operationType": tipo,
+        "clusterTime": tiempo,
+        "ns": {"db": "escuela", "coll": coleccion},
+        "documentKey": {"_id": _id}
+    }
+
+
+class _Flujo:
+
+    # Lotes de un change stream: una lista de eventos o None
+    # (lote vacío) con el resume token que trae
+    def __init__(self, lotes):
+
+        self.lotes = list(lotes)
+        self.resume_token = None
+        self.alive = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+    def try_next(self):
+
+        if not self.lotes:
+            pytest.fail("Siguió leyendo después de alcanzar el final")
+
+        cambio, self.resume_token = self.lotes.pop(0)
+
+        return cambio
+
+
+@pytest.fixture
+def flujo(monkeypatch):
+
+    def usar(lotes):
+
+        fuente = _Flujo(lotes)
+
+        class _Base:
+
+            def watch(self, pipeline, start_at_operation_time):
+                return fuente
+
+        monkeypatch.setattr(respaldos_incrementales, "obtener_db", _Base)
+
+        return fuente
+
+    return usar
+
+
+def test_lote_vacio_no_corta_la_lectura(flujo):
+
+    hasta = Timestamp(2000, 5)
+
+    flujo([
+        (_evento("alumnos", 1, Timestamp(1500, 1)), None),
+        # El oplog todavía no llega a "hasta"
+        (None, _token(Timestamp(1500, 1))),
+        (_evento("alumnos", 2, Timestamp(2000, 5)), None),
+        (None, _token(Timestamp(2000, 5)))
+    ])
+
+    cambios = leer_cambios(["alumnos", "maestros"], Timestamp(1000, 1), hasta)
+
+    assert cambios == {"alumnos": {1, 2}, "maestros": set()}
+
+
+def test_eventos_despues_de_hasta_son_del_siguiente(flujo):
+
+    flujo([
+        (_evento("alumnos", 1, Timestamp(1500, 1)), None),
+        (_evento("alumnos", 2, Timestamp(2001, 1)), None)
+    ])
+
+    cambios = leer_cambios(["alumnos"], Timestamp(1000, 1), Timestamp(2000, 5))
+
+    assert cambios == {"alumnos": {1}}
+
+
+def test_drop_rompe_la_cadena(flujo):
+
+    flujo([
+        (_evento("alumnos", None, Timestamp(1500, 1), tipo="drop"), None)
+    ])
+
+    with pytest.raises(CadenaRota):
+        leer_cambios(["alumnos"], Timestamp(1000, 1), Timestamp(2000, 5))
+
+
+def test_sin_tiempo_de_operacion_rompe_la_cadena():
+
+    with pytest.raises(CadenaRota):
+        leer_cambios(["alumnos"], Timestamp(1000, 1), None)
+
+
+# =========================
+# DOCUMENTOS Y APLICAR
+# =========================
+def test_documentos_cambiados_detecta_borrados(bd):
+
+    bd.alumnos.insert_many([
+        {"_id": 1, "nombre": "Ana"},
+        {"_id": 2, "nombre": "Luis"}
+    ])
+
+    cambios = list(documentos_cambiados(bd.alumnos, {1, 2, 3}))
+
+    guardados = {c["documento"]["_id"] for c in cambios if c["op"] == "guardar"}
+    borrados = [c["_id"] for c in cambios if c["op"] == "borrar"]
+
+    assert guardados == {1, 2}
+    assert borrados == [3]
+
+
+def test_aplicar_cambios_guarda_y_borra(bd):
+
+    bd.alumnos.insert_many([
+        {"_id": 1, "nombre": "Ana"},
+        {"_id": 2, "nombre": "Luis"}
+    ])
+
+    aplicados = aplicar_cambios(bd.alumnos, [
+        {"op": "guardar", "documento": {"_id": 1, "nombre": "Ana María"}},
+        {"op": "guardar", "documento": {"_id": 3, "nombre": "Eva"}},
+        {"op": "borrar", "_id": 2}
+    ])
+
+    assert aplicados == 3
+
+    assert {a["_id"]: a["nombre"] for a in bd.alumnos.find()} == {
+        1: "Ana María",
+        3: "Eva"
+    }
+
+
+# =========================
+# CADENA
+# =========================
+def test_incremental_continua_del_ultimo(bd):
+
+    hoy = datetime.now()
+
+    base = _manifiesto(bd, fecha=hoy - timedelta(days=2))
+
+    ultimo = _manifiesto(
+        bd, "incremental", fecha=hoy - timedelta(days=1),
+        base_id=base["_id"], anterior_id=base["_id"], eslabon=1
+    )
+
+    inicio, anterior = punto_de_partida("control_escolar", "incremental")
+
+    assert inicio["_id"] == base["_id"]
+    assert anterior["_id"] == ultimo["_id"]
+
+    # Un diferencial siempre parte del completo
+    inicio, anterior = punto_de_partida("control_escolar", "diferencial")
+
+    assert anterior["_id"] == base["_id"]
+
+
+def test_cadena_larga_pide_un_completo(bd):
+
+    base = _manifiesto(bd, fecha=datetime.now() - timedelta(days=1))
+
+    _manifiesto(
+        bd, "incremental",
+        base_id=base["_id"], anterior_id=base["_id"], eslabon=MAX_CADENA
+    )
+
+    with pytest.raises(CadenaRota):
+        punto_de_partida("control_escolar", "incremental")
+
+
+def test_sin_base_pide_un_completo(bd):
+
+    _manifiesto(
+        bd, "incremental",
+        base_id=ObjectId(), anterior_id=ObjectId(), eslabon=1
+    )
+
+    with pytest.raises(CadenaRota):
+        punto_de_partida("control_escolar", "incremental")
+
+
+def test_cadena_respaldo_en_orden(bd):
+
+    base = _manifiesto(bd)
+
+    primero = _manifiesto(
+        bd, "incremental", base_id=base["_id"], anterior_id=base["_id"]
+    )
+
+    segundo = _manifiesto(
+        bd, "incremental", base_id=base["_id"], anterior_id=primero["_id"]
+    )
+
+    cadena = cadena_respaldo(segundo)
+
+    assert [b["_id"] for b in cadena] == [
+        base["_id"], primero["_id"], segundo["_id"]
+    ]
+
+    bd.backups_archivos.delete_one({"_id": primero["_id"]})
+
+    with pytest.raises(CadenaRota):
+        cadena_respaldo(segundo)
+
+
+# =========================
+# RESPALDAR
+# =========================
+@pytest.fixture
+def creados(monkeypatch):
+
+    # crear_respaldo usa GridFS, que mongomock no tiene
+    llamadas = []
+
+    def crear(tipo, nombre, fuentes, usuario, **extra):
+
+        llamadas.append(extra)
+
+        return ObjectId()
+
+    monkeypatch.setattr(backup_manager, "crear_respaldo", crear)
+    monkeypatch.setattr(
+        backup_manager, "tiempo_operacion", lambda: Timestamp(2000, 1)
+    )
+
+    return llamadas
+
+
+def test_incremental_sin_base_hace_un_completo(bd, creados):
+
+    backup_manager._respaldar("control_escolar", "prueba", modo="incremental")
+
+    assert [c["modo"] for c in creados] == ["completo"]
+    assert creados[0]["eslabon"] == 0
+
+
+def test_cadena_rota_al_leer_hace_un_completo(bd, creados, monkeypatch):
+
+    _manifiesto(bd)
+
+    def leer(nombres, desde, hasta):
+        raise CadenaRota("drop en alumnos")
+
+    monkeypatch.setattr(backup_manager, "leer_cambios", leer)
+
+    backup_manager._respaldar("control_escolar", "prueba", modo="incremental")
+
+    assert [c["modo"] for c in creados] == ["completo"]
+
+
+def test_incremental_lee_hasta_su_operacion(bd, creados, monkeypatch):
+
+    base = _manifiesto(bd)
+
+    lecturas = []
+
+    def leer(nombres, desde, hasta):
+
+        lecturas.append((desde, hasta))
+
+        return {nombre: set() for nombre in nombres}
+
+    monkeypatch.setattr(backup_manager, "leer_cambios", leer)
+
+    backup_manager._respaldar("control_escolar", "prueba", modo="incremental")
+
+    assert lecturas == [(Timestamp(1000, 1), Timestamp(2000, 1))]
+
+    assert creados[0]["modo"] == "incremental"
+    assert creados[0]["anterior_id"] == base["_id"]
+    assert creados[0]["operacion"] == Timestamp(2000, 1)
+
+
+# =========================
+# RESTAURAR LA CADENA
+# =========================
+def _alumno(_id, nombre):
+
+    # "usuario" tiene índice único
+    return {"_id": _id, "nombre": nombre, "usuario": f"alumno{_id}"}
+
+
+def test_restaurar_base_y_dos_incrementales(bd):
+
+    # Respaldos anteriores a GridFS: todo en "contenido"
+    base = _manifiesto(bd, contenido={"alumnos": [
+        _alumno(1, "Ana"),
+        _alumno(2, "Luis"),
+        _alumno(3, "Eva")
+    ]})
+
+    primero = _manifiesto(
+        bd, "incremental",
+        base_id=base["_id"], anterior_id=base["_id"],
+        contenido={"alumnos": [
+            {"op": "guardar", "documento": _alumno(1, "Ana María")},
+            {"op": "borrar", "_id": 2}
+        ]}
+    )
+
+    segundo = _manifiesto(
+        bd, "incremental",
+        base_id=base["_id"], anterior_id=primero["_id"],
+        contenido={"alumnos": [
+            {"op": "guardar", "documento": _alumno(4, "Sofía")},
+            {"op": "guardar", "documento": _alumno(1, "Ana M.")}
+        ]}
+    )
+
+    bd.alumnos.insert_one(_alumno(99, "Actual"))
+
+    restaurar_colecciones(
+        [base, primero, segundo],
+        ["alumnos"],
+        crear_progreso(segundo, "pruebas")
+    )
+
+    assert {a["_id"]: a["nombre"] for a in bd.alumnos.find()} == {
+        1: "Ana M.",
+        3: "Eva",
+        4: "Sofía"
+    }
+
+    assert "alumnos__restauracion" not in bd.list_collection_names()
@@ -0,0 +1,55 @@
+from bson import ObjectId
+
+from utils.almacen_respaldos import crear_respaldo
+from utils.restauracion import crear_progreso, restaurar_colecciones
+
+
+def _respaldar(bd, nombres):
+
+    backup_id = crear_respaldo(
+        "control_escolar",
+        "prueba.json",
+        [(nombre, bd[nombre].find()) for nombre in nombres]
+    )
+
+    return bd.backups_archivos.find_one({"_id": backup_id})
+
+
+def _restaurar(backup, nombres):
+
+    restaurar_colecciones([backup], nombres, crear_progreso(backup, "pruebas"))
+
+
+# =========================
+# MEDIOS
+# =========================
+def test_restaurar_medios_agrega_sin_borrar(bd_real):
+
+    anterior, nueva = ObjectId(), ObjectId()
+
+    bd_real["medios.files"].insert_one({"_id": anterior, "length": 1})
+    bd_real["medios.chunks"].insert_one({"files_id": anterior, "n": 0})
+    bd_real.alumnos.insert_one({"nombre": "Ana", "foto_id": anterior})
+
+    nombres = ["alumnos", "medios.files", "medios.chunks"]
+
+    backup = _respaldar(bd_real, nombres)
+
+    # Se reemplaza la foto después del respaldo
+    bd_real["medios.files"].delete_one({"_id": anterior})
+    bd_real["medios.chunks"].delete_many({"files_id": anterior})
+    bd_real["medios.files"].insert_one({"_id": nueva, "length": 1})
+    bd_real["medios.chunks"].insert_one({"files_id": nueva, "n": 0})
+    bd_real.alumnos.update_one({}, {"$set": {"foto_id": nueva}})
+
+    _restaurar(backup, nombres)
+
+    # El alumno vuelve a la foto del respaldo y esta existe
+    assert bd_real.alumnos.find_one()["foto_id"] == anterior
+
+    archivos = {a["_id"] for a in bd_real["medios.files"].find()}
+
+    assert archivos == {anterior, nueva}
+    assert bd_real["medios.chunks"].count_documents({}) == 2
+
+    assert "medios.files__restauracion" not in bd_real.list_collection_names()
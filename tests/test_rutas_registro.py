@@ -0,0 +1,95 @@
+from datetime import date
+
+import pytest
+
+import app as aplicacion
+
+
+@pytest.fixture
+def cliente(bd, monkeypatch):
+
+    monkeypatch.setattr(aplicacion, "licencia_activa", lambda: True)
+    monkeypatch.setattr(aplicacion, "asegurar_programador", lambda: None)
+
+    return aplicacion.app.test_client()
+
+
+def _iniciar_sesion(cliente, rol, usuario):
+
+    with cliente.session_transaction() as sesion:
+
+        sesion.permanent = True
+        sesion["usuario"] = usuario
+        sesion["rol"] = rol
+        sesion["modo_restringido"] = False
+        sesion["renovada"] = date.today().isoformat()
+
+
+@pytest.fixture
+def alumno_id(bd):
+
+    return bd.alumnos.insert_one({"nombre": "Ana López", "grupo": "1A"}).inserted_id
+
+
+# =========================
+# ASISTENCIAS
+# =========================
+def test_formulario_guarda_asistencia(bd, cliente, alumno_id):
+
+    _iniciar_sesion(cliente, "maestro", "maestra1")
+
+    respuesta = cliente.post("/guardar_asistencia", data={
+        "alumno": str(alumno_id),
+        "fecha": "18/10/2026",
+        "estado": "Falta"
+    })
+
+    assert respuesta.status_code == 302
+
+    asistencia = bd.asistencias.find_one({"alumno_id": alumno_id})
+
+    assert asistencia["fecha"] == "18/10/2026"
+    assert asistencia["estado"] == "Falta"
+    assert asistencia["maestro"] == "maestra1"
+
+
+def test_ajax_guarda_asistencia(bd, cliente, alumno_id):
+
+    _iniciar_sesion(cliente, "maestro", "maestra1")
+
+    respuesta = cliente.post("/guardar_asistencia_ajax", data={
+        "alumno": str(alumno_id),
+        "fecha": "2026-10-18",
+        "estado": "Retardo"
+    })
+
+    assert respuesta.get_json() == {"status": "ok"}
+
+    assert bd.asistencias.find_one({"alumno_id": alumno_id})["fecha"] == "18/10/2026"
+
+
+# =========================
+# ENTERADO
+# =========================
+def test_padre_marca_enterado(bd, cliente, alumno_id):
+
+    bd.calificaciones.insert_many([
+        {"alumno_id": alumno_id, "materia": "Español", "trimestre": "1"},
+        {"alumno_id": alumno_id, "materia": "Historia", "trimestre": "1"}
+    ])
+
+    _iniciar_sesion(cliente, "padre", "padre1")
+
+    respuesta = cliente.post("/enterado", data={
+        "alumno": "Ana López",
+        "materia": "Español"
+    })
+
+    assert respuesta.status_code == 302
+
+    enterados = {
+        c["materia"]: c.get("enterado", False)
+        for c in bd.calificaciones.find()
+    }
+
+    assert enterados == {"Español": True, "Historia": False}
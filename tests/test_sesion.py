@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from bson import ObjectId
+
+import app as aplicacion
+
+
+@pytest.fixture
+def cliente(bd, monkeypatch):
+
+    monkeypatch.setattr(aplicacion, "licencia_activa", lambda: True)
+    monkeypatch.setattr(aplicacion, "asegurar_programador", lambda: None)
+
+    return aplicacion.app.test_client()
+
+
+def _iniciar_sesion(cliente, **extra):
+
+    with cliente.session_transaction() as sesion:
+
+        sesion.permanent = True
+        sesion["usuario"] = "admin"
+        sesion["rol"] = "admin"
+        sesion.update(extra)
+
+
+def _pedir(cliente):
+
+    return cliente.get(f"/admin/backup/restauracion/{ObjectId()}")
+
+
+def test_sesion_sin_cambios_no_reenvia_la_cookie(cliente):
+
+    _iniciar_sesion(
+        cliente,
+        modo_restringido=False,
+        renovada=date.today().isoformat()
+    )
+
+    respuesta = _pedir(cliente)
+
+    assert respuesta.status_code == 404
+    assert "Set-Cookie" not in respuesta.headers
+
+
+def test_sesion_se_renueva_una_vez_al_dia(cliente):
+
+    _iniciar_sesion(cliente, modo_restringido=False, renovada="2000-01-01")
+
+    assert "Set-Cookie" in _pedir(cliente).headers
+
+    assert "Set-Cookie" not in _pedir(cliente).headers
+
+
+def test_cambio_de_licencia_reenvia_la_cookie(cliente):
+
+    _iniciar_sesion(
+        cliente,
+        modo_restringido=True,
+        renovada=date.today().isoformat()
+    )
+
+    assert "Set-Cookie" in _pedir(cliente).headers
@@ -0,0 +1,567 @@
+import hashlib
+import sys
+import time
+
+from datetime import datetime
+
+from bson import json_util
+
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+from config import Config
+
+from database.mongo import obtener_db, backups_archivos
+
+from utils.compresion import (
+    COMPRESIONES,
+    comprimir,
+    compresor,
+    descompresor,
+    disponibles,
+    elegir,
+    lector
+)
+
+# =========================
+# ALMACÉN DE RESPALDOS
+# =========================
+# Cada respaldo es un documento de manifiesto en
+# backups_archivos y un archivo por colección en GridFS
+# (bucket "respaldos"): NDJSON comprimido, un documento por
+# línea. La compresión (gzip o zstd, RESPALDOS_COMPRESION) queda
+# en el manifiesto; ver utils/compresion.py.
+#
+#   colecciones: [{nombre, archivo_id, documentos,
+#                  tamano, tamano_original, sha256}, ...]
+#
+# Los cursores se recorren por lotes y cada lote se comprime
+# y se escribe de inmediato: la memoria no crece con la base.
+# El sha256 es del archivo comprimido y se revisa al leerlo.
+#
+# Cada línea es Extended JSON canónico: _id, ObjectId, fechas,
+# Decimal128 y enteros de 64 bits vuelven con su tipo, y las
+# referencias (pago_id, alumno_id...) siguen apuntando a lo mismo
+# después de restaurar.
+#
+# Los respaldos anteriores (versión 1.0) guardan todo en
+# "contenido"; leer_coleccion() entiende ambos formatos. Los 2.0
+# se escribieron sin _id y con json plano, que también se lee.
+
+BUCKET = "respaldos"
+
+FORMATO = "ndjson"
+
+VERSION = "2.1"
+
+TAMANO_LOTE = 500
+
+TAMANO_BLOQUE = 256 * 1024
+
+
+def _bucket():
+
+    return GridFSBucket(obtener_db(), bucket_name=BUCKET)
+
+
+def codificar(documento):
+
+    return json_util.dumps(
+        documento,
+        json_options=json_util.CANONICAL_JSON_OPTIONS,
+        ensure_ascii=False
+    )
+
+
+def decodificar(linea):
+
+    return json_util.loads(
+        linea,
+        json_options=json_util.CANONICAL_JSON_OPTIONS
+    )
+
+
+# =========================
+# ESCRIBIR
+# =========================
+def _compresion(backup):
+
+    # Los respaldos 2.0 y 2.1 solo conocían gzip
+    return backup.get("compresion", "gzip")
+
+
+def _escribir_coleccion(bucket, respaldo, nombre, documentos, compresion):
+
+    compactador = compresor(compresion)
+
+    suma = hashlib.sha256()
+
+    resultado = {
+        "nombre": nombre,
+        "documentos": 0,
+        "tamano": 0,
+        "tamano_original": 0
+    }
+
+    archivo = bucket.open_upload_stream(
+        f"{respaldo}/{nombre}.{FORMATO}.{COMPRESIONES[compresion]['extension']}",
+        metadata={"respaldo": respaldo, "coleccion": nombre}
+    )
+
+    def volcar(bloque):
+
+        if bloque:
+
+            archivo.write(bloque)
+
+            suma.update(bloque)
+
+            resultado["tamano"] += len(bloque)
+
+    def lote(lineas):
+
+        datos = ("\n".join(lineas) + "\n").encode("utf-8")
+
+        resultado["documentos"] += len(lineas)
+        resultado["tamano_original"] += len(datos)
+
+        volcar(compactador.compress(datos))
+
+    try:
+
+        lineas = []
+
+        for documento in documentos:
+
+            lineas.append(codificar(documento))
+
+            if len(lineas) >= TAMANO_LOTE:
+
+                lote(lineas)
+
+                lineas = []
+
+        if lineas:
+            lote(lineas)
+
+        volcar(compactador.flush())
+
+    except Exception:
+
+        # Sin archivo a medias en GridFS
+        archivo.abort()
+
+        raise
+
+    archivo.close()
+
+    resultado["archivo_id"] = archivo._id
+
+    resultado["sha256"] = suma.hexdigest()
+
+    return resultado
+
+
+def documentos_de(coleccion):
+
+    return coleccion.find({}).batch_size(TAMANO_LOTE)
+
+
+def crear_respaldo(tipo, nombre, fuentes, usuario="Administrador", **extra):
+
+    # fuentes: [(nombre, documentos), ...]; documentos se recorre
+    # una sola vez (cursor o generador). extra va al manifiesto.
+    compresion = elegir(Config.RESPALDOS_COMPRESION)
+
+    backup_id = backups_archivos.insert_one({
+        **extra,
+        "tipo": tipo,
+        "nombre": nombre,
+        "fecha": datetime.now(),
+        "usuario": usuario,
+        "formato": f"{FORMATO}.{COMPRESIONES[compresion]['extension']}",
+        "compresion": compresion,
+        "colecciones": [],
+        "tamano": 0,
+        "estado": "En proceso",
+        "version": VERSION,
+        "restaurado": False
+    }).inserted_id
+
+    bucket = _bucket()
+
+    try:
+
+        for nombre_coleccion, documentos in fuentes:
+
+            resultado = _escribir_coleccion(
+                bucket,
+                nombre,
+                nombre_coleccion,
+                documentos,
+                compresion
+            )
+
+            backups_archivos.update_one(
+                {"_id": backup_id},
+                {
+                    "$push": {"colecciones": resultado},
+                    "$inc": {"tamano": resultado["tamano"]}
+                }
+            )
+
+    except Exception:
+
+        _borrar_archivos(backups_archivos.find_one({"_id": backup_id}))
+
+        backups_archivos.update_one(
+            {"_id": backup_id},
+            {"$set": {"estado": "Error", "colecciones": [], "tamano": 0}}
+        )
+
+        raise
+
+    backups_archivos.update_one(
+        {"_id": backup_id},
+        {"$set": {"estado": "Correcto"}}
+    )
+
+    return backup_id
+
+
+# =========================
+# LEER
+# =========================
+def _entrada(backup, nombre):
+
+    for entrada in backup.get("colecciones", []):
+
+        if entrada["nombre"] == nombre:
+            return entrada
+
+    return None
+
+
+def leer_lineas(backup, nombre):
+
+    # Líneas JSON (bytes, sin salto) de una colección
+    entrada = _entrada(backup, nombre)
+
+    if not entrada:
+        return
+
+    expansor = descompresor(_compresion(backup))
+
+    suma = hashlib.sha256()
+
+    pendiente = b""
+
+    with _bucket().open_download_stream(entrada["archivo_id"]) as archivo:
+
+        while True:
+
+            bloque = archivo.read(TAMANO_BLOQUE)
+
+            if not bloque:
+                break
+
+            suma.update(bloque)
+
+            lineas = (pendiente + expansor.decompress(bloque)).split(b"\n")
+
+            pendiente = lineas.pop()
+
+            yield from (linea for linea in lineas if linea)
+
+    pendiente += expansor.flush()
+
+    if pendiente.strip():
+        yield pendiente
+
+    if suma.hexdigest() != entrada["sha256"]:
+
+        raise ValueError(
+            f"Respaldo dañado: {backup.get('nombre')}/{nombre} "
+            "no coincide con su sha256"
+        )
+
+
+def leer_coleccion(backup, nombre):
+
+    if "contenido" in backup:
+
+        yield from (backup["contenido"] or {}).get(nombre) or []
+
+        return
+
+    for linea in leer_lineas(backup, nombre):
+        yield decodificar(linea)
+
+
+def documentos_coleccion(backup, nombre):
+
+    if "contenido" in backup:
+        return len((backup["contenido"] or {}).get(nombre) or [])
+
+    entrada = _entrada(backup, nombre)
+
+    return entrada["documentos"] if entrada else 0
+
+
+def nombres_colecciones(backup):
+
+    if "contenido" in backup:
+        return list((backup["contenido"] or {}).keys())
+
+    return [entrada["nombre"] for entrada in backup.get("colecciones", [])]
+
+
+# =========================
+# DESCARGA
+# =========================
+# Un solo archivo .ndjson.gz (o .zst): por cada colección, una
+# línea de encabezado y luego sus archivos de GridFS copiados
+# tal cual, sin descomprimir. Los encabezados son miembros (o
+# frames) aparte; los lectores de gzip y zstd los encadenan.
+#
+#   {"$respaldo": {"coleccion": "alumnos", "documentos": 120,
+#                  "modo": "completo"}}
+def _encabezado(backup, nombre, documentos):
+
+    return (codificar({
+        "$respaldo": {
+            "coleccion": nombre,
+            "documentos": documentos,
+            "modo": backup.get("modo", "completo")
+        }
+    }) + "\n").encode("utf-8")
+
+
+def compresion_descarga(backup):
+
+    # Los 1.0 no tienen archivos: se comprimen al vuelo en gzip
+    return "gzip" if "contenido" in backup else _compresion(backup)
+
+
+def nombre_descarga(backup):
+
+    extension = COMPRESIONES[compresion_descarga(backup)]["extension"]
+
+    base = backup["nombre"].rsplit(".json", 1)[0]
+
+    return f"{base}.{FORMATO}.{extension}"
+
+
+def flujo_descarga(backup):
+
+    compresion = compresion_descarga(backup)
+
+    if "contenido" in backup:
+
+        compactador = compresor(compresion)
+
+        for nombre in nombres_colecciones(backup):
+
+            documentos = (backup["contenido"] or {}).get(nombre) or []
+
+            yield compactador.compress(
+                _encabezado(backup, nombre, len(documentos))
+            )
+
+            for documento in documentos:
+
+                yield compactador.compress(
+                    (codificar(documento) + "\n").encode("utf-8")
+                )
+
+        yield compactador.flush()
+
+        return
+
+    bucket = _bucket()
+
+    for entrada in backup.get("colecciones", []):
+
+        yield comprimir(
+            _encabezado(backup, entrada["nombre"], entrada["documentos"]),
+            compresion
+        )
+
+        with bucket.open_download_stream(entrada["archivo_id"]) as archivo:
+
+            while True:
+
+                bloque = archivo.read(TAMANO_BLOQUE)
+
+                if not bloque:
+                    break
+
+                yield bloque
+
+
+def leer_descarga(archivo, compresion):
+
+    # (encabezado, documento) por cada línea de una descarga
+    encabezado = None
+
+    for linea in lector(archivo, compresion):
+
+        if not linea.strip():
+            continue
+
+        documento = decodificar(linea)
+
+        if "$respaldo" in documento:
+
+            encabezado = documento["$respaldo"]
+
+            continue
+
+        yield encabezado, documento
+
+
+# =========================
+# BORRAR
+# =========================
+def _borrar_archivos(backup):
+
+    if not backup:
+        return
+
+    bucket = _bucket()
+
+    for entrada in backup.get("colecciones", []):
+
+        try:
+            bucket.delete(entrada["archivo_id"])
+        except NoFile:
+            pass
+
+
+def borrar_respaldo(backup):
+
+    _borrar_archivos(backup)
+
+    backups_archivos.delete_one({"_id": backup["_id"]})
+
+
+# =========================
+# MEDICIÓN
+# =========================
+# Compara las compresiones disponibles sobre los datos reales,
+# sin escribir nada:
+#
+#   python -m utils.almacen_respaldos medir [tipo]
+def medir_compresion(fuentes, compresiones=None):
+
+    # fuentes: [(nombre, documentos), ...] como en crear_respaldo
+    compresiones = compresiones or disponibles()
+
+    medidas = {
+        compresion: {
+            "original": 0,
+            "comprimido": 0,
+            "comprimir": 0.0,
+            "descomprimir": 0.0
+        }
+        for compresion in compresiones
+    }
+
+    documentos = 0
+
+    codificacion = 0.0
+
+    compactadores = {c: compresor(c) for c in compresiones}
+
+    expansores = {c: descompresor(c) for c in compresiones}
+
+    def medir_bloque(datos, final=False):
+
+        for compresion in compresiones:
+
+            medida = medidas[compresion]
+
+            inicio = time.perf_counter()
+
+            bloque = compactadores[compresion].compress(datos)
+
+            if final:
+                bloque += compactadores[compresion].flush()
+
+            medida["comprimir"] += time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+
+            expansores[compresion].decompress(bloque)
+
+            medida["descomprimir"] += time.perf_counter() - inicio
+
+            medida["original"] += len(datos)
+            medida["comprimido"] += len(bloque)
+
+    for _, cursor in fuentes:
+
+        lineas = []
+
+        for documento in cursor:
+
+            inicio = time.perf_counter()
+
+            lineas.append(codificar(documento))
+
+            codificacion += time.perf_counter() - inicio
+
+            if len(lineas) >= TAMANO_LOTE:
+
+                documentos += len(lineas)
+
+                medir_bloque(("\n".join(lineas) + "\n").encode("utf-8"))
+
+                lineas = []
+
+        if lineas:
+
+            documentos += len(lineas)
+
+            medir_bloque(("\n".join(lineas) + "\n").encode("utf-8"))
+
+    medir_bloque(b"", final=True)
+
+    return documentos, codificacion, medidas
+
+
+if __name__ == "__main__":
+
+    from utils.backup_manager import COLECCIONES
+
+    argumentos = sys.argv[1:]
+
+    if not argumentos or argumentos[0] != "medir":
+
+        print("Uso: python -m utils.almacen_respaldos medir [tipo]")
+
+        sys.exit(2)
+
+    tipo = argumentos[1] if len(argumentos) > 1 else "sistema"
+
+    documentos, codificacion, medidas = medir_compresion([
+        (nombre, documentos_de(coleccion))
+        for coleccion, nombre in COLECCIONES[tipo]
+    ])
+
+    print(f"📦 {tipo}: {documentos} documentos, Extended JSON en {codificacion:.2f} s")
+
+    for compresion, medida in medidas.items():
+
+        megas = medida["original"] / (1024 * 1024)
+
+        print(
+            f"  {compresion}: "
+            f"{megas:.1f} MB -> {medida['comprimido'] / (1024 * 1024):.1f} MB "
+            f"(x{medida['original'] / max(medida['comprimido'], 1):.1f}), "
+            f"comprime {megas / max(medida['comprimir'], 1e-9):.0f} MB/s, "
+            f"descomprime {megas / max(medida['descomprimir'], 1e-9):.0f} MB/s"
+        )
+
+    if "zstd" not in medidas:
+        print("  zstd: no instalado (pip install zstandard)")
@@ -1,15 +1,64 @@
 import json
-
-from io import BytesIO
+import threading
 
 from datetime import datetime, timedelta
 
-from flask import send_file
+from flask import Response
+
+from config import Config
 
 from bson import json_util
 
 from bson import ObjectId
 
+from utils.cache_configuracion import invalidar_configuracion
+
+from utils.resumen_financiero import reconstruir_resumen
+
+from utils.normalizar import completar_claves
+
+from utils.busqueda import completar_busqueda
+
+from database.migraciones import migrar_evaluaciones
+
+from utils.bloqueos import tomar_lease, liberar_lease
+
+from utils.restauracion import (
+    crear_progreso,
+    marcar_etapa,
+    restaurar_colecciones,
+    restaurar_flujo,
+    terminar_progreso
+)
+
+from utils.respaldos_incrementales import (
+    CadenaRota,
+    cadena_respaldo,
+    dependientes,
+    documentos_cambiados,
+    leer_cambios,
+    punto_de_partida,
+    tiempo_operacion
+)
+
+from utils.compresion import COMPRESIONES, por_extension
+
+from utils.medios import medios_archivos, medios_bloques
+
+from utils.almacen_respaldos import (
+    borrar_respaldo,
+    codificar,
+    compresion_descarga,
+    crear_respaldo,
+    documentos_de,
+    flujo_descarga,
+    leer_coleccion,
+    leer_descarga,
+    leer_lineas,
+    nombre_descarga,
+    nombres_colecciones
+)
+
 from database.mongo import (
 
     alumnos,
@@ -35,6 +84,7 @@ from database.mongo import (
     bitacora_restauraciones,
     backups_archivos,
     calificaciones,
+    asistencias,
     admins_secundarios,
     bitacora,
     auditoria
@@ -42,49 +92,65 @@ from database.mongo import (
     )
 
 
-def nombre_backup(tipo):
+# =========================
+# COLECCIONES POR TIPO
+# =========================
+_ESCOLARES = [
+    (alumnos, "alumnos"),
+    (maestros, "maestros"),
+    (grupos, "grupos"),
+    (materias, "materias"),
+    (horarios, "horarios"),
+    (reportes, "reportes"),
+    (citatorios, "citatorios"),
+    (avisos, "avisos"),
+    (usuarios, "usuarios"),
+    (padres, "padres"),
+    (calificaciones, "calificaciones"),
+    (asistencias, "asistencias"),
+    (admins_secundarios, "admins_secundarios")
+]
 
-    fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+_FINANCIERAS = [
+    (pagos, "pagos"),
+    (movimientos_pagos, "movimientos_pagos"),
+    (mensualidades, "mensualidades"),
+    (config_recargos, "config_recargos"),
+    (bitacora_pagos, "bitacora_pagos")
+]
 
-    return f"backup_{tipo}_{fecha}.json"
+_AUDITORIA = [
+    (bitacora, "bitacora"),
+    (auditoria, "auditoria")
+]
 
-def guardar_backup_mongo(
-    tipo,
-    nombre,
-    datos,
-    usuario="Administrador"
-):
+# Bucket GridFS de fotos y escudo (utils/medios.py)
+_MEDIOS = [
+    (medios_archivos, "medios.files"),
+    (medios_bloques, "medios.chunks")
+]
 
-    backups_archivos.insert_one(
+COLECCIONES = {
 
-        {
-
-            "tipo": tipo,
-
-            "nombre": nombre,
-
-            "fecha": datetime.now(),
-
-            "usuario": usuario,
+    "financiero": _FINANCIERAS,
 
-            "contenido": datos,
+    "control_escolar": _ESCOLARES + _AUDITORIA + _MEDIOS,
 
-            "tamano": len(
-                json.dumps(
-                    datos,
-                    default=str
-                )
-            ),
-
-            "estado": "Correcto",
+    "sistema": (
+        _ESCOLARES
+        + _FINANCIERAS
+        + [(configuracion, "configuracion")]
+        + _AUDITORIA
+        + _MEDIOS
+    )
 
-            "version": "1.0",
+}
 
-            "restaurado": False
+def nombre_backup(tipo):
 
-        }
+    fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    )
+    return f"backup_{tipo}_{fecha}.json"
 
 def registrar_restauracion(
 
@@ -120,310 +186,128 @@ def registrar_restauracion(
 
     )
 
-def crear_backup_financiero_interno():
+# =========================
+# CREAR RESPALDOS
+# =========================
+def _respaldar(tipo, sufijo, usuario="Administrador", modo="completo"):
 
-    data = {
+    backup_id = None
 
-        "pagos": list(
-            pagos.find({}, {"_id": 0})
-        ),
+    if modo != "completo":
 
-        "movimientos_pagos": list(
-            movimientos_pagos.find({}, {"_id": 0})
-        ),
+        try:
 
-        "mensualidades": list(
-            mensualidades.find({}, {"_id": 0})
-        ),
-
-        "config_recargos": list(
-            config_recargos.find({}, {"_id": 0})
-        ),
-
-        "bitacora_pagos": list(
-            bitacora_pagos.find({}, {"_id": 0})
-        )
-
-    }
-
-    nombre = nombre_backup(
-        "financiero"
-    )
+            backup_id = _respaldar_cambios(tipo, sufijo, usuario, modo)
 
-    guardar_backup_mongo(
+        except CadenaRota:
 
-        "financiero",
+            # Sin cadena que continuar: va un completo
+            backup_id = None
 
-        nombre,
+    if backup_id is None:
 
-        data
+        operacion = tiempo_operacion()
 
-    )
+        backup_id = crear_respaldo(
+            tipo,
+            nombre_backup(sufijo),
+            [
+                (nombre, documentos_de(coleccion))
+                for coleccion, nombre in COLECCIONES[tipo]
+            ],
+            usuario,
+            modo="completo",
+            operacion=operacion,
+            eslabon=0
+        )
 
     configuracion_backups.update_one(
 
         {
-
-            "tipo": "financiero"
-
+            "tipo": tipo
         },
 
         {
-
             "$set": {
-
                 "ultima_ejecucion": datetime.now()
-
             }
-
         },
 
         upsert=True
 
     )
 
-    return data
-
-def crear_backup_control_escolar_interno():
-
-    data = {
+    return backup_id
 
-        "alumnos": list(
-            alumnos.find({}, {"_id": 0})
-        ),
 
-        "maestros": list(
-            maestros.find({}, {"_id": 0})
-        ),
+def _respaldar_cambios(tipo, sufijo, usuario, modo):
 
-        "grupos": list(
-            grupos.find({}, {"_id": 0})
-        ),
+    base, anterior = punto_de_partida(tipo, modo)
 
-        "materias": list(
-            materias.find({}, {"_id": 0})
-        ),
+    # Antes de leer: lo que cambie después entra en el siguiente
+    operacion = tiempo_operacion()
 
-        "horarios": list(
-            horarios.find({}, {"_id": 0})
-        ),
-
-        "reportes": list(
-            reportes.find({}, {"_id": 0})
-        ),
-
-        "citatorios": list(
-            citatorios.find({}, {"_id": 0})
-        ),
-
-        "avisos": list(
-            avisos.find({}, {"_id": 0})
-        ),
-
-        "usuarios": list(
-            usuarios.find({}, {"_id": 0})
-        ),
-
-        "padres": list(
-            padres.find({}, {"_id": 0})
-        ),
-
-        "calificaciones": list(
-            calificaciones.find({}, {"_id": 0})
-        ),
-
-        "admins_secundarios": list(
-            admins_secundarios.find({}, {"_id": 0})
-        ),
-
-        "bitacora": list(
-            bitacora.find({}, {"_id": 0})
-        ),
-
-        "auditoria": list(
-            auditoria.find({}, {"_id": 0})
-        )
-
-    }
-
-    nombre = nombre_backup(
-        "control_escolar_auto"
+    cambios = leer_cambios(
+        [nombre for _, nombre in COLECCIONES[tipo]],
+        anterior["operacion"],
+        operacion
     )
 
-    guardar_backup_mongo(
-
-        "control_escolar",
-
-        nombre,
-
-        data
-
-    )
-
-    configuracion_backups.update_one(
-
-        {
-
-            "tipo": "control_escolar"
-
-        },
-
-        {
-
-            "$set": {
-
-                "ultima_ejecucion": datetime.now()
-
-            }
-
-        },
-
-        upsert=True
-
+    return crear_respaldo(
+        tipo,
+        nombre_backup(f"{sufijo}_{modo}"),
+        [
+            (nombre, documentos_cambiados(coleccion, cambios[nombre]))
+            for coleccion, nombre in COLECCIONES[tipo]
+        ],
+        usuario,
+        modo=modo,
+        operacion=operacion,
+        base_id=base["_id"],
+        anterior_id=anterior["_id"],
+        eslabon=anterior.get("eslabon", 0) + 1
     )
 
-    return data
-
-def crear_backup_sistema_interno():
-
-    data = {
-
-        # =========================
-        # CONTROL ESCOLAR
-        # =========================
-
-        "alumnos": list(
-            alumnos.find({}, {"_id": 0})
-        ),
-
-        "maestros": list(
-            maestros.find({}, {"_id": 0})
-        ),
-
-        "grupos": list(
-            grupos.find({}, {"_id": 0})
-        ),
-
-        "materias": list(
-            materias.find({}, {"_id": 0})
-        ),
-
-        "horarios": list(
-            horarios.find({}, {"_id": 0})
-        ),
-
-        "reportes": list(
-            reportes.find({}, {"_id": 0})
-        ),
-
-        "citatorios": list(
-            citatorios.find({}, {"_id": 0})
-        ),
-
-        "avisos": list(
-            avisos.find({}, {"_id": 0})
-        ),
-
-        "usuarios": list(
-            usuarios.find({}, {"_id": 0})
-        ),
 
-        "padres": list(
-            padres.find({}, {"_id": 0})
-        ),
+def crear_backup_financiero_interno(modo="completo"):
 
-        "calificaciones": list(
-            calificaciones.find({}, {"_id": 0})
-        ),
+    return _respaldar("financiero", "financiero", modo=modo)
 
-        "admins_secundarios": list(
-            admins_secundarios.find({}, {"_id": 0})
-        ),
 
-        # =========================
-        # FINANCIERO
-        # =========================
+def crear_backup_control_escolar_interno(modo="completo"):
 
-        "pagos": list(
-            pagos.find({}, {"_id": 0})
-        ),
+    return _respaldar("control_escolar", "control_escolar_auto", modo=modo)
 
-        "movimientos_pagos": list(
-            movimientos_pagos.find({}, {"_id": 0})
-        ),
 
-        "mensualidades": list(
-            mensualidades.find({}, {"_id": 0})
-        ),
+def crear_backup_sistema_interno(modo="completo"):
 
-        "config_recargos": list(
-            config_recargos.find({}, {"_id": 0})
-        ),
+    return _respaldar("sistema", "sistema_auto", modo=modo)
 
-        "bitacora_pagos": list(
-            bitacora_pagos.find({}, {"_id": 0})
-        ),
 
-        # =========================
-        # CONFIGURACIÓN
-        # =========================
-
-        "configuracion": list(
-            configuracion.find({}, {"_id": 0})
-        ),
-
-        # =========================
-        # AUDITORÍA
-        # =========================
-
-        "bitacora": list(
-            bitacora.find({}, {"_id": 0})
-        ),
-
-        "auditoria": list(
-            auditoria.find({}, {"_id": 0})
-        )
-
-    }
+def crear_backup_sistema():
 
-    nombre = nombre_backup(
-        "sistema_auto"
+    return descargar_respaldo(
+        _respaldar("sistema", "sistema")
     )
 
-    guardar_backup_mongo(
 
-        "sistema",
-
-        nombre,
-
-        data
+def crear_backup_financiero():
 
+    return descargar_respaldo(
+        _respaldar("financiero", "financiero")
     )
 
-    configuracion_backups.update_one(
-
-        {
-
-            "tipo": "sistema"
-
-        },
-
-        {
-
-            "$set": {
-
-                "ultima_ejecucion": datetime.now()
-
-            }
-
-        },
 
-        upsert=True
+def crear_backup_control_escolar():
 
+    return descargar_respaldo(
+        _respaldar("control_escolar", "control_escolar")
     )
 
-    return data
 
+# =========================
+# HISTORIAL
+# =========================
 def obtener_historial_backups(
     tipo=None,
     limite=100
@@ -434,10 +318,12 @@ def obtener_historial_backups(
     if tipo is not None:
         consulta["tipo"] = tipo
 
+    # Los respaldos 1.0 traen todo en "contenido"
     historial = list(
 
         backups_archivos.find(
-            consulta
+            consulta,
+            {"contenido": 0}
         ).sort(
             "fecha",
             -1
@@ -453,7 +339,7 @@ def eliminar_backup(
     backup_id
 ):
 
-    backups_archivos.delete_one(
+    backup = backups_archivos.find_one(
 
         {
 
@@ -461,554 +347,338 @@ def eliminar_backup(
                 backup_id
             )
 
-        }
-
-    )
-
-def crear_backup_sistema():
-
-    data = {
-
-        # =========================
-        # CONTROL ESCOLAR
-        # =========================
-
-        "alumnos": list(
-            alumnos.find({}, {"_id": 0})
-        ),
-
-        "maestros": list(
-            maestros.find({}, {"_id": 0})
-        ),
-
-        "grupos": list(
-            grupos.find({}, {"_id": 0})
-        ),
-
-        "materias": list(
-            materias.find({}, {"_id": 0})
-        ),
-
-        "horarios": list(
-            horarios.find({}, {"_id": 0})
-        ),
-
-        "reportes": list(
-            reportes.find({}, {"_id": 0})
-        ),
-
-        "citatorios": list(
-            citatorios.find({}, {"_id": 0})
-        ),
-
-        "avisos": list(
-            avisos.find({}, {"_id": 0})
-        ),
-
-        "usuarios": list(
-            usuarios.find({}, {"_id": 0})
-        ),
-
-        "padres": list(
-            padres.find({}, {"_id": 0})
-        ),
-
-        "calificaciones": list(
-            calificaciones.find({}, {"_id": 0})
-        ),
-
-        "admins_secundarios": list(
-            admins_secundarios.find({}, {"_id": 0})
-        ),
-
-        # =========================
-        # FINANCIERO
-        # =========================
-
-        "pagos": list(
-            pagos.find({}, {"_id": 0})
-        ),
-
-        "movimientos_pagos": list(
-            movimientos_pagos.find({}, {"_id": 0})
-        ),
-
-        "mensualidades": list(
-            mensualidades.find({}, {"_id": 0})
-        ),
-
-        "config_recargos": list(
-            config_recargos.find({}, {"_id": 0})
-        ),
-
-        "bitacora_pagos": list(
-            bitacora_pagos.find({}, {"_id": 0})
-        ),
-
-        # =========================
-        # CONFIGURACIÓN
-        # =========================
-
-        "configuracion": list(
-            configuracion.find({}, {"_id": 0})
-        ),
-
-        # =========================
-        # AUDITORÍA
-        # =========================
-
-        "bitacora": list(
-            bitacora.find({}, {"_id": 0})
-        ),
-
-        "auditoria": list(
-            auditoria.find({}, {"_id": 0})
-        )
+        },
 
-    }
+        {"colecciones": 1}
 
-    nombre = nombre_backup(
-        "sistema"
     )
 
-    guardar_backup_mongo(
+    if not backup:
 
-        "sistema",
+        return False, "No existe el respaldo."
 
-        nombre,
+    # Un incremental sin su anterior ya no se puede restaurar
+    if dependientes(backup["_id"]):
 
-        data
+        return False, "Otros respaldos incrementales dependen de este; elimínelos primero."
 
-    )
+    borrar_respaldo(backup)
 
-    configuracion_backups.update_one(
+    return True, "Respaldo eliminado correctamente."
 
-        {
-
-            "tipo": "sistema"
+def obtener_backup_por_id(
+    backup_id
+):
 
-        },
+    return backups_archivos.find_one(
 
         {
 
-            "$set": {
-
-                "ultima_ejecucion": datetime.now()
-
-            }
-
-        },
+            "_id": ObjectId(
+                backup_id
+            )
 
-        upsert=True
+        }
 
     )
 
-    buffer = BytesIO()
 
-    buffer.write(
+# =========================
+# DESCARGA
+# =========================
+# Por omisión se descarga lo guardado, comprimido, sin volver a
+# codificar (ver flujo_descarga). Con formato="json" se arma un
+# solo JSON {"coleccion": [...], ...} para leerlo a mano; las
+# líneas se copian tal cual, sin decodificar.
+def _json_respaldo(backup):
 
-        json.dumps(
+    yield b"{\n"
 
-            data,
-
-            indent=4,
-
-            default=str,
-
-            ensure_ascii=False
-
-        ).encode("utf-8")
-
-    )
+    for i, nombre in enumerate(nombres_colecciones(backup)):
 
-    buffer.seek(0)
+        separador = b",\n" if i else b""
 
-    return send_file(
+        yield separador + json.dumps(nombre).encode("utf-8") + b": ["
 
-        buffer,
+        if "contenido" in backup:
 
-        as_attachment=True,
-
-        download_name=nombre,
-
-        mimetype="application/json"
-
-    )
+            lineas = (
+                codificar(documento).encode("utf-8")
+                for documento in leer_coleccion(backup, nombre)
+            )
 
-def crear_backup_financiero():
+        else:
 
-    data = {
+            lineas = leer_lineas(backup, nombre)
 
-        "pagos": list(
-            pagos.find({}, {"_id": 0})
-        ),
+        for j, linea in enumerate(lineas):
+            yield (b",\n" if j else b"\n") + linea
 
-        "movimientos_pagos": list(
-            movimientos_pagos.find({}, {"_id": 0})
-        ),
+        yield b"\n]"
 
-        "mensualidades": list(
-            mensualidades.find({}, {"_id": 0})
-        ),
+    yield b"\n}\n"
 
-        "config_recargos": list(
-            config_recargos.find({}, {"_id": 0})
-        ),
 
-        "bitacora_pagos": list(
-            bitacora_pagos.find({}, {"_id": 0})
-        )
+def descargar_respaldo(backup, formato=None):
 
-    }
+    if not isinstance(backup, dict):
+        backup = obtener_backup_por_id(backup)
 
-    nombre = nombre_backup(
-        "financiero"
-    )
+    if formato != "json":
 
-    guardar_backup_mongo(
-        "financiero",
-        nombre,
-        data
-    )
+        return Response(
 
-    configuracion_backups.update_one(
+            flujo_descarga(backup),
 
-        {
-            "tipo": "financiero"
-        },
+            mimetype=COMPRESIONES[compresion_descarga(backup)]["mimetype"],
 
-        {
-            "$set": {
-                "ultima_ejecucion": datetime.now()
+            headers={
+                "Content-Disposition":
+                    f"attachment; filename={nombre_descarga(backup)}"
             }
-        },
-
-        upsert=True
-
-    )
-
-    buffer = BytesIO()
-
-    buffer.write(
-
-        json.dumps(
-            data,
-            indent=4,
-            default=str,
-            ensure_ascii=False
-        ).encode("utf-8")
-
-    )
 
-    buffer.seek(0)
-
-    return send_file(
+        )
 
-        buffer,
+    return Response(
 
-        as_attachment=True,
+        _json_respaldo(backup),
 
-        download_name=nombre,
+        mimetype="application/json",
 
-        mimetype="application/json"
+        headers={
+            "Content-Disposition":
+                f"attachment; filename={backup['nombre']}"
+        }
 
     )
 
-def crear_backup_control_escolar():
-
-    data = {
-
-        "alumnos": list(
-            alumnos.find({}, {"_id": 0})
-        ),
 
-        "maestros": list(
-            maestros.find({}, {"_id": 0})
-        ),
-
-        "grupos": list(
-            grupos.find({}, {"_id": 0})
-        ),
-
-        "materias": list(
-            materias.find({}, {"_id": 0})
-        ),
+# def restaurar_backup_financiero(
+#    backup_id,
+#    usuario="Administrador"
+#):
 
-        "horarios": list(
-            horarios.find({}, {"_id": 0})
-        ),
+#    backup = obtener_backup_por_id(
+#        backup_id
+#    )
 
-        "reportes": list(
-            reportes.find({}, {"_id": 0})
-        ),
+#    if backup is None:
 
-        "citatorios": list(
-            citatorios.find({}, {"_id": 0})
-        ),
+#        return False, "No existe el respaldo."
 
-        "avisos": list(
-            avisos.find({}, {"_id": 0})
-        ),
+#    if backup.get("tipo") != "financiero":
 
-        "usuarios": list(
-            usuarios.find({}, {"_id": 0})
-        ),
+#        return False, "El respaldo seleccionado no es #financiero."
 
-        "padres": list(
-            padres.find({}, {"_id": 0})
-        ),
+# =========================
+# RESTAURAR
+# =========================
+# La restauración corre en un hilo aparte (un lease evita dos
+# a la vez) y su avance se consulta en "restauraciones"; ver
+# utils/restauracion.py.
 
-        "calificaciones": list(
-            calificaciones.find({}, {"_id": 0})
-        ),
+LEASE_RESTAURACION = "restauracion"
 
-        "admins_secundarios": list(
-            admins_secundarios.find({}, {"_id": 0})
-        ),
+RESPALDO_PREVIO = {
+    "financiero": crear_backup_financiero_interno,
+    "control_escolar": crear_backup_control_escolar_interno,
+    "sistema": crear_backup_sistema_interno
+}
 
-        "bitacora": list(
-            bitacora.find({}, {"_id": 0})
-        ),
+MENSAJES_RESTAURACION = {
+    "financiero": "Restauración completada.",
+    "control_escolar": "Restauración de Control Escolar completada.",
+    "sistema": "Restauración completa del sistema realizada correctamente."
+}
 
-        "auditoria": list(
-            auditoria.find({}, {"_id": 0})
-        )
 
-    }
+def _validar_restauracion(backup):
 
-    nombre = nombre_backup(
-        "control_escolar"
-    )
+    if backup is None:
 
-    guardar_backup_mongo(
-        "control_escolar",
-        nombre,
-        data
-    )
+        return "No existe el respaldo."
 
-    configuracion_backups.update_one(
+    if backup.get("estado", "Correcto") != "Correcto":
 
-        {
-            "tipo": "control_escolar"
-        },
+        return "El respaldo está incompleto."
 
-        {
-            "$set": {
+    if backup.get("tipo") not in COLECCIONES:
 
-                "ultima_ejecucion": datetime.now()
+        return "Tipo de respaldo desconocido."
 
-            }
+    return None
 
-        },
 
-        upsert=True
+def iniciar_restauracion(
+    backup_id,
+    usuario="Administrador"
+):
 
+    backup = obtener_backup_por_id(
+        backup_id
     )
 
-    buffer = BytesIO()
+    error = _validar_restauracion(backup)
 
-    buffer.write(
+    if error:
 
-        json.dumps(
-            data,
-            indent=4,
-            default=str,
-            ensure_ascii=False
-        ).encode("utf-8")
+        return False, error
 
-    )
+    if not tomar_lease(
+        LEASE_RESTAURACION,
+        Config.RESTAURACION_LEASE_SEGUNDOS
+    ):
 
-    buffer.seek(0)
+        return False, "Ya hay una restauración en curso."
 
-    return send_file(
+    restauracion_id = crear_progreso(backup, usuario)
 
-        buffer,
+    threading.Thread(
+        target=_restaurar_en_segundo_plano,
+        args=(backup_id, usuario, restauracion_id),
+        name="restauracion",
+        daemon=True
+    ).start()
 
-        as_attachment=True,
+    return True, restauracion_id
 
-        download_name=nombre,
 
-        mimetype="application/json"
+def _restaurar_en_segundo_plano(backup_id, usuario, restauracion_id):
 
-    )
+    try:
 
-def obtener_backup_por_id(
-    backup_id
-):
+        restaurar_backup(
+            backup_id,
+            usuario,
+            restauracion_id
+        )
 
-    return backups_archivos.find_one(
+    finally:
 
-        {
+        liberar_lease(LEASE_RESTAURACION)
 
-            "_id": ObjectId(
-                backup_id
-            )
 
-        }
-
-    )
+def completar_restauracion(nombres):
 
-# def restaurar_backup_financiero(
-#    backup_id,
-#    usuario="Administrador"
-#):
+    # Un respaldo viejo puede traer datos en formato anterior:
+    # las migraciones solo tocan lo que siga así
+    if "configuracion" in nombres:
+        invalidar_configuracion()
 
-#    backup = obtener_backup_por_id(
-#        backup_id
-#    )
+    if any(nombre in nombres for _, nombre in _FINANCIERAS):
+        reconstruir_resumen()
 
-#    if backup is None:
+    if "alumnos" in nombres:
+        migrar_evaluaciones()
 
-#        return False, "No existe el respaldo."
+    completar_claves()
 
-#    if backup.get("tipo") != "financiero":
+    completar_busqueda()
 
-#        return False, "El respaldo seleccionado no es #financiero."
 
 def restaurar_backup(
     backup_id,
-    usuario="Administrador"
+    usuario="Administrador",
+    restauracion_id=None
 ):
 
     backup = obtener_backup_por_id(
         backup_id
     )
 
-    if backup is None:
+    error = _validar_restauracion(backup)
 
-        return False, "No existe el respaldo."
+    if error:
 
-    tipo = backup.get(
-        "tipo"
-    )
+        if restauracion_id:
+            terminar_progreso(restauracion_id, "Error", error)
 
-    datos = backup.get(
-        "contenido",
-        {}
-    )
+        return False, error
 
-    try:
-
-        # ===========================
-        # FINANCIERO
-        # ===========================
-
-        if tipo == "financiero":
+    tipo = backup["tipo"]
 
-            crear_backup_financiero_interno()
+    if restauracion_id is None:
+        restauracion_id = crear_progreso(backup, usuario)
 
-            pagos.delete_many({})
-
-            movimientos_pagos.delete_many({})
+    try:
 
-            mensualidades.delete_many({})
+        cadena = cadena_respaldo(backup)
 
-            config_recargos.delete_many({})
+        if any(b.get("estado", "Correcto") != "Correcto" for b in cadena):
+            raise CadenaRota("Un respaldo de la cadena está incompleto.")
 
-            bitacora_pagos.delete_many({})
+        marcar_etapa(restauracion_id, "respaldo_previo")
 
-            if datos.get("pagos"):
+        # Solo lo que trae el respaldo: una colección que no existía
+        # cuando se hizo (medios, por ejemplo) se deja como está
+        incluidas = nombres_colecciones(cadena[0])
 
-                pagos.insert_many(
-                    datos["pagos"]
-                )
+        nombres = [
+            nombre for _, nombre in COLECCIONES[tipo]
+            if nombre in incluidas
+        ]
 
-            if datos.get("movimientos_pagos"):
+        RESPALDO_PREVIO[tipo]()
 
-                movimientos_pagos.insert_many(
-                    datos["movimientos_pagos"]
-                )
+        restaurar_colecciones(
 
-            if datos.get("mensualidades"):
+            cadena,
 
-                mensualidades.insert_many(
-                    datos["mensualidades"]
-                )
+            nombres,
 
-            if datos.get("config_recargos"):
+            restauracion_id,
 
-                config_recargos.insert_many(
-                    datos["config_recargos"]
-                )
+            Config.RESTAURACION_HILOS
 
-            if datos.get("bitacora_pagos"):
+        )
 
-                bitacora_pagos.insert_many(
-                    datos["bitacora_pagos"]
-                )
+        marcar_etapa(restauracion_id, "finalizando")
 
-            backups_archivos.update_one(
+        completar_restauracion(nombres)
 
-                {
+        backups_archivos.update_one(
 
-                    "_id": backup["_id"]
+            {
 
-                },
+                "_id": backup["_id"]
 
-                {
+            },
 
-                    "$set": {
+            {
 
-                        "restaurado": True,
+                "$set": {
 
-                        "fecha_restauracion": datetime.now(),
+                    "restaurado": True,
 
-                        "restaurado_por": usuario
+                    "fecha_restauracion": datetime.now(),
 
-                    }
+                    "restaurado_por": usuario
 
                 }
 
-            )
-
-            registrar_restauracion(
-
-                usuario,
-
-                tipo,
-
-                backup["nombre"],
-
-                "Correcto",
-
-                "Restauración completada"
-
-            )
-
-            return True, "Restauración completada."
-
-        # ===========================
-        # CONTROL ESCOLAR
-        # ===========================
-
-        elif tipo == "control_escolar":
-
-            return _restaurar_control_escolar(
-
-                datos,
+            }
 
-                backup,
+        )
 
-                usuario
+        mensaje = MENSAJES_RESTAURACION[tipo]
 
-            )
+        registrar_restauracion(
 
-        # ===========================
-        # SISTEMA
-        # ===========================
+            usuario,
 
-        elif tipo == "sistema":
+            tipo,
 
-            return _restaurar_sistema(
+            backup["nombre"],
 
-                datos,
+            "Correcto",
 
-                backup,
+            mensaje
 
-                usuario
+        )
 
-            )
+        terminar_progreso(restauracion_id, "Correcto", mensaje)
 
+        return True, mensaje
 
     except Exception as e:
 
@@ -1026,201 +696,88 @@ def restaurar_backup(
 
         )
 
-        return False, str(e)
-
-def _restaurar_control_escolar(
-    datos,
-    backup,
-    usuario
-):
-
-    crear_backup_control_escolar_interno()
-
-    colecciones = [
-
-        (alumnos, "alumnos"),
-
-        (maestros, "maestros"),
-
-        (grupos, "grupos"),
-
-        (materias, "materias"),
-
-        (horarios, "horarios"),
-
-        (reportes, "reportes"),
-
-        (citatorios, "citatorios"),
-
-        (avisos, "avisos"),
-
-        (usuarios, "usuarios"),
+        terminar_progreso(restauracion_id, "Error", str(e))
 
-        (padres, "padres"),
-
-        (calificaciones, "calificaciones"),
-
-        (admins_secundarios, "admins_secundarios"),
-
-        (bitacora, "bitacora"),
-
-        (auditoria, "auditoria")
-
-    ]
-
-    for coleccion, nombre in colecciones:
-
-        coleccion.delete_many({})
-
-        if datos.get(nombre):
-
-            coleccion.insert_many(
-
-                datos[nombre]
-
-            )
-
-    backups_archivos.update_one(
-
-        {
-
-            "_id": backup["_id"]
-
-        },
+        return False, str(e)
 
-        {
 
-            "$set": {
+# =========================
+# RESTAURAR DESDE ARCHIVO
+# =========================
+# Una descarga subida de vuelta (.ndjson.gz/.zst o el .json de
+# Extended JSON). Pasa por las mismas temporales que un respaldo
+# guardado; el .ndjson se lee del archivo conforme se carga, el
+# .json (formato anterior) tiene que leerse completo.
+def _documentos_archivo(archivo, nombre_archivo):
 
-                "restaurado": True,
+    compresion = por_extension(nombre_archivo)
 
-                "fecha_restauracion": datetime.now(),
+    if compresion:
 
-                "restaurado_por": usuario
+        for encabezado, documento in leer_descarga(archivo, compresion):
 
-            }
+            if encabezado.get("modo", "completo") != "completo":
+                raise ValueError("Un respaldo incremental no se puede subir solo")
 
-        }
+            yield encabezado["coleccion"], encabezado.get("documentos", 0), documento
 
-    )
+        return
 
-    registrar_restauracion(
+    for nombre, documentos in json_util.loads(archivo.read()).items():
 
-        usuario,
+        for documento in documentos:
+            yield nombre, len(documentos), documento
 
-        "control_escolar",
 
-        backup["nombre"],
+def restaurar_archivo(archivo, nombre_archivo, usuario="Administrador"):
 
-        "Correcto",
+    if not tomar_lease(
+        LEASE_RESTAURACION,
+        Config.RESTAURACION_LEASE_SEGUNDOS
+    ):
 
-        "Restauración completada"
+        return False, "Ya hay una restauración en curso."
 
+    restauracion_id = crear_progreso(
+        {"_id": None, "nombre": nombre_archivo, "tipo": "archivo"},
+        usuario
     )
 
-    return True, "Restauración de Control Escolar completada."
-
-def _restaurar_sistema(
-    datos,
-    backup,
-    usuario
-):
-
-    crear_backup_sistema_interno()
-
-    colecciones = [
-
-        (alumnos, "alumnos"),
-
-        (maestros, "maestros"),
-
-        (grupos, "grupos"),
-
-        (materias, "materias"),
-
-        (horarios, "horarios"),
-
-        (reportes, "reportes"),
-
-        (citatorios, "citatorios"),
-
-        (avisos, "avisos"),
-
-        (usuarios, "usuarios"),
-
-        (padres, "padres"),
-
-        (calificaciones, "calificaciones"),
-
-        (admins_secundarios, "admins_secundarios"),
-
-        (pagos, "pagos"),
-
-        (movimientos_pagos, "movimientos_pagos"),
-
-        (mensualidades, "mensualidades"),
-
-        (config_recargos, "config_recargos"),
-
-        (bitacora_pagos, "bitacora_pagos"),
-
-        (configuracion, "configuracion"),
-
-        (bitacora, "bitacora"),
-
-        (auditoria, "auditoria")
-
-    ]
-
-    for coleccion, nombre in colecciones:
-
-        coleccion.delete_many({})
-
-        if datos.get(nombre):
-
-            coleccion.insert_many(
-
-                datos[nombre]
-
-            )
-
-    backups_archivos.update_one(
-
-        {
-
-            "_id": backup["_id"]
-
-        },
-
-        {
+    try:
 
-            "$set": {
+        marcar_etapa(restauracion_id, "respaldo_previo")
 
-                "restaurado": True,
+        RESPALDO_PREVIO["sistema"]()
 
-                "fecha_restauracion": datetime.now(),
+        nombres = restaurar_flujo(
+            _documentos_archivo(archivo, nombre_archivo),
+            {nombre for _, nombre in COLECCIONES["sistema"]},
+            restauracion_id
+        )
 
-                "restaurado_por": usuario
+        if not nombres:
+            raise ValueError("El archivo no trae colecciones del sistema")
 
-            }
+        marcar_etapa(restauracion_id, "finalizando")
 
-        }
+        completar_restauracion(nombres)
 
-    )
+        mensaje = f"Restauración desde archivo completada ({len(nombres)} colecciones)."
 
+        registrar_restauracion(usuario, "archivo", nombre_archivo, "Correcto", mensaje)
 
-    registrar_restauracion(
+        terminar_progreso(restauracion_id, "Correcto", mensaje)
 
-        usuario,
+        return True, restauracion_id
 
-        "sistema",
+    except Exception as e:
 
-        backup["nombre"],
+        registrar_restauracion(usuario, "archivo", nombre_archivo, "Error", str(e))
 
-        "Correcto",
+        terminar_progreso(restauracion_id, "Error", str(e))
 
-        "Restauración completa del sistema realizada correctamente."
+        return False, str(e)
 
-    )
+    finally:
 
-    return True, "Restauración completa del sistema realizada correctamente."
\ No newline at end of file
+        liberar_lease(LEASE_RESTAURACION)
@@ -0,0 +1,76 @@
+import re
+
+from datetime import datetime, timedelta
+
+# =========================
+# FILTROS DE BITÁCORAS
+# =========================
+# bitacora, bitacora_pagos y auditoria solo crecen: el rango
+# de fechas se resuelve en Mongo sobre el índice de "fecha"
+# en lugar de traer todo y comparar strftime en Python.
+#
+#   ?fecha_inicio=2026-01-01&fecha_fin=2026-01-31
+#   ?fecha=2026-01-15           (un solo día)
+#   ?usuario=...
+
+TAMANO_LOTE = 500
+
+
+def _dia(texto):
+
+    try:
+        return datetime.strptime(texto or "", "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+
+    inicio = _dia(fecha_inicio)
+    fin = _dia(fecha_fin)
+
+    rango = {}
+
+    if inicio:
+        rango["$gte"] = inicio
+
+    # Hasta el final del día indicado
+    if fin:
+        rango["$lt"] = fin + timedelta(days=1)
+
+    return {"fecha": rango} if rango else {}
+
+
+def filtro_bitacora(args, usuario_parcial=False):
+
+    fecha = args.get("fecha", "")
+
+    filtro = rango_fechas(
+        args.get("fecha_inicio", "") or fecha,
+        args.get("fecha_fin", "") or fecha
+    )
+
+    usuario = args.get("usuario", "")
+
+    if usuario and usuario_parcial:
+
+        filtro["usuario"] = {
+            "$regex": re.escape(usuario),
+            "$options": "i"
+        }
+
+    elif usuario:
+
+        filtro["usuario"] = usuario
+
+    return filtro
+
+
+def registros_bitacora(coleccion, filtro):
+
+    # Cursor, no lista: el PDF se escribe conforme llegan
+    return (
+        coleccion.find(filtro)
+        .sort([("fecha", -1), ("_id", -1)])
+        .batch_size(TAMANO_LOTE)
+    )
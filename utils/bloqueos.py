@@ -0,0 +1,63 @@
+import os
+import socket
+
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database.mongo import db
+
+# =========================
+# LEASES EN MONGO
+# =========================
+# Un documento por lease en "bloqueos": quien lo tiene vigente
+# es el único que trabaja. Si el dueño muere, el lease expira
+# y otro worker puede tomarlo.
+
+bloqueos = db["bloqueos"]
+
+
+def identidad():
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def tomar_lease(nombre, segundos):
+
+    ahora = datetime.now()
+
+    try:
+
+        lease = bloqueos.find_one_and_update(
+            {
+                "_id": nombre,
+                "$or": [
+                    {"expira": {"$lt": ahora}},
+                    {"dueno": identidad()}
+                ]
+            },
+            {
+                "$set": {
+                    "dueno": identidad(),
+                    "expira": ahora + timedelta(seconds=segundos)
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    except DuplicateKeyError:
+
+        # Otro worker tiene el lease vigente
+        return False
+
+    return lease is not None
+
+
+def liberar_lease(nombre):
+
+    bloqueos.delete_one({
+        "_id": nombre,
+        "dueno": identidad()
+    })
@@ -0,0 +1,224 @@
+import re
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database.mongo import (
+    db,
+    movimientos_pagos
+)
+
+from utils.normalizar import clave_nombre
+
+# =========================
+# BÚSQUEDA POR PREFIJOS
+# =========================
+# Cada documento buscable guarda en "busqueda" los prefijos
+# normalizados de sus palabras ("jose" -> j, jo, jos, jose).
+# Buscar "jos per" es un $all sobre ese arreglo indexado, sin
+# $regex: encuentra "José Pérez" y no recorre la colección.
+#
+#   alumnos: nombre
+#   pagos:   alumno, grupo
+#
+# Los folios no se indexan aquí: "REC-000123" (o solo 123)
+# va directo a movimientos_pagos por folio o consecutivo. Un
+# número solo también puede ser parte de un grupo o nombre
+# ("3" -> "3A"), así que se buscan ambos y los pagos del
+# folio van primero.
+#
+# Para los documentos anteriores:
+#   python -m database.migraciones busqueda
+
+CAMPOS_BUSQUEDA = {
+    "alumnos": ("nombre",),
+    "pagos": ("alumno", "grupo"),
+}
+
+# Palabras más largas se cortan: con 15 letras ya no hay ambigüedad
+MAX_PREFIJO = 15
+
+_FOLIO = re.compile(r"^\s*([A-Za-z]+)-(\d+)\s*$")
+
+_CONSECUTIVO = re.compile(r"^\s*(\d+)\s*$")
+
+
+def _palabras(texto):
+
+    return [
+        palabra[:MAX_PREFIJO]
+        for palabra in clave_nombre(texto).split(" ")
+        if palabra
+    ]
+
+
+def prefijos(*textos):
+
+    resultado = set()
+
+    for texto in textos:
+
+        for palabra in _palabras(texto):
+
+            resultado.update(
+                palabra[:n] for n in range(1, len(palabra) + 1)
+            )
+
+    return sorted(resultado)
+
+
+def campos_busqueda(coleccion, documento):
+
+    return {
+        "busqueda": prefijos(
+            *(documento.get(campo) for campo in CAMPOS_BUSQUEDA[coleccion])
+        )
+    }
+
+
+def filtro_busqueda(texto):
+
+    palabras = _palabras(texto)
+
+    if not palabras:
+        return {}
+
+    return {"busqueda": {"$all": sorted(set(palabras))}}
+
+
+def rango_busqueda(texto, campo_clave):
+
+    # 0: nombre idéntico, 1: empieza igual, 2: coincide por palabras
+    clave = clave_nombre(texto)
+
+    return {
+        "$switch": {
+            "branches": [
+                {
+                    "case": {"$eq": [f"${campo_clave}", clave]},
+                    "then": 0
+                },
+                {
+                    "case": {
+                        "$eq": [
+                            {"$indexOfCP": [
+                                {"$ifNull": [f"${campo_clave}", ""]},
+                                clave
+                            ]},
+                            0
+                        ]
+                    },
+                    "then": 1
+                }
+            ],
+            "default": 2
+        }
+    }
+
+
+# =========================
+# FOLIOS
+# =========================
+def pagos_por_folio(texto):
+
+    # None si el texto no parece folio; si no, los pago_id
+    # de sus movimientos (consulta por índice exacto)
+    folio = _FOLIO.match(texto or "")
+
+    if folio:
+
+        # Tal como se escribió y con el formato de formatear_folio
+        filtro = {
+            "folio": {
+                "$in": [
+                    texto.strip().upper(),
+                    f"{folio.group(1).upper()}-{int(folio.group(2)):06d}"
+                ]
+            }
+        }
+
+    else:
+
+        consecutivo = _CONSECUTIVO.match(texto or "")
+
+        if not consecutivo:
+            return None
+
+        filtro = {"consecutivo": int(consecutivo.group(1))}
+
+    return list({
+        movimiento["pago_id"]
+        for movimiento in movimientos_pagos.find(filtro, {"pago_id": 1})
+        if movimiento.get("pago_id")
+    })
+
+
+def filtro_pagos(texto):
+
+    # (filtro, rango) para la lista de pagos; rango es None
+    # cuando el resultado no necesita ordenarse por relevancia
+    pago_ids = [
+        ObjectId(pago_id)
+        for pago_id in pagos_por_folio(texto) or []
+        if ObjectId.is_valid(pago_id)
+    ]
+
+    filtro = filtro_busqueda(texto)
+
+    if pago_ids and (_FOLIO.match(texto) or not filtro):
+        return {"_id": {"$in": pago_ids}}, None
+
+    rango = rango_busqueda(texto, "alumno_clave")
+
+    if not pago_ids:
+        return filtro, rango
+
+    return (
+        {"$or": [{"_id": {"$in": pago_ids}}, filtro]},
+        {"$cond": [{"$in": ["$_id", pago_ids]}, -1, rango]}
+    )
+
+
+# =========================
+# COMPLETAR BÚSQUEDA
+# =========================
+def completar_busqueda(tamano_lote=500):
+
+    # Solo toca documentos sin "busqueda"; puede repetirse
+    resultado = {}
+
+    for nombre, campos in CAMPOS_BUSQUEDA.items():
+
+        coleccion = db[nombre]
+
+        operaciones = []
+
+        resultado[nombre] = 0
+
+        for documento in coleccion.find(
+            {"busqueda": {"$exists": False}},
+            dict.fromkeys(campos, 1)
+        ):
+
+            operaciones.append(
+                UpdateOne(
+                    {"_id": documento["_id"]},
+                    {"$set": campos_busqueda(nombre, documento)}
+                )
+            )
+
+            if len(operaciones) >= tamano_lote:
+
+                coleccion.bulk_write(operaciones, ordered=False)
+
+                resultado[nombre] += len(operaciones)
+
+                operaciones = []
+
+        if operaciones:
+
+            coleccion.bulk_write(operaciones, ordered=False)
+
+            resultado[nombre] += len(operaciones)
+
+    return resultado
@@ -0,0 +1,80 @@
+import base64
+import threading
+import time
+
+from config import Config
+
+from database.mongo import configuracion
+
+# =========================
+# CACHE DE CONFIGURACIÓN
+# =========================
+# El documento de configuración se lee en casi cada petición
+# y en cada PDF. Se guarda en memoria por CONFIG_CACHE_TTL
+# segundos; los cambios hechos en este proceso lo invalidan
+# de inmediato y los de otros workers caducan con el TTL.
+
+_candado = threading.Lock()
+
+_cache = {
+    "config": None,
+    "expira": 0.0
+}
+
+_escudo = {
+    "actual": (None, None)
+}
+
+
+def obtener_configuracion():
+
+    ahora = time.monotonic()
+
+    if ahora < _cache["expira"]:
+
+        config = _cache["config"]
+
+        return dict(config) if config else None
+
+    with _candado:
+
+        if ahora >= _cache["expira"]:
+
+            _cache["config"] = configuracion.find_one()
+
+            _cache["expira"] = time.monotonic() + Config.CONFIG_CACHE_TTL
+
+        config = _cache["config"]
+
+    return dict(config) if config else None
+
+
+def invalidar_configuracion():
+
+    with _candado:
+
+        _cache["config"] = None
+
+        _cache["expira"] = 0.0
+
+
+# =========================
+# ESCUDO DECODIFICADO
+# =========================
+def decodificar_escudo(escudo):
+
+    if not escudo:
+        return None
+
+    clave = hash(escudo)
+
+    clave_actual, imagen = _escudo["actual"]
+
+    if clave_actual == clave:
+        return imagen
+
+    imagen = base64.b64decode(escudo)
+
+    _escudo["actual"] = (clave, imagen)
+
+    return imagen
@@ -0,0 +1,113 @@
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# =========================
+# COMPRESIÓN DE RESPALDOS
+# =========================
+# gzip siempre está; zstd comprime parecido y bastante más
+# rápido, pero necesita "pip install zstandard". Si se pide
+# zstd sin el paquete, los respaldos nuevos van en gzip.
+#
+# Ambos formatos admiten concatenar archivos: la descarga de un
+# respaldo es la concatenación de sus archivos tal como están
+# guardados, sin descomprimir ni volver a comprimir.
+
+COMPRESIONES = {
+    "gzip": {"extension": "gz", "mimetype": "application/gzip"},
+    "zstd": {"extension": "zst", "mimetype": "application/zstd"},
+}
+
+NIVELES = {
+    "gzip": 6,
+    "zstd": 3,
+}
+
+# wbits=31: zlib escribe cabecera y cola gzip
+_GZIP = 31
+
+
+def disponibles():
+
+    return [
+        compresion for compresion in COMPRESIONES
+        if compresion != "zstd" or zstandard is not None
+    ]
+
+
+def elegir(compresion):
+
+    return compresion if compresion in disponibles() else "gzip"
+
+
+def _revisar(compresion):
+
+    if compresion not in COMPRESIONES:
+        raise ValueError(f"Compresión desconocida: {compresion}")
+
+    if compresion == "zstd" and zstandard is None:
+        raise ValueError("El respaldo usa zstd: instale el paquete zstandard")
+
+
+# =========================
+# EN STREAMING
+# =========================
+# compress()/flush() y decompress()/flush(), como zlib
+def compresor(compresion):
+
+    _revisar(compresion)
+
+    if compresion == "zstd":
+        return zstandard.ZstdCompressor(level=NIVELES["zstd"]).compressobj()
+
+    return zlib.compressobj(NIVELES["gzip"], zlib.DEFLATED, _GZIP)
+
+
+def descompresor(compresion):
+
+    _revisar(compresion)
+
+    if compresion == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    return zlib.decompressobj(_GZIP)
+
+
+def comprimir(datos, compresion):
+
+    objeto = compresor(compresion)
+
+    return objeto.compress(datos) + objeto.flush()
+
+
+def lector(archivo, compresion):
+
+    # Archivo descomprimido para leer una descarga completa
+    # (varios miembros gzip o varios frames zstd seguidos)
+    _revisar(compresion)
+
+    if compresion == "zstd":
+
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(
+                archivo,
+                read_across_frames=True
+            )
+        )
+
+    return gzip.GzipFile(fileobj=archivo)
+
+
+def por_extension(nombre_archivo):
+
+    for compresion, datos in COMPRESIONES.items():
+
+        if (nombre_archivo or "").endswith("." + datos["extension"]):
+            return compresion
+
+    return None
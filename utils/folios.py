@@ -0,0 +1,119 @@
+import sys
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database.mongo import (
+    db,
+    movimientos_pagos
+)
+
+# =========================
+# FOLIOS DE RECIBOS
+# =========================
+# Un contador por secuencia en la colección "contadores".
+# find_one_and_update con $inc es atómico: dos cajeros (o dos
+# workers) nunca reciben el mismo consecutivo. Abonos y
+# recargos comparten la secuencia "recibos".
+
+contadores = db["contadores"]
+
+SECUENCIA_RECIBOS = "recibos"
+
+
+def formatear_folio(prefijo, consecutivo):
+
+    return f"{prefijo}-{consecutivo:06d}"
+
+
+def _ultimo_consecutivo():
+
+    ultimo = movimientos_pagos.find_one(
+        {"consecutivo": {"$type": "number"}},
+        {"consecutivo": 1},
+        sort=[("consecutivo", -1)]
+    )
+
+    return int(ultimo["consecutivo"]) if ultimo else 0
+
+
+def _sembrar(secuencia):
+
+    # Arranca desde el mayor consecutivo ya emitido; $max
+    # hace que sembrar dos veces no retroceda el contador.
+    try:
+
+        contadores.update_one(
+            {"_id": secuencia},
+            {"$max": {"valor": _ultimo_consecutivo()}},
+            upsert=True
+        )
+
+    except DuplicateKeyError:
+
+        pass
+
+
+def reservar_folios(cantidad, secuencia=SECUENCIA_RECIBOS):
+
+    if cantidad < 1:
+        return range(0)
+
+    for _ in range(2):
+
+        contador = contadores.find_one_and_update(
+            {"_id": secuencia},
+            {"$inc": {"valor": cantidad}},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if contador:
+
+            fin = contador["valor"]
+
+            return range(fin - cantidad + 1, fin + 1)
+
+        _sembrar(secuencia)
+
+    raise RuntimeError(f"No se pudo reservar folios de {secuencia}")
+
+
+def siguiente_folio(prefijo="REC", secuencia=SECUENCIA_RECIBOS):
+
+    consecutivo = reservar_folios(1, secuencia)[0]
+
+    return consecutivo, formatear_folio(prefijo, consecutivo)
+
+
+# =========================
+# VERIFICACIÓN
+# =========================
+def folios_duplicados():
+
+    return list(
+        movimientos_pagos.aggregate([
+            {"$match": {"consecutivo": {"$type": "number"}}},
+            {
+                "$group": {
+                    "_id": "$consecutivo",
+                    "folios": {"$push": "$folio"},
+                    "total": {"$sum": 1}
+                }
+            },
+            {"$match": {"total": {"$gt": 1}}},
+            {"$sort": {"_id": 1}}
+        ])
+    )
+
+
+if __name__ == "__main__":
+
+    duplicados = folios_duplicados()
+
+    for duplicado in duplicados:
+        print(f"❌ Consecutivo {duplicado['_id']}: {', '.join(duplicado['folios'])}")
+
+    if not duplicados:
+        print("✅ Sin consecutivos repetidos")
+
+    sys.exit(1 if duplicados else 0)
@@ -0,0 +1,367 @@
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+
+from database.mongo import (
+    pagos,
+    movimientos_pagos
+)
+
+from utils.resumen_financiero import registrar_cambio_pago
+
+# =========================
+# LIBRO POR CUENTA
+# =========================
+# total_pagado, saldo_restante y meses_pagados de cada pago se
+# mantienen al registrar, editar o cancelar un movimiento, sin
+# releer el historial de la cuenta. Cada escritura lleva la
+# "version" leída: si otro worker la cambió en medio, se relee
+# y se reintenta.
+#
+# Los recargos son cargos, no abonos: no cuentan como pagado.
+#
+# recalcular_pago() rehace una cuenta desde sus movimientos;
+# para revisar (y corregir) todas:
+#
+#   python -m utils.libro_pagos verificar [reparar] [hilos]
+
+INTENTOS = 5
+
+TAMANO_LOTE = 500
+
+
+class LibroOcupado(Exception):
+    pass
+
+
+def _cuenta_como_abono(movimiento):
+
+    return (
+        movimiento.get("estatus") == "activo"
+        and movimiento.get("metodo") != "recargo"
+    )
+
+
+def _estatus(total_pagado, saldo_restante):
+
+    if saldo_restante == 0:
+        return "pagado"
+
+    if total_pagado > 0:
+        return "parcial"
+
+    return "pendiente"
+
+
+def _filtro_version(pago):
+
+    if "version" in pago:
+        return {"_id": pago["_id"], "version": pago["version"]}
+
+    return {"_id": pago["_id"], "version": {"$exists": False}}
+
+
+def _valores(total_debe, total_pagado, meses_cubiertos):
+
+    saldo_restante = max(total_debe - total_pagado, 0)
+
+    return {
+        "total_pagado": total_pagado,
+        "saldo_restante": saldo_restante,
+        "meses_pagados": len(meses_cubiertos),
+        "meses_cubiertos": meses_cubiertos,
+        "estatus": _estatus(total_pagado, saldo_restante)
+    }
+
+
+def _aplicar(pago_id, cambio):
+
+    # cambio(pago) -> (total_debe, delta_pagado, meses_cubiertos)
+    for _ in range(INTENTOS):
+
+        pago = pagos.find_one({"_id": ObjectId(pago_id)})
+
+        if not pago:
+            return None
+
+        # Cuentas anteriores al libro: se rehacen una vez
+        if "meses_cubiertos" not in pago:
+            return recalcular_pago(pago_id)
+
+        total_debe, delta_pagado, meses_cubiertos = cambio(pago)
+
+        nuevos = _valores(
+            total_debe,
+            pago.get("total_pagado", 0) + delta_pagado,
+            meses_cubiertos
+        )
+
+        actualizado = pagos.update_one(
+            _filtro_version(pago),
+            {
+                "$inc": {
+                    "total_pagado": delta_pagado,
+                    "saldo_restante": (
+                        nuevos["saldo_restante"]
+                        - pago.get("saldo_restante", 0)
+                    ),
+                    "version": 1
+                },
+                "$set": {
+                    "total_debe": total_debe,
+                    "meses_pagados": nuevos["meses_pagados"],
+                    "meses_cubiertos": meses_cubiertos,
+                    "estatus": nuevos["estatus"]
+                }
+            }
+        )
+
+        if actualizado.modified_count:
+
+            registrar_cambio_pago(
+                pago,
+                dict(pago, total_debe=total_debe, **nuevos)
+            )
+
+            return nuevos
+
+    # Demasiada contención: la verdad está en los movimientos
+    return recalcular_pago(pago_id)
+
+
+def _mover_mes(meses_cubiertos, mes, cantidad):
+
+    meses = dict(meses_cubiertos or {})
+
+    if mes:
+
+        meses[mes] = meses.get(mes, 0) + cantidad
+
+        if meses[mes] <= 0:
+            meses.pop(mes)
+
+    return meses
+
+
+# =========================
+# CAMBIOS INCREMENTALES
+# =========================
+def aplicar_movimiento(pago_id, antes=None, despues=None):
+
+    # antes/despues: el movimiento antes y después del cambio
+    # (None al crearlo o al no existir ya)
+    def cambio(pago):
+
+        delta = 0
+
+        meses = pago.get("meses_cubiertos")
+
+        if antes and _cuenta_como_abono(antes):
+            delta -= antes.get("monto", 0)
+            meses = _mover_mes(meses, antes.get("mes_cubierto"), -1)
+
+        if despues and _cuenta_como_abono(despues):
+            delta += despues.get("monto", 0)
+            meses = _mover_mes(meses, despues.get("mes_cubierto"), 1)
+
+        return pago.get("total_debe", 0), delta, meses
+
+    return _aplicar(pago_id, cambio)
+
+
+def cambiar_total_debe(pago_id, total_debe):
+
+    def cambio(pago):
+        return total_debe, 0, pago.get("meses_cubiertos")
+
+    return _aplicar(pago_id, cambio)
+
+
+# =========================
+# RECÁLCULO COMPLETO
+# =========================
+def _sumar_movimientos(pago_ids):
+
+    # {pago_id: (total_pagado, {mes: movimientos})}
+    resultado = {pago_id: (0, {}) for pago_id in pago_ids}
+
+    for fila in movimientos_pagos.aggregate([
+        {
+            "$match": {
+                "pago_id": {"$in": list(pago_ids)},
+                "estatus": "activo",
+                "metodo": {"$ne": "recargo"}
+            }
+        },
+        {
+            "$group": {
+                "_id": {"pago_id": "$pago_id", "mes": "$mes_cubierto"},
+                "monto": {"$sum": "$monto"},
+                "movimientos": {"$sum": 1}
+            }
+        }
+    ]):
+
+        pago_id = fila["_id"]["pago_id"]
+        mes = fila["_id"].get("mes")
+
+        total, meses = resultado[pago_id]
+
+        if mes:
+            meses[mes] = fila["movimientos"]
+
+        resultado[pago_id] = (total + fila["monto"], meses)
+
+    return resultado
+
+
+def recalcular_pago(pago_id):
+
+    # También con la "version" leída: un movimiento aplicado
+    # mientras se sumaba haría que se pise su cambio
+    for _ in range(INTENTOS):
+
+        pago = pagos.find_one({"_id": ObjectId(pago_id)})
+
+        if not pago:
+            return None
+
+        total_pagado, meses_cubiertos = _sumar_movimientos(
+            [str(pago["_id"])]
+        )[str(pago["_id"])]
+
+        nuevos = _valores(
+            pago.get("total_debe", 0),
+            total_pagado,
+            meses_cubiertos
+        )
+
+        actualizado = pagos.update_one(
+            _filtro_version(pago),
+            {"$set": nuevos, "$inc": {"version": 1}}
+        )
+
+        if actualizado.modified_count:
+
+            registrar_cambio_pago(pago, dict(pago, **nuevos))
+
+            return nuevos
+
+    raise LibroOcupado(f"El pago {pago_id} cambió en cada intento de recálculo.")
+
+
+# =========================
+# VERIFICACIÓN
+# =========================
+def _diferencias(pago, calculado):
+
+    diferencias = {}
+
+    for campo in ("total_pagado", "saldo_restante", "meses_pagados"):
+
+        guardado = pago.get(campo, 0) or 0
+
+        if round(guardado - calculado[campo], 2) != 0:
+            diferencias[campo] = (guardado, calculado[campo])
+
+    return diferencias
+
+
+def _verificar_lote(lote, reparar):
+
+    sumas = _sumar_movimientos([str(pago["_id"]) for pago in lote])
+
+    desviaciones = {}
+
+    for pago in lote:
+
+        total_pagado, meses_cubiertos = sumas[str(pago["_id"])]
+
+        calculado = _valores(
+            pago.get("total_debe", 0),
+            total_pagado,
+            meses_cubiertos
+        )
+
+        diferencias = _diferencias(pago, calculado)
+
+        if diferencias:
+            desviaciones[str(pago["_id"])] = diferencias
+
+        if reparar and (diferencias or "meses_cubiertos" not in pago):
+            recalcular_pago(pago["_id"])
+
+    return desviaciones
+
+
+def verificar_libros(reparar=False, hilos=4):
+
+    campos = {
+        "total_debe": 1,
+        "total_pagado": 1,
+        "saldo_restante": 1,
+        "meses_pagados": 1,
+        "meses_cubiertos": 1
+    }
+
+    def lotes():
+
+        lote = []
+
+        for pago in pagos.find({}, campos).batch_size(TAMANO_LOTE):
+
+            lote.append(pago)
+
+            if len(lote) >= TAMANO_LOTE:
+                yield lote
+                lote = []
+
+        if lote:
+            yield lote
+
+    desviaciones = {}
+
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+
+        for resultado in ejecutor.map(
+            lambda lote: _verificar_lote(lote, reparar),
+            lotes()
+        ):
+            desviaciones.update(resultado)
+
+    return desviaciones
+
+
+if __name__ == "__main__":
+
+    argumentos = sys.argv[1:]
+
+    if not argumentos or argumentos[0] != "verificar":
+
+        print("Uso: python -m utils.libro_pagos verificar [reparar] [hilos]")
+
+        sys.exit(2)
+
+    reparar = "reparar" in argumentos
+
+    hilos = next((int(a) for a in argumentos if a.isdigit()), 4)
+
+    desviaciones = verificar_libros(reparar, hilos)
+
+    for pago_id, diferencias in desviaciones.items():
+
+        detalle = ", ".join(
+            f"{campo}: {antes} → {despues}"
+            for campo, (antes, despues) in diferencias.items()
+        )
+
+        print(f"⚠️ {pago_id}: {detalle}")
+
+    if not desviaciones:
+        print("✅ Libros de pagos sin desviaciones")
+    elif reparar:
+        print(f"🔧 {len(desviaciones)} cuentas recalculadas")
+
+    sys.exit(1 if desviaciones and not reparar else 0)
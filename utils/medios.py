@@ -0,0 +1,286 @@
+from io import BytesIO
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+from database.mongo import db, obtener_db
+
+# =========================
+# ALMACÉN DE MEDIOS
+# =========================
+# Fotos de alumnos y escudo en GridFS (bucket "medios").
+# Los documentos solo guardan la referencia:
+#
+#   alumnos.foto_id / alumnos.foto_miniatura_id
+#   configuracion.escudo_id
+#
+# Un archivo nunca se modifica: subir otra foto crea otro
+# id, por eso /media/<id> puede cachearse indefinidamente.
+# Los respaldos escolares y del sistema incluyen el bucket, y
+# restaurarlo solo agrega archivos (utils/restauracion.py):
+# borrar la foto reemplazada no deja huérfano a ningún respaldo.
+#
+# El tipo lo decide el servidor por los primeros bytes, nunca
+# el mimetype que manda el navegador: solo PNG, JPEG, GIF y
+# WebP se sirven en línea (ver routes/medios_routes.py).
+
+BUCKET = "medios"
+
+TAMANO_MINIATURA = (160, 160)
+
+TIPO_BINARIO = "application/octet-stream"
+
+# (firma, desplazamiento, tipo)
+FIRMAS_IMAGEN = [
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png"),
+    (b"\xff\xd8\xff", 0, "image/jpeg"),
+    (b"GIF87a", 0, "image/gif"),
+    (b"GIF89a", 0, "image/gif"),
+    (b"WEBP", 8, "image/webp"),
+]
+
+TIPOS_IMAGEN = {tipo for _, _, tipo in FIRMAS_IMAGEN}
+
+# Lo que hay que leer para reconocer cualquier firma
+_CABECERA = 16
+
+medios_archivos = db[f"{BUCKET}.files"]
+
+medios_bloques = db[f"{BUCKET}.chunks"]
+
+_cache_bytes = {
+    "actual": (None, None)
+}
+
+
+def _bucket():
+
+    return GridFSBucket(obtener_db(), bucket_name=BUCKET)
+
+
+def _a_object_id(medio_id):
+
+    if isinstance(medio_id, ObjectId):
+        return medio_id
+
+    try:
+        return ObjectId(medio_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+# =========================
+# TIPO
+# =========================
+def tipo_imagen(cabecera):
+
+    # None si los bytes no son de una imagen conocida
+    for firma, inicio, tipo in FIRMAS_IMAGEN:
+
+        if cabecera[inicio:inicio + len(firma)] != firma:
+            continue
+
+        if tipo == "image/webp" and not cabecera.startswith(b"RIFF"):
+            continue
+
+        return tipo
+
+    return None
+
+
+def _tipo_flujo(flujo):
+
+    cabecera = flujo.read(_CABECERA)
+
+    flujo.seek(0)
+
+    return tipo_imagen(cabecera)
+
+
+# =========================
+# MINIATURAS
+# =========================
+def _miniatura(flujo):
+
+    try:
+
+        from PIL import Image
+
+        with Image.open(flujo) as imagen:
+
+            imagen.thumbnail(TAMANO_MINIATURA)
+
+            if imagen.mode not in ("RGB", "L"):
+                imagen = imagen.convert("RGB")
+
+            salida = BytesIO()
+
+            imagen.save(salida, format="JPEG", quality=80)
+
+        salida.seek(0)
+
+        return salida
+
+    except Exception:
+
+        # Sin Pillow o archivo que no es imagen: solo original
+        return None
+
+
+# =========================
+# GUARDAR
+# =========================
+def guardar_medio(flujo, nombre, miniatura=True):
+
+    # flujo debe admitir seek(): se lee la cabecera antes de subirlo
+    tipo = _tipo_flujo(flujo)
+
+    bucket = _bucket()
+
+    medio_id = bucket.upload_from_stream(
+        nombre or "archivo",
+        flujo,
+        metadata={"tipo": tipo or TIPO_BINARIO}
+    )
+
+    miniatura_id = None
+
+    if miniatura and tipo:
+
+        flujo.seek(0)
+
+        reducida = _miniatura(flujo)
+
+        if reducida:
+
+            miniatura_id = bucket.upload_from_stream(
+                f"miniatura_{nombre or 'archivo'}",
+                reducida,
+                metadata={
+                    "tipo": "image/jpeg",
+                    "original": medio_id
+                }
+            )
+
+    return medio_id, miniatura_id
+
+
+def guardar_subida(archivo, miniatura=True):
+
+    # Fotos y escudo: lo que no sea imagen se descarta
+    if not archivo or not archivo.filename:
+        return None, None
+
+    if not _tipo_flujo(archivo.stream):
+        return None, None
+
+    return guardar_medio(
+        archivo.stream,
+        archivo.filename,
+        miniatura
+    )
+
+
+def guardar_bytes(contenido, nombre, miniatura=True):
+
+    return guardar_medio(
+        BytesIO(contenido),
+        nombre,
+        miniatura
+    )
+
+
+def eliminar_medio(medio_id):
+
+    medio_id = _a_object_id(medio_id)
+
+    if not medio_id:
+        return
+
+    bucket = _bucket()
+
+    for variante in medios_archivos.find(
+        {"metadata.original": medio_id},
+        {"_id": 1}
+    ):
+        bucket.delete(variante["_id"])
+
+    try:
+        bucket.delete(medio_id)
+    except NoFile:
+        pass
+
+
+# =========================
+# LEER
+# =========================
+def abrir_medio(medio_id):
+
+    medio_id = _a_object_id(medio_id)
+
+    if not medio_id:
+        return None
+
+    try:
+        return _bucket().open_download_stream(medio_id)
+    except NoFile:
+        return None
+
+
+def leer_medio(medio_id):
+
+    # Último medio leído en memoria (el escudo de los PDFs)
+    clave = str(medio_id)
+
+    clave_actual, contenido = _cache_bytes["actual"]
+
+    if clave_actual == clave:
+        return contenido
+
+    archivo = abrir_medio(medio_id)
+
+    if not archivo:
+        return None
+
+    contenido = archivo.read()
+
+    _cache_bytes["actual"] = (clave, contenido)
+
+    return contenido
+
+
+def url_medio(medio_id):
+
+    if not medio_id:
+        return ""
+
+    return f"/media/{medio_id}"
+
+
+def foto_alumno(alumno, miniatura=True):
+
+    if not alumno:
+        return ""
+
+    medio_id = None
+
+    if miniatura:
+        medio_id = alumno.get("foto_miniatura_id")
+
+    medio_id = medio_id or alumno.get("foto_id")
+
+    if medio_id:
+        return url_medio(medio_id)
+
+    # Registros aún sin migrar (database.migraciones medios)
+    foto = alumno.get("foto") or ""
+
+    if not foto or foto.startswith(("data:", "/")):
+        return foto
+
+    if foto.startswith("static/"):
+        return f"/{foto}"
+
+    return f"data:image/png;base64,{foto}"
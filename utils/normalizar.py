@@ -0,0 +1,132 @@
+import re
+import unicodedata
+
+from pymongo import UpdateOne
+
+from database.mongo import (
+    db,
+    alumnos,
+    maestros
+)
+
+# =========================
+# CLAVES DE BÚSQUEDA
+# =========================
+# Un $regex "^nombre$" con opción "i" no puede usar un índice
+# normal y, sin escapar, un nombre con "(" o "+" rompe la
+# consulta. Cada documento guarda además una clave normalizada
+# (minúsculas, sin acentos, espacios colapsados) y las búsquedas
+# por nombre son una igualdad exacta sobre esa clave indexada.
+#
+#   alumnos.nombre  -> alumnos.nombre_clave
+#   maestros.nombre -> maestros.nombre_clave
+#   horarios.maestro -> horarios.maestro_clave
+#   pagos.alumno     -> pagos.alumno_clave
+#
+# Para los documentos anteriores (o restaurados de un
+# respaldo viejo): python -m database.migraciones claves
+
+CLAVES = {
+    "alumnos": ("nombre", "nombre_clave"),
+    "maestros": ("nombre", "nombre_clave"),
+    "horarios": ("maestro", "maestro_clave"),
+    "pagos": ("alumno", "alumno_clave"),
+}
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def clave_nombre(texto):
+
+    if not isinstance(texto, str):
+        return ""
+
+    descompuesto = unicodedata.normalize("NFKD", texto)
+
+    sin_acentos = "".join(
+        c for c in descompuesto
+        if not unicodedata.combining(c)
+    )
+
+    return _ESPACIOS.sub(" ", sin_acentos.casefold()).strip()
+
+
+# =========================
+# BÚSQUEDAS
+# =========================
+def buscar_alumno(nombre, campos=None):
+
+    return alumnos.find_one(
+        {"nombre_clave": clave_nombre(nombre)},
+        campos
+    )
+
+
+def buscar_maestro(nombre, campos=None):
+
+    return maestros.find_one(
+        {"nombre_clave": clave_nombre(nombre)},
+        campos
+    )
+
+
+def filtro_horarios_maestro(maestro):
+
+    # Horarios asignados por nombre o por usuario del maestro,
+    # más los de sus grupos
+    claves = list({
+        clave_nombre(maestro.get("nombre")),
+        clave_nombre(maestro.get("usuario"))
+    } - {""})
+
+    return {
+        "$or": [
+            {"maestro_clave": {"$in": claves}},
+            {"grupo": {"$in": maestro.get("grupos", [])}}
+        ]
+    }
+
+
+# =========================
+# COMPLETAR CLAVES
+# =========================
+def completar_claves(tamano_lote=500):
+
+    # Solo toca documentos sin clave; puede repetirse
+    resultado = {}
+
+    for nombre, (campo, clave) in CLAVES.items():
+
+        coleccion = db[nombre]
+
+        operaciones = []
+
+        resultado[nombre] = 0
+
+        for documento in coleccion.find(
+            {clave: {"$exists": False}},
+            {campo: 1}
+        ):
+
+            operaciones.append(
+                UpdateOne(
+                    {"_id": documento["_id"]},
+                    {"$set": {clave: clave_nombre(documento.get(campo))}}
+                )
+            )
+
+            if len(operaciones) >= tamano_lote:
+
+                coleccion.bulk_write(operaciones, ordered=False)
+
+                resultado[nombre] += len(operaciones)
+
+                operaciones = []
+
+        if operaciones:
+
+            coleccion.bulk_write(operaciones, ordered=False)
+
+            resultado[nombre] += len(operaciones)
+
+    return resultado
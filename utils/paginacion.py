@@ -0,0 +1,303 @@
+import base64
+import csv
+import io
+
+from bson import json_util
+from flask import Response, request, stream_with_context, url_for
+
+from config import Config
+
+# =========================
+# PAGINACIÓN POR LLAVE
+# =========================
+# Las listas se recorren por (campo de orden, _id) en lugar
+# de skip: cada página es una consulta por índice que cuesta
+# lo mismo en la página 1 que en la 600.
+#
+#   ?por_pagina=50              tamaño de página
+#   ?despues=<token>            página siguiente
+#   ?antes=<token>              página anterior
+#   ?exportar=csv               todo el resultado en streaming
+#
+# El token es la llave del último (o primer) elemento visto.
+#
+# Las búsquedas ordenadas por relevancia (paginar_ranking) no
+# tienen llave estable y avanzan con ?desde=N; su resultado ya
+# viene acotado por el índice de búsqueda.
+
+
+def tamano_pagina():
+
+    try:
+        por_pagina = int(request.args.get("por_pagina") or Config.POR_PAGINA)
+    except ValueError:
+        por_pagina = Config.POR_PAGINA
+
+    return max(1, min(por_pagina, Config.POR_PAGINA_MAX))
+
+
+def _codificar(valores):
+
+    texto = json_util.dumps(valores)
+
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def _decodificar(token):
+
+    if not token:
+        return None
+
+    try:
+
+        relleno = "=" * (-len(token) % 4)
+
+        valores = json_util.loads(base64.urlsafe_b64decode(token + relleno))
+
+    except (ValueError, TypeError):
+
+        return None
+
+    if not isinstance(valores, list) or len(valores) != 2:
+        return None
+
+    return valores
+
+
+def _llave(documento, campo):
+
+    if campo == "_id":
+        return [documento["_id"], documento["_id"]]
+
+    return [documento.get(campo), documento["_id"]]
+
+
+def _condicion(campo, direccion, valores, hacia_adelante):
+
+    valor, ultimo_id = valores
+
+    ascendente = (direccion == 1) == hacia_adelante
+
+    operador = "$gt" if ascendente else "$lt"
+
+    if campo == "_id":
+        return {"_id": {operador: ultimo_id}}
+
+    empate = {campo: valor, "_id": {operador: ultimo_id}}
+
+    # Mongo ordena null y los campos ausentes antes que cualquier
+    # valor, pero $gt/$lt nunca los comparan: hay que nombrarlos
+    if ascendente:
+
+        if valor is None:
+            return {"$or": [{campo: {"$ne": None}}, empate]}
+
+        return {"$or": [{campo: {"$gt": valor}}, empate]}
+
+    if valor is None:
+        return empate
+
+    return {
+        "$or": [
+            {campo: {"$lt": valor}},
+            {campo: None},
+            empate
+        ]
+    }
+
+
+def _url(**cambios):
+
+    argumentos = request.args.to_dict()
+
+    argumentos.pop("despues", None)
+    argumentos.pop("antes", None)
+    argumentos.pop("desde", None)
+
+    argumentos.update(cambios)
+
+    return url_for(
+        request.endpoint,
+        **request.view_args,
+        **argumentos
+    )
+
+
+def paginar(coleccion, filtro=None, proyeccion=None, orden=("_id", -1)):
+
+    campo, direccion = orden
+
+    por_pagina = tamano_pagina()
+
+    despues = _decodificar(request.args.get("despues"))
+
+    antes = None if despues else _decodificar(request.args.get("antes"))
+
+    hacia_adelante = antes is None
+
+    condiciones = [filtro or {}]
+
+    if despues:
+        condiciones.append(_condicion(campo, direccion, despues, True))
+
+    if antes:
+        condiciones.append(_condicion(campo, direccion, antes, False))
+
+    sentido = direccion if hacia_adelante else -direccion
+
+    orden_mongo = [(campo, sentido)]
+
+    if campo != "_id":
+        orden_mongo.append(("_id", sentido))
+
+    elementos = list(
+        coleccion.find(
+            {"$and": condiciones} if len(condiciones) > 1 else condiciones[0],
+            proyeccion
+        )
+        .sort(orden_mongo)
+        .limit(por_pagina + 1)
+    )
+
+    hay_mas = len(elementos) > por_pagina
+
+    elementos = elementos[:por_pagina]
+
+    if not hacia_adelante:
+        elementos.reverse()
+
+    hay_siguiente = hay_mas if hacia_adelante else True
+    hay_anterior = bool(despues) or (antes is not None and hay_mas)
+
+    return {
+
+        "elementos": elementos,
+
+        "por_pagina": por_pagina,
+
+        "siguiente": (
+            _url(despues=_codificar(_llave(elementos[-1], campo)))
+            if elementos and hay_siguiente else None
+        ),
+
+        "anterior": (
+            _url(antes=_codificar(_llave(elementos[0], campo)))
+            if elementos and hay_anterior else None
+        ),
+
+        "primera": _url() if (despues or antes) else None,
+
+        "exportar": _url(exportar="csv")
+
+    }
+
+
+def paginar_ranking(coleccion, filtro, rango, orden, proyeccion=None):
+
+    por_pagina = tamano_pagina()
+
+    try:
+        desde = max(0, int(request.args.get("desde") or 0))
+    except ValueError:
+        desde = 0
+
+    etapas = [
+        {"$match": filtro},
+        {"$addFields": {"_rango": rango}},
+        {"$sort": {"_rango": 1, orden: 1, "_id": 1}},
+        {"$skip": desde},
+        {"$limit": por_pagina + 1},
+        {"$project": proyeccion or {"_rango": 0}}
+    ]
+
+    elementos = list(coleccion.aggregate(etapas))
+
+    hay_mas = len(elementos) > por_pagina
+
+    elementos = elementos[:por_pagina]
+
+    return {
+
+        "elementos": elementos,
+
+        "por_pagina": por_pagina,
+
+        "siguiente": (
+            _url(desde=desde + por_pagina) if hay_mas else None
+        ),
+
+        "anterior": (
+            _url(desde=max(0, desde - por_pagina)) if desde else None
+        ),
+
+        "primera": _url() if desde else None,
+
+        "exportar": _url(exportar="csv")
+
+    }
+
+
+# =========================
+# EXPORTAR TODO
+# =========================
+def _valor(documento, campo):
+
+    for parte in campo.split("."):
+
+        if not isinstance(documento, dict):
+            return ""
+
+        documento = documento.get(parte, "")
+
+    return "" if documento is None else documento
+
+
+def exportar_csv(coleccion, filtro, columnas, nombre, orden=("_id", 1)):
+
+    proyeccion = {campo: 1 for _, campo in columnas}
+
+    def filas():
+
+        buffer = io.StringIO()
+
+        escritor = csv.writer(buffer)
+
+        # BOM para que Excel detecte UTF-8
+        buffer.write("\ufeff")
+
+        escritor.writerow([titulo for titulo, _ in columnas])
+
+        cursor = (
+            coleccion.find(filtro or {}, proyeccion)
+            .sort([orden])
+            .batch_size(500)
+        )
+
+        for i, documento in enumerate(cursor, 1):
+
+            escritor.writerow([
+                _valor(documento, campo)
+                for _, campo in columnas
+            ])
+
+            if i % 500 == 0:
+
+                yield buffer.getvalue()
+
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(filas()),
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename={nombre}.csv"
+        }
+    )
+
+
+def quiere_exportar():
+
+    return request.args.get("exportar") == "csv"
@@ -0,0 +1,102 @@
+import re
+
+# =========================
+# MAPA DE PERMISOS
+# =========================
+# Se compila una sola vez al arrancar (compilar_permisos).
+# Las vistas declaran su rol con @requiere_rol; los prefijos
+# cubren blueprints completos como /admin.
+
+RUTAS_PUBLICAS = (
+    "/static",
+    "/login",
+    "/validar"
+)
+
+# Bloqueadas en modo restringido (licencia inválida)
+RUTAS_BLOQUEADAS = (
+    "/admin/alumnos",
+    "/admin/maestros",
+    "/admin/grupos",
+    "/admin/materias",
+    "/admin/horarios",
+    "/admin/configuracion",
+    "/admin/crear",
+    "/admin/eliminar",
+    "/admin/generar",
+)
+
+ROLES_POR_PREFIJO = {
+    "/admin": ("admin", "superadmin"),
+}
+
+_tabla = {
+    "endpoints": {}
+}
+
+
+def _compilar_prefijos(prefijos):
+
+    ordenados = sorted(prefijos, key=len, reverse=True)
+
+    return re.compile(
+        "|".join(re.escape(p) for p in ordenados)
+    )
+
+
+_publicas = _compilar_prefijos(RUTAS_PUBLICAS)
+
+_bloqueadas = _compilar_prefijos(RUTAS_BLOQUEADAS)
+
+_prefijos_rol = _compilar_prefijos(ROLES_POR_PREFIJO)
+
+
+# =========================
+# DECORADOR
+# =========================
+def requiere_rol(*roles):
+
+    def decorador(vista):
+
+        vista.roles_permitidos = frozenset(roles)
+
+        return vista
+
+    return decorador
+
+
+def compilar_permisos(app):
+
+    _tabla["endpoints"] = {
+        endpoint: vista.roles_permitidos
+        for endpoint, vista in app.view_functions.items()
+        if getattr(vista, "roles_permitidos", None)
+    }
+
+
+# =========================
+# CONSULTAS
+# =========================
+def es_publica(ruta):
+
+    return ruta == "/" or _publicas.match(ruta) is not None
+
+
+def esta_bloqueada(ruta):
+
+    return _bloqueadas.match(ruta) is not None
+
+
+def roles_permitidos(ruta, endpoint):
+
+    roles = _tabla["endpoints"].get(endpoint)
+
+    if roles:
+        return roles
+
+    coincidencia = _prefijos_rol.match(ruta)
+
+    if coincidencia:
+        return ROLES_POR_PREFIJO[coincidencia.group(0)]
+
+    return None
@@ -0,0 +1,170 @@
+import os
+import sys
+import threading
+import time
+
+from datetime import datetime, timedelta
+
+from config import Config
+
+from database.mongo import configuracion_backups
+
+from utils.bloqueos import (
+    identidad,
+    tomar_lease,
+    liberar_lease
+)
+
+from utils.backup_manager import (
+    crear_backup_sistema_interno,
+    crear_backup_financiero_interno,
+    crear_backup_control_escolar_interno
+)
+
+# =========================
+# PROGRAMADOR DE RESPALDOS
+# =========================
+# Corre fuera del ciclo de la petición: un hilo por worker
+# (RESPALDOS_EN_SEGUNDO_PLANO) o un proceso aparte:
+#
+#   python -m utils.programador_respaldos
+#
+# Un lease en Mongo asegura que solo un worker revise los
+# respaldos pendientes, y cada trabajo se reclama de forma
+# atómica antes de ejecutarse.
+
+LEASE = "programador_respaldos"
+
+TAREAS = {
+    "sistema": crear_backup_sistema_interno,
+    "financiero": crear_backup_financiero_interno,
+    "control_escolar": crear_backup_control_escolar_interno
+}
+
+_candado = threading.Lock()
+
+_hilo = {
+    "pid": None
+}
+
+
+# =========================
+# TRABAJOS PENDIENTES
+# =========================
+def intervalo(config):
+
+    cantidad = config.get("intervalo", 24)
+
+    if config.get("unidad") == "dias":
+        return timedelta(days=cantidad)
+
+    return timedelta(hours=cantidad)
+
+
+def verificar_respaldos_automaticos():
+
+    ahora = datetime.now()
+
+    pendientes = configuracion_backups.find({
+        "activo": True,
+        "proxima_ejecucion": {"$lte": ahora}
+    })
+
+    ejecutados = 0
+
+    for config in pendientes:
+
+        tarea = TAREAS.get(config.get("tipo"))
+
+        if not tarea:
+            continue
+
+        # Reclamar el trabajo antes de ejecutarlo
+        reclamado = configuracion_backups.find_one_and_update(
+            {
+                "_id": config["_id"],
+                "proxima_ejecucion": config["proxima_ejecucion"]
+            },
+            {
+                "$set": {
+                    "ultima_ejecucion": ahora,
+                    "proxima_ejecucion": ahora + intervalo(config)
+                }
+            }
+        )
+
+        if not reclamado:
+            continue
+
+        try:
+
+            tarea(config.get("modo") or "completo")
+
+            ejecutados += 1
+
+        except Exception as e:
+
+            print(f"Error en respaldo automático ({config.get('tipo')}): {e}")
+
+    return ejecutados
+
+
+def ejecutar_ciclo():
+
+    if not tomar_lease(LEASE, Config.RESPALDOS_LEASE_SEGUNDOS):
+        return 0
+
+    return verificar_respaldos_automaticos()
+
+
+def _bucle():
+
+    while True:
+
+        try:
+
+            ejecutar_ciclo()
+
+        except Exception as e:
+
+            print(f"Error en programador de respaldos: {e}")
+
+        time.sleep(Config.RESPALDOS_REVISION_SEGUNDOS)
+
+
+# =========================
+# HILO EN EL WORKER
+# =========================
+def asegurar_programador():
+
+    if not Config.RESPALDOS_EN_SEGUNDO_PLANO:
+        return
+
+    pid = os.getpid()
+
+    if _hilo["pid"] == pid:
+        return
+
+    with _candado:
+
+        if _hilo["pid"] == pid:
+            return
+
+        _hilo["pid"] = pid
+
+        threading.Thread(
+            target=_bucle,
+            name="programador-respaldos",
+            daemon=True
+        ).start()
+
+
+if __name__ == "__main__":
+
+    print(f"💾 Programador de respaldos iniciado ({identidad()})")
+
+    try:
+        _bucle()
+    except KeyboardInterrupt:
+        liberar_lease(LEASE)
+        sys.exit(0)
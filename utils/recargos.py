@@ -0,0 +1,212 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.mongo import (
+    mensualidades,
+    movimientos_pagos
+)
+
+from utils.folios import (
+    formatear_folio,
+    reservar_folios
+)
+
+from utils.reportes_pagos import filtro_vencidas
+
+# =========================
+# RECARGOS POR LOTES
+# =========================
+# Una sola pasada sobre las mensualidades vencidas; las
+# escrituras se envían en lotes con insert_many/bulk_write.
+#
+# Repetirlo el mismo día no duplica nada:
+#   - la consulta salta las que ya tienen ultimo_recargo = hoy
+#   - cada movimiento lleva recargo_clave "<mensualidad>:<fecha>"
+#     con índice único, así que un reintento tras una caída
+#     a medias no inserta dos veces
+#   - el update solo aplica si ultimo_recargo sigue sin ser hoy
+#
+# El $inc de cada mensualidad sale del movimiento que quedó
+# guardado: el insertado ahora o, si ya existía, el de la
+# ejecución anterior (que pudo caerse antes de actualizar). El
+# resumen (mensualidades y total) sale de esos mismos montos.
+
+TAMANO_LOTE = 500
+
+DUPLICADO = 11000
+
+
+def clave_recargo(mensualidad_id, fecha):
+
+    return f"{mensualidad_id}:{fecha}"
+
+
+def pendientes_de_recargo(porcentaje, hoy=None):
+
+    hoy = hoy or datetime.now()
+
+    fecha_hoy = hoy.strftime("%d/%m/%Y")
+
+    filtro = filtro_vencidas(hoy)
+
+    filtro["ultimo_recargo"] = {"$ne": fecha_hoy}
+
+    cursor = mensualidades.find(
+        filtro,
+        {
+            "pago_id": 1,
+            "alumno": 1,
+            "monto": 1,
+            "recargo": 1
+        }
+    )
+
+    for mensualidad in cursor:
+
+        saldo_actual = (
+            mensualidad.get("monto", 0)
+            + mensualidad.get("recargo", 0)
+        )
+
+        yield {
+            "_id": mensualidad["_id"],
+            "pago_id": mensualidad["pago_id"],
+            "alumno": mensualidad.get("alumno", ""),
+            "recargo": saldo_actual * porcentaje / 100
+        }
+
+
+def _escribir_lote(lote, fecha_hoy, hora):
+
+    consecutivos = reservar_folios(len(lote))
+
+    movimientos = [
+
+        {
+            "consecutivo": consecutivo,
+            "folio": formatear_folio("RECARGO", consecutivo),
+            "recargo_clave": clave_recargo(item["_id"], fecha_hoy),
+            "concepto": "Recargo por mora",
+            "pago_id": item["pago_id"],
+            "alumno": item["alumno"],
+            "grupo": "",
+            "monto": item["recargo"],
+            "metodo": "recargo",
+            "mes_cubierto": "",
+            "fecha_pago": fecha_hoy,
+            "hora_pago": hora,
+            "capturado_por": "Sistema",
+            "estatus": "activo"
+        }
+
+        for consecutivo, item in zip(consecutivos, lote)
+
+    ]
+
+    duplicados = set()
+
+    try:
+
+        movimientos_pagos.insert_many(movimientos, ordered=False)
+
+    except BulkWriteError as e:
+
+        for error in e.details.get("writeErrors", []):
+
+            # Ya insertado por una ejecución anterior
+            if error.get("code") != DUPLICADO:
+                raise
+
+            duplicados.add(error["index"])
+
+    montos = {
+        item["_id"]: item["recargo"]
+        for i, item in enumerate(lote)
+        if i not in duplicados
+    }
+
+    if duplicados:
+
+        claves = {
+            movimientos[i]["recargo_clave"]: lote[i]["_id"]
+            for i in duplicados
+        }
+
+        for movimiento in movimientos_pagos.find(
+            {"recargo_clave": {"$in": list(claves)}},
+            {"recargo_clave": 1, "monto": 1}
+        ):
+            montos[claves[movimiento["recargo_clave"]]] = movimiento["monto"]
+
+    if montos:
+
+        mensualidades.bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "_id": mensualidad_id,
+                        "ultimo_recargo": {"$ne": fecha_hoy}
+                    },
+                    {
+                        "$inc": {"recargo": monto},
+                        "$set": {"ultimo_recargo": fecha_hoy}
+                    }
+                )
+                for mensualidad_id, monto in montos.items()
+            ],
+            ordered=False
+        )
+
+    # El resumen cuenta lo mismo que se sumó a las mensualidades
+    return sum(montos.values()), len(montos)
+
+
+def aplicar_recargos_lote(porcentaje, simular=False, hoy=None):
+
+    hoy = hoy or datetime.now()
+
+    fecha_hoy = hoy.strftime("%d/%m/%Y")
+
+    hora = hoy.strftime("%H:%M")
+
+    resultado = {
+        "mensualidades": 0,
+        "alumnos": set(),
+        "total": 0
+    }
+
+    lote = []
+
+    def vaciar():
+
+        if simular:
+
+            resultado["mensualidades"] += len(lote)
+            resultado["total"] += sum(i["recargo"] for i in lote)
+
+        else:
+
+            total, aplicados = _escribir_lote(lote, fecha_hoy, hora)
+
+            resultado["mensualidades"] += aplicados
+            resultado["total"] += total
+
+        lote.clear()
+
+    for item in pendientes_de_recargo(porcentaje, hoy):
+
+        lote.append(item)
+
+        resultado["alumnos"].add(item["pago_id"])
+
+        if len(lote) >= TAMANO_LOTE:
+            vaciar()
+
+    if lote:
+        vaciar()
+
+    resultado["alumnos"] = len(resultado["alumnos"])
+
+    return resultado
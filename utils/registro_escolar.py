@@ -0,0 +1,283 @@
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.mongo import (
+    calificaciones,
+    asistencias
+)
+
+# =========================
+# CALIFICACIONES Y ASISTENCIAS
+# =========================
+# Viven en sus propias colecciones, una entrada por
+# (alumno_id, materia, trimestre) y por (alumno_id, fecha).
+# Guardar es un único upsert: el documento del alumno ya no
+# crece con cada día de clase.
+
+
+ESTADOS_ASISTENCIA = ("Asistencia", "Falta", "Retardo")
+
+
+def _dia(fecha):
+
+    # Las tarjetas mandan dd/mm/YYYY; el selector de fecha, YYYY-mm-dd
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+
+        try:
+            return datetime.strptime(fecha, formato)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+def normalizar_fecha(fecha):
+
+    dia = _dia(fecha)
+
+    return dia.strftime("%d/%m/%Y") if dia else None
+
+
+def filtro_calificacion(alumno_id, materia, trimestre):
+
+    return {
+        "alumno_id": alumno_id,
+        "materia": materia,
+        "trimestre": str(trimestre)
+    }
+
+
+def datos_calificacion(alumno, materia, trimestre, calificacion, maestro):
+
+    return {
+        "alumno": alumno.get("nombre", ""),
+        "grupo": alumno.get("grupo", ""),
+        "materia": materia,
+        "trimestre": str(trimestre),
+        "calificacion": calificacion,
+        "maestro": maestro,
+        "fecha": datetime.now()
+    }
+
+
+def _cambios_calificacion(alumno, materia, trimestre, calificacion, maestro):
+
+    return {
+        "$set": datos_calificacion(
+            alumno,
+            materia,
+            trimestre,
+            calificacion,
+            maestro
+        ),
+        "$unset": {"enterado": ""}
+    }
+
+
+def guardar_calificacion(alumno, materia, trimestre, calificacion, maestro):
+
+    calificaciones.update_one(
+        filtro_calificacion(alumno["_id"], materia, trimestre),
+        _cambios_calificacion(
+            alumno,
+            materia,
+            trimestre,
+            calificacion,
+            maestro
+        ),
+        upsert=True
+    )
+
+
+def guardar_calificaciones(registros, maestro):
+
+    # registros: [(alumno, materia, trimestre, calificacion), ...]
+    # Devuelve {posición: mensaje} de los que no se escribieron
+    if not registros:
+        return {}
+
+    operaciones = [
+        UpdateOne(
+            filtro_calificacion(alumno["_id"], materia, trimestre),
+            _cambios_calificacion(
+                alumno,
+                materia,
+                trimestre,
+                calificacion,
+                maestro
+            ),
+            upsert=True
+        )
+        for alumno, materia, trimestre, calificacion in registros
+    ]
+
+    try:
+
+        calificaciones.bulk_write(operaciones, ordered=False)
+
+    except BulkWriteError as error:
+
+        return {
+            fallo["index"]: fallo.get("errmsg", "Error al guardar")
+            for fallo in error.details.get("writeErrors", [])
+        }
+
+    return {}
+
+
+def filtro_asistencia(alumno_id, fecha):
+
+    return {
+        "alumno_id": alumno_id,
+        "fecha": fecha
+    }
+
+
+def datos_asistencia(alumno, fecha, estado, maestro):
+
+    return {
+        "alumno": alumno.get("nombre", ""),
+        "grupo": alumno.get("grupo", ""),
+        "estado": estado,
+        "maestro": maestro,
+        "dia": _dia(fecha)
+    }
+
+
+def _fecha_asistencia(fecha):
+
+    # Las dos formas de la fecha deben caer en la misma llave
+    # (alumno_id, fecha) del índice único
+    normalizada = normalizar_fecha(fecha)
+
+    if not normalizada:
+        raise ValueError("Fecha inválida")
+
+    return normalizada
+
+
+def guardar_asistencia(alumno, fecha, estado, maestro):
+
+    fecha = _fecha_asistencia(fecha)
+
+    asistencias.update_one(
+        filtro_asistencia(alumno["_id"], fecha),
+        {"$set": datos_asistencia(alumno, fecha, estado, maestro)},
+        upsert=True
+    )
+
+
+def guardar_asistencias(registros, fecha, maestro):
+
+    # registros: [(alumno, estado), ...] de un mismo día.
+    # Un upsert por (alumno_id, fecha): repetir el pase de lista
+    # sobrescribe el estado en lugar de duplicar registros.
+    fecha = _fecha_asistencia(fecha)
+
+    operaciones = [
+        UpdateOne(
+            filtro_asistencia(alumno["_id"], fecha),
+            {"$set": datos_asistencia(alumno, fecha, estado, maestro)},
+            upsert=True
+        )
+        for alumno, estado in registros
+    ]
+
+    resumen = {"nuevas": 0, "actualizadas": 0, "fallidas": 0}
+
+    # Si dos maestros pasan lista a la vez, el índice único puede
+    # rechazar un upsert (11000); se reintenta una vez como update.
+    for intento in range(2):
+
+        if not operaciones:
+            break
+
+        try:
+
+            detalles = asistencias.bulk_write(
+                operaciones,
+                ordered=False
+            ).bulk_api_result
+
+            fallos = []
+
+        except BulkWriteError as error:
+
+            detalles = error.details
+
+            fallos = detalles.get("writeErrors", [])
+
+        resumen["nuevas"] += detalles.get("nUpserted", 0)
+        resumen["actualizadas"] += detalles.get("nMatched", 0)
+
+        reintentar = [
+            operaciones[fallo["index"]]
+            for fallo in fallos
+            if fallo.get("code") == 11000 and intento == 0
+        ]
+
+        resumen["fallidas"] += len(fallos) - len(reintentar)
+
+        operaciones = reintentar
+
+    return resumen
+
+
+# =========================
+# LECTURA
+# =========================
+def calificaciones_de(alumno_id):
+
+    return list(
+        calificaciones.find(
+            {"alumno_id": alumno_id},
+            {"_id": 0, "alumno_id": 0}
+        ).sort([("materia", 1), ("trimestre", 1)])
+    )
+
+
+def asistencias_de(alumno_id):
+
+    return list(
+        asistencias.find(
+            {"alumno_id": alumno_id},
+            {"_id": 0, "alumno_id": 0}
+        ).sort("dia", -1)
+    )
+
+
+def adjuntar_calificaciones(lista_alumnos):
+
+    # Una sola consulta para toda la lista
+    por_alumno = defaultdict(list)
+
+    ids = [alumno["_id"] for alumno in lista_alumnos]
+
+    for calificacion in calificaciones.find(
+        {"alumno_id": {"$in": ids}},
+        {"_id": 0}
+    ):
+        por_alumno[calificacion.pop("alumno_id")].append(calificacion)
+
+    for alumno in lista_alumnos:
+        alumno["calificaciones"] = por_alumno.get(alumno["_id"], [])
+
+    return lista_alumnos
+
+
+def marcar_enterado(alumno_id, materia):
+
+    calificaciones.update_many(
+        {"alumno_id": alumno_id, "materia": materia},
+        {"$set": {"enterado": True}}
+    )
+
+
+def eliminar_registros(alumno_id):
+
+    calificaciones.delete_many({"alumno_id": alumno_id})
+
+    asistencias.delete_many({"alumno_id": alumno_id})
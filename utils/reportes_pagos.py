@@ -0,0 +1,140 @@
+from datetime import datetime
+
+from database.mongo import mensualidades
+
+# =========================
+# MENSUALIDADES VENCIDAS
+# =========================
+# Vencida = no pagada y de un mes anterior al actual.
+# Usa el índice (pagado, anio, numero_mes).
+def filtro_vencidas(hoy=None):
+
+    hoy = hoy or datetime.now()
+
+    return {
+
+        "pagado": False,
+
+        "$or": [
+
+            {
+                "anio": {"$gt": 0, "$lt": hoy.year},
+                "numero_mes": {"$gt": 0}
+            },
+
+            {
+                "anio": hoy.year,
+                "numero_mes": {"$gt": 0, "$lt": hoy.month}
+            }
+
+        ]
+
+    }
+
+
+# =========================
+# MOROSOS
+# =========================
+# Una sola agregación en el servidor: agrupa las vencidas
+# por pago_id, une el contrato activo y, si se pide, suma
+# los recargos de todas sus mensualidades.
+def pipeline_morosos(hoy=None, con_recargos=True):
+
+    pipeline = [
+
+        {"$match": filtro_vencidas(hoy)},
+
+        {"$group": {"_id": "$pago_id"}},
+
+        {
+            "$lookup": {
+                "from": "pagos",
+                "let": {
+                    "pago_id": {
+                        "$convert": {
+                            "input": "$_id",
+                            "to": "objectId",
+                            "onError": None,
+                            "onNull": None
+                        }
+                    }
+                },
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {"$eq": ["$_id", "$$pago_id"]},
+                            "activo": {"$ne": False}
+                        }
+                    }
+                ],
+                "as": "pago"
+            }
+        },
+
+        {"$unwind": "$pago"}
+
+    ]
+
+    if con_recargos:
+
+        pipeline += [
+
+            {
+                "$lookup": {
+                    "from": "mensualidades",
+                    # let/$expr y no localField + pipeline: esa
+                    # forma corta exige MongoDB 5.0
+                    "let": {"pago_id": "$_id"},
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {"$eq": ["$pago_id", "$$pago_id"]}
+                            }
+                        },
+                        {
+                            "$group": {
+                                "_id": None,
+                                "total": {"$sum": "$recargo"}
+                            }
+                        }
+                    ],
+                    "as": "recargos"
+                }
+            },
+
+            {
+                "$replaceRoot": {
+                    "newRoot": {
+                        "$mergeObjects": [
+                            "$pago",
+                            {
+                                "recargos_reales": {
+                                    "$ifNull": [
+                                        {"$arrayElemAt": ["$recargos.total", 0]},
+                                        0
+                                    ]
+                                }
+                            }
+                        ]
+                    }
+                }
+            }
+
+        ]
+
+    else:
+
+        pipeline.append({"$replaceRoot": {"newRoot": "$pago"}})
+
+    pipeline.append({"$sort": {"alumno": 1}})
+
+    return pipeline
+
+
+def obtener_morosos(hoy=None, con_recargos=True):
+
+    return list(
+        mensualidades.aggregate(
+            pipeline_morosos(hoy, con_recargos)
+        )
+    )
@@ -0,0 +1,264 @@
+from bson.timestamp import Timestamp
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import OperationFailure
+
+from database.mongo import obtener_db, backups_archivos
+
+# =========================
+# RESPALDOS INCREMENTALES
+# =========================
+# Cada respaldo guarda en "operacion" el tiempo del clúster en
+# que empezó. Un incremental lee el change stream de la base
+# desde la "operacion" del respaldo anterior, junta los _id
+# tocados y guarda solo esos documentos (o su borrado):
+#
+#   {"op": "guardar", "documento": {...}}
+#   {"op": "borrar", "_id": ...}
+#
+#   completo     -> todas las colecciones
+#   incremental  -> cambios desde el último respaldo del tipo
+#   diferencial  -> cambios desde el último completo
+#
+# Cada respaldo apunta a su "anterior_id" y a su "base_id";
+# restaurar es cargar la base y aplicar la cadena en orden.
+#
+# Sin replica set no hay change streams, y si el oplog ya no
+# llega al respaldo anterior o alguna colección se tiró o
+# renombró (una restauración, por ejemplo), la cadena se rompe
+# y se hace un respaldo completo.
+
+MODOS = ("completo", "incremental", "diferencial")
+
+# Después de tantos eslabones toca un completo
+MAX_CADENA = 30
+
+TAMANO_LOTE = 500
+
+_CORTAN_CADENA = {"drop", "rename", "dropDatabase", "invalidate"}
+
+
+class CadenaRota(Exception):
+    pass
+
+
+def tiempo_operacion():
+
+    # Timestamp del clúster; None en un servidor sin replica set
+    return obtener_db().command("ping").get("operationTime")
+
+
+# =========================
+# CADENA
+# =========================
+def _manifiesto(backup_id):
+
+    return backups_archivos.find_one(
+        {"_id": backup_id},
+        {"contenido": 0}
+    )
+
+
+def punto_de_partida(tipo, modo):
+
+    # (base, anterior) del siguiente respaldo de este modo
+    ultimo = backups_archivos.find_one(
+        {"tipo": tipo, "estado": "Correcto"},
+        {"contenido": 0},
+        sort=[("fecha", -1)]
+    )
+
+    if not ultimo or not ultimo.get("operacion"):
+        raise CadenaRota("No hay un respaldo base con tiempo de operación.")
+
+    if ultimo.get("modo", "completo") == "completo":
+        base = ultimo
+    else:
+        base = _manifiesto(ultimo.get("base_id"))
+
+    if not base or base.get("estado") != "Correcto":
+        raise CadenaRota("El respaldo base ya no existe.")
+
+    if modo == "diferencial":
+        return base, base
+
+    if ultimo.get("eslabon", 0) >= MAX_CADENA:
+        raise CadenaRota("La cadena de incrementales llegó a su límite.")
+
+    return base, ultimo
+
+
+def cadena_respaldo(backup):
+
+    # [base, ..., backup] en el orden en que se aplican
+    cadena = [backup]
+
+    while cadena[0].get("modo", "completo") != "completo":
+
+        anterior = _manifiesto(cadena[0].get("anterior_id"))
+
+        if not anterior:
+            raise CadenaRota(
+                f"Falta el respaldo anterior de {cadena[0].get('nombre')}."
+            )
+
+        cadena.insert(0, anterior)
+
+    return cadena
+
+
+def dependientes(backup_id):
+
+    return backups_archivos.count_documents({
+        "$or": [
+            {"anterior_id": backup_id},
+            {"base_id": backup_id}
+        ]
+    })
+
+
+# =========================
+# CAMBIOS
+# =========================
+def _tiempo_token(token):
+
+    # El _data de un resume token empieza con el clusterTime
+    # del evento: 0x82 y el Timestamp en 8 bytes big-endian
+    try:
+        datos = bytes.fromhex(token["_data"][:18])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+    if len(datos) < 9 or datos[0] != 0x82:
+        return None
+
+    valor = int.from_bytes(datos[1:9], "big")
+
+    return Timestamp(valor >> 32, valor & 0xFFFFFFFF)
+
+
+def leer_cambios(nombres, desde, hasta):
+
+    # {coleccion: {_id, ...}} tocados entre "desde" y "hasta"
+    cambios = {nombre: set() for nombre in nombres}
+
+    if desde is None or hasta is None:
+        raise CadenaRota("Sin tiempo de operación (¿sin replica set?).")
+
+    filtro = {
+        "$match": {
+            "$or": [
+                {"ns.coll": {"$in": nombres}},
+                {"to.coll": {"$in": nombres}}
+            ]
+        }
+    }
+
+    try:
+
+        with obtener_db().watch(
+            [filtro],
+            start_at_operation_time=desde
+        ) as flujo:
+
+            # Un lote vacío no es el final: el oplog puede ir
+            # atrasado respecto a "hasta". Se lee hasta que un
+            # evento o el token de reanudación (postBatchResumeToken
+            # en los lotes vacíos) pase de "hasta".
+            while flujo.alive:
+
+                cambio = flujo.try_next()
+
+                if cambio is None:
+
+                    alcanzado = _tiempo_token(flujo.resume_token)
+
+                    if alcanzado is not None and alcanzado >= hasta:
+                        break
+
+                    continue
+
+                if cambio["clusterTime"] > hasta:
+                    # Ya es del siguiente respaldo
+                    break
+
+                if cambio["operationType"] in _CORTAN_CADENA:
+
+                    raise CadenaRota(
+                        f"{cambio['operationType']} en "
+                        f"{cambio.get('ns', {}).get('coll')}"
+                    )
+
+                cambios[cambio["ns"]["coll"]].add(
+                    cambio["documentKey"]["_id"]
+                )
+
+    except OperationFailure as e:
+
+        # Sin replica set, o el oplog ya no llega a "desde"
+        raise CadenaRota(str(e))
+
+    return cambios
+
+
+def documentos_cambiados(coleccion, ids):
+
+    pendientes = list(ids)
+
+    for i in range(0, len(pendientes), TAMANO_LOTE):
+
+        lote = pendientes[i:i + TAMANO_LOTE]
+
+        encontrados = set()
+
+        for documento in coleccion.find({"_id": {"$in": lote}}):
+
+            encontrados.add(documento["_id"])
+
+            yield {"op": "guardar", "documento": documento}
+
+        for _id in lote:
+
+            if _id not in encontrados:
+                yield {"op": "borrar", "_id": _id}
+
+
+# =========================
+# APLICAR
+# =========================
+def _operacion(cambio):
+
+    if cambio["op"] == "borrar":
+        return DeleteOne({"_id": cambio["_id"]})
+
+    documento = cambio["documento"]
+
+    return ReplaceOne({"_id": documento["_id"]}, documento, upsert=True)
+
+
+def aplicar_cambios(coleccion, cambios):
+
+    # Cada _id aparece una vez por incremental: el orden
+    # dentro del lote no importa
+    aplicados = 0
+
+    lote = []
+
+    for cambio in cambios:
+
+        lote.append(_operacion(cambio))
+
+        if len(lote) >= TAMANO_LOTE:
+
+            coleccion.bulk_write(lote, ordered=False)
+
+            aplicados += len(lote)
+
+            lote = []
+
+    if lote:
+
+        coleccion.bulk_write(lote, ordered=False)
+
+        aplicados += len(lote)
+
+    return aplicados
@@ -0,0 +1,361 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from database.mongo import obtener_db, restauraciones
+
+from database.indices import INDICES, nombre_indice
+
+from utils.almacen_respaldos import documentos_coleccion, leer_coleccion
+
+from utils.respaldos_incrementales import aplicar_cambios
+
+# =========================
+# RESTAURACIÓN POR ETAPAS
+# =========================
+# Cada colección del respaldo se carga en una colección
+# temporal ("alumnos__restauracion") mientras la escuela sigue
+# trabajando con la actual; varias a la vez, leyendo por lotes
+# e insertando con insert_many(ordered=False). Ya cargadas y
+# con sus índices, renameCollection(dropTarget) las pone en
+# lugar de las actuales: la escuela solo se queda sin datos lo
+# que tarda un rename por colección.
+#
+# Un respaldo incremental se restaura como su cadena: la base
+# se carga y cada incremental se aplica encima, en orden, antes
+# de indexar (ver utils/respaldos_incrementales.py).
+#
+# Un archivo subido pasa por las mismas temporales, pero se lee
+# una sola vez, en orden: restaurar_flujo() va llenando cada
+# temporal por lotes conforme llegan sus documentos.
+#
+# Si algo falla antes del intercambio, las temporales se tiran
+# y los datos actuales quedan intactos.
+#
+# El bucket de medios no se intercambia, se combina: sus
+# archivos nunca cambian, así que agregar los que falten deja
+# bien tanto las referencias actuales como las del respaldo.
+#
+# El avance queda en "restauraciones" para consultarlo mientras
+# corre:
+#
+#   colecciones: {nombre: {total, cargados, estado}}
+
+SUFIJO = "__restauracion"
+
+TAMANO_LOTE = 500
+
+COMBINAR = {"medios.files", "medios.chunks"}
+
+
+def _temporal(nombre):
+
+    return obtener_db()[f"{nombre}{SUFIJO}"]
+
+
+# =========================
+# AVANCE
+# =========================
+def crear_progreso(backup, usuario):
+
+    return restauraciones.insert_one({
+        "backup_id": backup["_id"],
+        "backup": backup.get("nombre"),
+        "tipo": backup.get("tipo"),
+        "usuario": usuario,
+        "estado": "En proceso",
+        "etapa": "pendiente",
+        "mensaje": "",
+        "colecciones": {},
+        "inicio": datetime.now(),
+        "fin": None
+    }).inserted_id
+
+
+def marcar_etapa(restauracion_id, etapa):
+
+    restauraciones.update_one(
+        {"_id": restauracion_id},
+        {"$set": {"etapa": etapa}}
+    )
+
+
+def terminar_progreso(restauracion_id, estado, mensaje):
+
+    restauraciones.update_one(
+        {"_id": restauracion_id},
+        {
+            "$set": {
+                "estado": estado,
+                "etapa": "terminada",
+                "mensaje": mensaje,
+                "fin": datetime.now()
+            }
+        }
+    )
+
+
+def _avance(restauracion_id, nombre, **campos):
+
+    restauraciones.update_one(
+        {"_id": restauracion_id},
+        {
+            "$set": {
+                f"colecciones.{nombre}.{campo}": valor
+                for campo, valor in campos.items()
+            }
+        }
+    )
+
+
+def obtener_progreso(restauracion_id):
+
+    if not restauracion_id:
+        return None
+
+    try:
+        restauracion_id = ObjectId(restauracion_id)
+    except (InvalidId, TypeError):
+        return None
+
+    return restauraciones.find_one({"_id": restauracion_id})
+
+
+def restauracion_en_curso():
+
+    return restauraciones.find_one(
+        {"estado": "En proceso"},
+        sort=[("inicio", -1)]
+    )
+
+
+# =========================
+# CARGA
+# =========================
+def _preparar(nombre):
+
+    _temporal(nombre).drop()
+
+    # Existe aunque el respaldo no traiga documentos
+    obtener_db().create_collection(f"{nombre}{SUFIJO}")
+
+
+def _indexar(nombre):
+
+    # Antes del intercambio: un índice único que falle
+    # deja los datos actuales sin tocar
+    destino = _temporal(nombre)
+
+    for claves, opciones in INDICES.get(nombre, []):
+
+        destino.create_index(
+            claves,
+            name=nombre_indice(claves),
+            **opciones
+        )
+
+
+def _cargar(cadena, nombre, restauracion_id):
+
+    destino = _temporal(nombre)
+
+    _avance(restauracion_id, nombre, estado="cargando")
+
+    cargados = 0
+
+    lote = []
+
+    for documento in leer_coleccion(cadena[0], nombre):
+
+        lote.append(documento)
+
+        if len(lote) >= TAMANO_LOTE:
+
+            destino.insert_many(lote, ordered=False)
+
+            cargados += len(lote)
+
+            lote = []
+
+            _avance(restauracion_id, nombre, cargados=cargados)
+
+    if lote:
+
+        destino.insert_many(lote, ordered=False)
+
+        cargados += len(lote)
+
+    for incremental in cadena[1:]:
+
+        cargados += aplicar_cambios(
+            destino,
+            leer_coleccion(incremental, nombre)
+        )
+
+        _avance(restauracion_id, nombre, cargados=cargados)
+
+    _avance(restauracion_id, nombre, cargados=cargados, estado="indexando")
+
+    _indexar(nombre)
+
+    _avance(restauracion_id, nombre, estado="lista")
+
+    return cargados
+
+
+def _combinar(nombre):
+
+    _temporal(nombre).aggregate([
+        {
+            "$merge": {
+                "into": nombre,
+                "on": "_id",
+                "whenMatched": "keepExisting",
+                "whenNotMatched": "insert"
+            }
+        }
+    ])
+
+    _temporal(nombre).drop()
+
+
+def _limpiar(nombres):
+
+    for nombre in nombres:
+        _temporal(nombre).drop()
+
+
+def _intercambiar(nombres, restauracion_id):
+
+    marcar_etapa(restauracion_id, "intercambiando")
+
+    for nombre in nombres:
+
+        if nombre in COMBINAR:
+            _combinar(nombre)
+        else:
+            _temporal(nombre).rename(nombre, dropTarget=True)
+
+        _avance(restauracion_id, nombre, estado="restaurada")
+
+
+def restaurar_colecciones(cadena, nombres, restauracion_id, hilos=4):
+
+    # cadena: [base, incrementales...] (un completo va solo)
+
+    restauraciones.update_one(
+        {"_id": restauracion_id},
+        {
+            "$set": {
+                "etapa": "cargando",
+                "colecciones": {
+                    nombre: {
+                        "total": sum(
+                            documentos_coleccion(backup, nombre)
+                            for backup in cadena
+                        ),
+                        "cargados": 0,
+                        "estado": "pendiente"
+                    }
+                    for nombre in nombres
+                }
+            }
+        }
+    )
+
+    try:
+
+        for nombre in nombres:
+            _preparar(nombre)
+
+        with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+
+            # list(): la primera excepción sale aquí
+            list(ejecutor.map(
+                lambda nombre: _cargar(cadena, nombre, restauracion_id),
+                nombres
+            ))
+
+    except Exception:
+
+        _limpiar(nombres)
+
+        raise
+
+    _intercambiar(nombres, restauracion_id)
+
+
+def restaurar_flujo(flujo, permitidas, restauracion_id):
+
+    # flujo: (coleccion, total, documento) en el orden del
+    # archivo. Lo que no esté en "permitidas" se ignora.
+    # Devuelve las colecciones restauradas.
+    cargados = {}
+
+    lotes = {}
+
+    def volcar(nombre):
+
+        if lotes[nombre]:
+
+            _temporal(nombre).insert_many(lotes[nombre], ordered=False)
+
+            cargados[nombre] += len(lotes[nombre])
+
+            lotes[nombre] = []
+
+        _avance(restauracion_id, nombre, cargados=cargados[nombre])
+
+    marcar_etapa(restauracion_id, "cargando")
+
+    try:
+
+        for nombre, total, documento in flujo:
+
+            if nombre not in permitidas:
+                continue
+
+            if nombre not in lotes:
+
+                _preparar(nombre)
+
+                lotes[nombre] = []
+                cargados[nombre] = 0
+
+                _avance(
+                    restauracion_id,
+                    nombre,
+                    total=total,
+                    cargados=0,
+                    estado="cargando"
+                )
+
+            lotes[nombre].append(documento)
+
+            if len(lotes[nombre]) >= TAMANO_LOTE:
+                volcar(nombre)
+
+        for nombre in lotes:
+
+            volcar(nombre)
+
+            _avance(restauracion_id, nombre, estado="indexando")
+
+            _indexar(nombre)
+
+            _avance(restauracion_id, nombre, estado="lista")
+
+    except Exception:
+
+        _limpiar(lotes)
+
+        raise
+
+    nombres = list(lotes)
+
+    _intercambiar(nombres, restauracion_id)
+
+    return nombres
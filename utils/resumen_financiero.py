@@ -0,0 +1,361 @@
+import sys
+
+from datetime import datetime
+
+from database.mongo import (
+    db,
+    pagos,
+    mensualidades,
+    movimientos_pagos
+)
+
+from utils.reportes_pagos import filtro_vencidas
+
+# =========================
+# RESUMEN FINANCIERO
+# =========================
+# Documento único que alimenta dashboard_financiero. Las
+# rutas de pagos lo actualizan con $inc; la conciliación
+# lo reconstruye desde cero y muestra las diferencias:
+#
+#   python -m utils.resumen_financiero conciliar
+
+resumen_financiero = db["resumen_financiero"]
+
+RESUMEN_ID = "global"
+
+CAMPOS = (
+    "total_contratado",
+    "total_cobrado",
+    "total_pendiente",
+    "total_recargos",
+    "morosos",
+    "mensualidades_vencidas",
+    "ingresos_hoy"
+)
+
+
+def _hoy():
+
+    return datetime.now().strftime("%d/%m/%Y")
+
+
+def _periodo():
+
+    return datetime.now().strftime("%Y-%m")
+
+
+# =========================
+# DELTAS DE CONTRATOS
+# =========================
+def _aporte_pago(pago):
+
+    if not pago or pago.get("activo") is False:
+        return 0, 0, 0
+
+    return (
+        pago.get("total_debe", 0) or 0,
+        pago.get("total_pagado", 0) or 0,
+        pago.get("saldo_restante", 0) or 0
+    )
+
+
+def registrar_cambio_pago(antes, despues):
+
+    debe_antes, pagado_antes, saldo_antes = _aporte_pago(antes)
+    debe_despues, pagado_despues, saldo_despues = _aporte_pago(despues)
+
+    incrementos = {
+        "total_contratado": debe_despues - debe_antes,
+        "total_cobrado": pagado_despues - pagado_antes,
+        "total_pendiente": saldo_despues - saldo_antes
+    }
+
+    incrementos = {
+        campo: valor
+        for campo, valor in incrementos.items()
+        if valor
+    }
+
+    if not incrementos:
+        return
+
+    resumen_financiero.update_one(
+        {"_id": RESUMEN_ID},
+        {"$inc": incrementos},
+        upsert=True
+    )
+
+
+# =========================
+# INGRESOS DEL DÍA
+# =========================
+def registrar_ingreso(monto, fecha_pago=None):
+
+    hoy = _hoy()
+
+    if not monto or (fecha_pago and fecha_pago != hoy):
+        return
+
+    actualizado = resumen_financiero.update_one(
+        {"_id": RESUMEN_ID, "ingresos_fecha": hoy},
+        {"$inc": {"ingresos_hoy": monto}}
+    )
+
+    if actualizado.matched_count:
+        return
+
+    # Primer ingreso del día: reiniciar el acumulado
+    reiniciado = resumen_financiero.update_one(
+        {"_id": RESUMEN_ID, "ingresos_fecha": {"$ne": hoy}},
+        {"$set": {"ingresos_fecha": hoy, "ingresos_hoy": monto}}
+    )
+
+    if reiniciado.matched_count:
+        return
+
+    # Otro worker lo reinició primero, o aún no existe
+    resumen_financiero.update_one(
+        {"_id": RESUMEN_ID},
+        {
+            "$inc": {"ingresos_hoy": monto},
+            "$setOnInsert": {"ingresos_fecha": hoy}
+        },
+        upsert=True
+    )
+
+
+# =========================
+# RECARGOS Y VENCIDAS
+# =========================
+def registrar_recargos(total):
+
+    if not total:
+        return
+
+    resumen_financiero.update_one(
+        {"_id": RESUMEN_ID},
+        {"$inc": {"total_recargos": total}},
+        upsert=True
+    )
+
+
+def registrar_mensualidad_pagada(mensualidad):
+
+    if not mensualidad:
+        return
+
+    anio = mensualidad.get("anio") or 0
+    numero_mes = mensualidad.get("numero_mes") or 0
+
+    hoy = datetime.now()
+
+    vencida = numero_mes > 0 and 0 < anio and (
+        anio < hoy.year
+        or (anio == hoy.year and numero_mes < hoy.month)
+    )
+
+    if not vencida:
+        return
+
+    incrementos = {"mensualidades_vencidas": -1}
+
+    filtro = filtro_vencidas(hoy)
+
+    filtro["pago_id"] = mensualidad.get("pago_id")
+
+    if not mensualidades.find_one(filtro, {"_id": 1}):
+        incrementos["morosos"] = -1
+
+    resumen_financiero.update_one(
+        {"_id": RESUMEN_ID, "periodo": _periodo()},
+        {"$inc": incrementos}
+    )
+
+
+def contar_vencidas():
+
+    resultado = list(
+        mensualidades.aggregate([
+            {"$match": filtro_vencidas()},
+            {
+                "$group": {
+                    "_id": "$pago_id",
+                    "vencidas": {"$sum": 1}
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "morosos": {"$sum": 1},
+                    "vencidas": {"$sum": "$vencidas"}
+                }
+            }
+        ])
+    )
+
+    if not resultado:
+        return 0, 0
+
+    return resultado[0]["morosos"], resultado[0]["vencidas"]
+
+
+# =========================
+# RECONSTRUCCIÓN
+# =========================
+def calcular_resumen():
+
+    totales = next(
+        pagos.aggregate([
+            {"$match": {"activo": {"$ne": False}}},
+            {
+                "$group": {
+                    "_id": None,
+                    "total_contratado": {"$sum": "$total_debe"},
+                    "total_cobrado": {"$sum": "$total_pagado"},
+                    "total_pendiente": {"$sum": "$saldo_restante"}
+                }
+            }
+        ]),
+        {}
+    )
+
+    recargos = next(
+        mensualidades.aggregate([
+            {"$match": {"recargo": {"$gt": 0}}},
+            {"$group": {"_id": None, "total": {"$sum": "$recargo"}}}
+        ]),
+        {}
+    )
+
+    hoy = _hoy()
+
+    ingresos = next(
+        movimientos_pagos.aggregate([
+            {"$match": {"fecha_pago": hoy, "estatus": "activo"}},
+            {"$group": {"_id": None, "total": {"$sum": "$monto"}}}
+        ]),
+        {}
+    )
+
+    morosos, vencidas = contar_vencidas()
+
+    return {
+        "total_contratado": totales.get("total_contratado", 0),
+        "total_cobrado": totales.get("total_cobrado", 0),
+        "total_pendiente": totales.get("total_pendiente", 0),
+        "total_recargos": recargos.get("total", 0),
+        "morosos": morosos,
+        "mensualidades_vencidas": vencidas,
+        "ingresos_hoy": ingresos.get("total", 0),
+        "ingresos_fecha": hoy,
+        "periodo": _periodo()
+    }
+
+
+def reconstruir_resumen():
+
+    resumen = calcular_resumen()
+
+    resumen["actualizado"] = datetime.now()
+
+    resumen_financiero.replace_one(
+        {"_id": RESUMEN_ID},
+        resumen,
+        upsert=True
+    )
+
+    return resumen
+
+
+# =========================
+# LECTURA
+# =========================
+def obtener_resumen():
+
+    resumen = resumen_financiero.find_one({"_id": RESUMEN_ID})
+
+    # Sin reconstrucción previa solo habría deltas sueltos
+    if not resumen or "actualizado" not in resumen:
+
+        resumen = reconstruir_resumen()
+
+        return {
+            campo: resumen.get(campo, 0)
+            for campo in CAMPOS
+        }
+
+    periodo = _periodo()
+
+    # Al cambiar de mes hay nuevas mensualidades vencidas
+    if resumen.get("periodo") != periodo:
+
+        morosos, vencidas = contar_vencidas()
+
+        resumen_financiero.update_one(
+            {"_id": RESUMEN_ID},
+            {
+                "$set": {
+                    "morosos": morosos,
+                    "mensualidades_vencidas": vencidas,
+                    "periodo": periodo
+                }
+            }
+        )
+
+        resumen["morosos"] = morosos
+        resumen["mensualidades_vencidas"] = vencidas
+
+    if resumen.get("ingresos_fecha") != _hoy():
+        resumen["ingresos_hoy"] = 0
+
+    return {
+        campo: resumen.get(campo, 0)
+        for campo in CAMPOS
+    }
+
+
+# =========================
+# CONCILIACIÓN
+# =========================
+def conciliar():
+
+    guardado = resumen_financiero.find_one({"_id": RESUMEN_ID}) or {}
+
+    if guardado.get("ingresos_fecha") != _hoy():
+        guardado["ingresos_hoy"] = 0
+
+    calculado = reconstruir_resumen()
+
+    diferencias = {}
+
+    for campo in CAMPOS:
+
+        antes = guardado.get(campo, 0) or 0
+        despues = calculado.get(campo, 0) or 0
+
+        if round(antes - despues, 2) != 0:
+            diferencias[campo] = (antes, despues)
+
+    return diferencias
+
+
+if __name__ == "__main__":
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "conciliar"
+
+    if comando != "conciliar":
+
+        print("Uso: python -m utils.resumen_financiero conciliar")
+
+        sys.exit(2)
+
+    diferencias = conciliar()
+
+    for campo, (antes, despues) in diferencias.items():
+        print(f"⚠️ {campo}: guardado {antes} → calculado {despues}")
+
+    if not diferencias:
+        print("✅ Resumen financiero sin diferencias")
+
+    sys.exit(1 if diferencias else 0)